@@ -0,0 +1,285 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from detector_backends import get_detector, DetectionResult, PlateBox
+from ocr_backends import get_backend
+from ocr_cache import get_cache, dhash
+from plate_decoder import decode_plate, best_text
+from preprocess import top_candidates, TOP_K
+
+# Shared detect + OCR engine used by every gate script
+MODEL_PATH = os.getenv('ANPR_MODEL', 'best.pt')
+LANES_PATH = os.getenv('ANPR_LANES', 'lanes.json')
+
+
+@dataclass
+class LaneConfig:
+    """
+    Where plates appear in one lane's camera frame and at what resolution to look.
+
+    With refine_imgsz set (adaptive mode) the ROI is scanned at imgsz and every
+    candidate less confident than accept_conf is re-detected at refine_imgsz in
+    a window around it (refine_margin plate sizes of context on each side).
+    """
+    roi: Optional[tuple] = None  # (x1, y1, x2, y2) in full-frame pixels; None for the whole frame
+    imgsz: Optional[int] = None  # detector input size; None for the model's own
+    refine_imgsz: Optional[int] = None
+    accept_conf: float = 0.6
+    refine_margin: float = 1.5
+
+    @property
+    def is_default(self):
+        return self.roi is None and self.imgsz is None and self.refine_imgsz is None
+
+
+def load_lanes(path=LANES_PATH):
+    """
+    {lane name: LaneConfig} from a JSON file such as
+    {"entry": {"roi": [0, 360, 1280, 720], "imgsz": 320, "refine_imgsz": 640}};
+    lanes that are not listed use the full frame at the model's size
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        lanes = json.load(f)
+    return {name: LaneConfig(**{**config, 'roi': tuple(config['roi']) if config.get('roi') else None})
+            for name, config in lanes.items()}
+
+
+def clip_window(window, shape):
+    """Integer (x1, y1, x2, y2) clipped to a frame of the given shape; None means the whole frame"""
+    h, w = shape[:2]
+    if window is None:
+        return 0, 0, w, h
+    x1, y1, x2, y2 = window
+    return (int(max(0, min(x1, w))), int(max(0, min(y1, h))),
+            int(max(0, min(x2, w))), int(max(0, min(y2, h))))
+
+
+@dataclass
+class PlateRead:
+    """One detected plate: the decoded plate number (None if OCR could not be decoded) plus evidence"""
+    plate: Optional[str]
+    text: str
+    box: tuple
+    confidence: float
+    crop: np.ndarray
+    thresh: np.ndarray
+    plate_confidence: float = 0.0  # how well the OCR output fits the plate grammar (see plate_decoder)
+    cached: bool = False  # served by the OCR cache: a repeat of an earlier read, not a new one
+
+
+def is_valid_plate(plate):
+    """Validate plate number format"""
+    if not plate or len(plate) != 7:
+        return False
+
+    # Check format: 3 letters + 3 digits + 1 letter
+    prefix = plate[:3]
+    digits = plate[3:6]
+    suffix = plate[6]
+
+    return (prefix.isalpha() and prefix.isupper() and
+            digits.isdigit() and
+            suffix.isalpha() and suffix.isupper())
+
+
+def parse_plate(plate_text):
+    """Decode a valid RA plate number from raw OCR text, correcting likely misreads, or None"""
+    return decode_plate(plate_text)[0]
+
+
+def preprocess_plate(plate_img):
+    """Gray -> GaussianBlur -> Otsu binarization of a cropped plate"""
+    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
+    blur = cv2.GaussianBlur(gray, (5, 5), 0)
+    return cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+
+
+def pick_read(reads):
+    """The (text, thresh, plate, plate_confidence) that decodes most confidently; the first one on a tie"""
+    return max(reads, key=lambda read: read[3])
+
+
+class ANPREngine:
+    """
+    Holds the YOLO plate detector warm and runs detect -> crop -> preprocess -> OCR.
+
+    A process should share one engine (see get_engine) so the model is loaded once
+    and every gate picks up the same fixes and speed-ups. The detector backend
+    (ultralytics or onnx, see detector_backends) comes from ANPR_DETECTOR.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, ocr=None, detector=None, top_k=TOP_K):
+        self.model_path = model_path
+        self.detector = get_detector(model_path, detector)
+        self.ocr = ocr or get_backend()
+        # Binarizations OCR'd per crop (see preprocess); 0 is the fixed Otsu pass alone
+        self.top_k = top_k
+        # Near-identical crops of the same lane reuse the last read (see ocr_cache)
+        self.ocr_cache = get_cache()
+        # ultralytics predictors are not safe to call from several threads at once
+        self._model_lock = threading.Lock()
+
+    def detect_batch(self, frames, imgsz=None):
+        """Run the detector on several frames in one forward pass"""
+        if not frames:
+            return []
+        with self._model_lock:
+            results = self.detector.predict(frames, imgsz)
+        return results
+
+    def detect(self, frame, lane=None):
+        """Return [(x1, y1, x2, y2, confidence), ...] for one frame and its ultralytics result"""
+        result = self.detect_lanes([frame], [lane])[0] if lane else self.detect_batch([frame])[0]
+        return boxes_from_result(result), result
+
+    def detect_lanes(self, frames, lanes):
+        """
+        Detect each frame within its lane's ROI and at its lane's resolution
+        (see LaneConfig); results are in full-frame coordinates like detect_batch's.
+        """
+        lanes = [lane or LaneConfig() for lane in lanes]
+        if all(lane.is_default for lane in lanes):
+            return self.detect_batch(frames)
+
+        windows = [clip_window(lane.roi, frame.shape) for frame, lane in zip(frames, lanes)]
+        boxes, names = self._detect_windows(frames, windows, [lane.imgsz for lane in lanes])
+
+        # Adaptive mode: a closer, higher-resolution look around each weak candidate
+        refine = [(i, box) for i, lane in enumerate(lanes) if lane.refine_imgsz
+                  for box in boxes[i] if box[4] < lane.accept_conf]
+        if refine:
+            refine_windows = []
+            for i, (x1, y1, x2, y2, _) in refine:
+                margin = lanes[i].refine_margin
+                dx, dy = (x2 - x1) * margin, (y2 - y1) * margin
+                refine_windows.append(clip_window((x1 - dx, y1 - dy, x2 + dx, y2 + dy), frames[i].shape))
+            refined, _ = self._detect_windows([frames[i] for i, _ in refine], refine_windows,
+                                              [lanes[i].refine_imgsz for i, _ in refine])
+            for (i, candidate), found in zip(refine, refined):
+                boxes[i].remove(candidate)
+                if found:
+                    boxes[i].append(max(found, key=lambda box: box[4]))
+
+        return [DetectionResult(frame, [PlateBox(box[:4], box[4]) for box in frame_boxes], names)
+                for frame, frame_boxes in zip(frames, boxes)]
+
+    def _detect_windows(self, frames, windows, sizes):
+        """Boxes in full-frame pixels for one window of each frame; windows sharing a size share a forward pass"""
+        groups = defaultdict(list)
+        for i, imgsz in enumerate(sizes):
+            groups[imgsz].append(i)
+        boxes, names = [[] for _ in frames], {0: 'license_plate'}
+        for imgsz, indices in groups.items():
+            crops = [frames[i][windows[i][1]:windows[i][3], windows[i][0]:windows[i][2]] for i in indices]
+            if not all(crop.size for crop in crops):
+                indices = [i for i, crop in zip(indices, crops) if crop.size]
+                crops = [crop for crop in crops if crop.size]
+            for i, result in zip(indices, self.detect_batch(crops, imgsz)):
+                names = getattr(result, 'names', names)
+                x0, y0 = windows[i][:2]
+                boxes[i] = [(x1 + x0, y1 + y0, x2 + x0, y2 + y0, conf)
+                            for x1, y1, x2, y2, conf in boxes_from_result(result)]
+        return boxes, names
+
+    def read_crop(self, plate_img, box=(0, 0, 0, 0), confidence=0.0, lane='default', fresh=False):
+        """OCR a single cropped plate"""
+        return self.read_crops([plate_img], [box], [confidence], lane, [fresh])[0]
+
+    def read_crops(self, crops, boxes=None, confidences=None, lane='default', fresh=None):
+        """
+        Preprocess a batch of cropped plates and OCR them in one backend call.
+        Crops flagged in fresh skip the cache lookup (a track that still needs
+        independent votes, see PlateTracker.needs_fresh_read); their reads are
+        still cached for later frames
+        """
+        boxes = boxes or [(0, 0, 0, 0)] * len(crops)
+        confidences = confidences or [0.0] * len(crops)
+        fresh = fresh or [False] * len(crops)
+        cache = self.ocr_cache
+        keys = [dhash(crop) for crop in crops] if cache else [None] * len(crops)
+        reads = ([None if skip else cache.get(lane, key) for key, skip in zip(keys, fresh)]
+                 if cache else [None] * len(crops))
+        cached = [read is not None for read in reads]
+
+        misses = [i for i, read in enumerate(reads) if read is None]
+        candidates = [self.preprocess(crops[i]) for i in misses]
+        # Every candidate of every missed crop goes to the backend in one call
+        threshes = [thresh for crop_candidates in candidates for thresh in crop_candidates]
+        started = time.perf_counter()
+        positions = iter(self.ocr.read_candidates(threshes) if threshes else [])
+        if cache and misses:
+            cache.record_ocr(lane, time.perf_counter() - started)
+        for i, crop_candidates in zip(misses, candidates):
+            decoded = []
+            for thresh in crop_candidates:
+                read_positions = next(positions)
+                decoded.append((best_text(read_positions), thresh, *decode_plate(read_positions)))
+            reads[i] = pick_read(decoded)
+            # Failed reads are not cached, so the next near-identical crop gets another try
+            if cache and reads[i][2]:
+                cache.put(lane, keys[i], reads[i])
+
+        return [PlateRead(plate, text, box, confidence, crop, thresh, plate_confidence, hit)
+                for crop, (text, thresh, plate, plate_confidence), box, confidence, hit
+                in zip(crops, reads, boxes, confidences, cached)]
+
+    def preprocess(self, plate_img):
+        """Binarized candidates of one crop to OCR, most promising first"""
+        return top_candidates(plate_img, self.top_k) if self.top_k else [preprocess_plate(plate_img)]
+
+    def read_boxes(self, frame, boxes, lane='default', fresh=None):
+        """OCR the given (x1, y1, x2, y2, confidence) boxes of a frame"""
+        crops, kept, confidences, kept_fresh = [], [], [], []
+        for (x1, y1, x2, y2, confidence), skip in zip(boxes, fresh or [False] * len(boxes)):
+            plate_img = frame[y1:y2, x1:x2]
+            if plate_img.size:
+                crops.append(plate_img)
+                kept.append((x1, y1, x2, y2))
+                confidences.append(confidence)
+                kept_fresh.append(skip)
+        return self.read_crops(crops, kept, confidences, lane, kept_fresh)
+
+    def read_result(self, frame, result, lane='default'):
+        """OCR every box of an ultralytics result against the frame it came from"""
+        return self.read_boxes(frame, boxes_from_result(result), lane)
+
+    def recognize_batch(self, frames):
+        """Detect and read plates in several frames; returns one list of PlateRead per frame"""
+        return [self.read_result(frame, result)
+                for frame, result in zip(frames, self.detect_batch(frames))]
+
+    def recognize(self, frame):
+        """Detect and read every plate in a frame"""
+        return self.recognize_batch([frame])[0]
+
+
+def boxes_from_result(result):
+    """Integer pixel boxes with confidences from an ultralytics result"""
+    boxes = []
+    for box in result.boxes:
+        x1, y1, x2, y2 = map(int, box.xyxy[0])
+        boxes.append((x1, y1, x2, y2, float(box.conf[0])))
+    return boxes
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(model_path=MODEL_PATH, detector=None):
+    """Return the process-wide engine for a model and detector backend, loading it on first use"""
+    with _engines_lock:
+        key = (model_path, detector)
+        if key not in _engines:
+            _engines[key] = ANPREngine(model_path, detector=detector)
+        return _engines[key]
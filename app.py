@@ -1,15 +1,23 @@
-from flask import Flask, render_template, jsonify
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context, make_response
 from flask_socketio import SocketIO, emit
 from db_operations import (
     get_recent_activities,
     get_recent_alerts,
     mark_alert_as_read,
-    get_daily_stats,
-    get_hourly_occupancy,
-    get_weekly_revenue
+    iter_parking_history,
+    history_cursor,
+    parse_history_cursor,
+    get_period_report
 )
-from datetime import datetime, timedelta
+from stats_engine import stats_engine
+from db_config import db_stats, limit_retries, REQUEST_RETRY_WAIT
+from events import bus, ENTRY, PAYMENT, EXIT, ALERT, ALERT_READ
+from db_listener import NotifyListener
+from response_cache import ResponseCache
+from datetime import date, datetime, timedelta
 import json
+import csv
+import io
 from threading import Lock
 from decimal import Decimal
 
@@ -20,6 +28,25 @@ socketio = SocketIO(app, cors_allowed_origins="*")
 # Thread handling
 thread = None
 thread_lock = Lock()
+cache = ResponseCache()
+# Started with the app, not on the first Socket.IO connect: the gates and payment
+# terminals write from other processes, and the cache and stats only hear of it here.
+# Anything written while the listener was not connected is folded into the stats
+# counters from the database and dropped from the cache, in that order.
+listener = NotifyListener(on_connect=[stats_engine.reconcile, cache.clear])
+
+# A request fails fast during a database outage rather than waiting out the pool's full backoff
+@app.before_request
+def cap_db_retries():
+    limit_retries(REQUEST_RETRY_WAIT)
+
+@app.teardown_request
+def lift_db_retry_cap(exc):
+    limit_retries(None)
+
+# Last stats and hourly buckets sent to clients, so only changes are emitted
+last_sent = {'stats': {}, 'occupancy': {}}
+sent_lock = Lock()
 
 def serialize_datetime(obj):
     """Helper function to serialize datetime objects"""
@@ -67,91 +94,167 @@ def format_stats(stats):
             formatted_stats[key] = float(value)
     return formatted_stats
 
+def emit_stat_changes():
+    """Emit the daily stats keys and hourly buckets that changed since the last emit"""
+    stats = format_stats(stats_engine.daily())
+    hourly = stats_engine.hourly()
+    with sent_lock:
+        changed_stats = {k: v for k, v in stats.items() if last_sent['stats'].get(k) != v}
+        changed_hours = [h for h in hourly if last_sent['occupancy'].get(h['hour']) != h]
+        last_sent['stats'] = stats
+        last_sent['occupancy'] = {h['hour']: h for h in hourly}
+    if changed_stats:
+        socketio.emit('stats_update', changed_stats)
+    if changed_hours:
+        socketio.emit('occupancy_update', changed_hours)
+
+def on_event(kind, data):
+    """Push a write to every dashboard the moment it is committed"""
+    try:
+        if kind in (ENTRY, PAYMENT, EXIT):
+            socketio.emit('new_activities', format_activities([data]))
+            emit_stat_changes()
+        elif kind == ALERT:
+            socketio.emit('new_alerts', format_alerts([data]))
+            emit_stat_changes()
+        elif kind == ALERT_READ:
+            socketio.emit('new_alerts', [{'id': data['id'], 'is_read': True}])
+    except Exception as e:
+        print(f"Error emitting {kind} update: {e}")
+
+# Subscribed after stats_engine, so its counters already include the event
+bus.subscribe(on_event)
+
 def background_task():
-    """Background task to emit updates to connected clients"""
+    """Background task for changes no write event announces (reconciles, hour and day rollover)"""
     while True:
         try:
-            # Get and format activities
-            activities = get_recent_activities(5)
-            formatted_activities = format_activities(activities)
-            socketio.emit('new_activities', formatted_activities)
-            
-            # Get and format alerts
-            alerts = get_recent_alerts(5)
-            formatted_alerts = format_alerts(alerts)
-            socketio.emit('new_alerts', formatted_alerts)
-            
-            # Get and format stats
-            stats = get_daily_stats()
-            formatted_stats = format_stats(stats)
-            socketio.emit('stats_update', formatted_stats)
-            
-            # Get and format occupancy data
-            occupancy_data = get_hourly_occupancy()
-            formatted_occupancy = []
-            for entry in occupancy_data:
-                formatted_entry = entry.copy()
-                formatted_entry['hour'] = serialize_datetime(entry['hour']) if isinstance(entry['hour'], datetime) else entry['hour']
-                for key, value in formatted_entry.items():
-                    if isinstance(value, Decimal):
-                        formatted_entry[key] = float(value)
-                formatted_occupancy.append(formatted_entry)
-            socketio.emit('occupancy_update', formatted_occupancy)
-            
+            emit_stat_changes()
         except Exception as e:
             print(f"Error in background task: {e}")
             import traceback
             print(traceback.format_exc())
             
-        socketio.sleep(5)
+        socketio.sleep(30)
 
 @app.route('/')
 def dashboard():
     return render_template('dashboard.html')
 
 @app.route('/api/activities')
+@cache.cached(ttl=30, invalidate_on=(ENTRY, PAYMENT, EXIT))
 def get_activities():
     activities = get_recent_activities(50)
     return jsonify(format_activities(activities))
 
 @app.route('/api/alerts')
+@cache.cached(ttl=30, invalidate_on=(ALERT, ALERT_READ))
 def get_alerts():
     alerts = get_recent_alerts(50)
     return jsonify(format_alerts(alerts))
 
+HISTORY_COLUMNS = ['id', 'plate_number', 'payment_status', 'entry_timestamp',
+                   'exit_timestamp', 'payment_timestamp', 'amount_paid', 'cursor']
+
+@app.route('/api/history')
+def history():
+    """
+    Stream parking history newest first as NDJSON (default) or CSV (?format=csv).
+    Filters: plate, from / to (ISO dates or datetimes, to exclusive), limit.
+    Every row carries a cursor; pass the last one as ?after= to continue.
+    """
+    try:
+        start = datetime.fromisoformat(request.args['from']) if request.args.get('from') else None
+        end = datetime.fromisoformat(request.args['to']) if request.args.get('to') else None
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+        if request.args.get('after'):
+            parse_history_cursor(request.args['after'])
+        history_rows = iter_parking_history(
+            plate_number=request.args.get('plate', '').strip().upper() or None,
+            start=start,
+            end=end,
+            after=request.args.get('after') or None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    as_csv = request.args.get('format') == 'csv'
+
+    def rows():
+        for count, entry in enumerate(history_rows):
+            if limit is not None and count >= limit:
+                break
+            formatted = format_activities([entry])[0]
+            formatted['cursor'] = history_cursor(entry)
+            yield formatted
+
+    def generate():
+        try:
+            if as_csv:
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=HISTORY_COLUMNS)
+                writer.writeheader()
+                for row in rows():
+                    writer.writerow(row)
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                yield buffer.getvalue()
+            else:
+                for row in rows():
+                    yield json.dumps(row, default=float) + '\n'
+        finally:
+            history_rows.close()
+
+    if as_csv:
+        return Response(stream_with_context(generate()), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=parking_history.csv'})
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/mark-alert-read/<int:alert_id>')
 def mark_alert_read(alert_id):
     success = mark_alert_as_read(alert_id)
     return jsonify({'success': success})
 
 @app.route('/api/stats/daily')
+@cache.cached(ttl=30, invalidate_on=(ENTRY, PAYMENT, EXIT, ALERT))
 def daily_stats():
-    stats = get_daily_stats()
-    return jsonify(format_stats(stats))
+    return jsonify(format_stats(stats_engine.daily()))
 
 @app.route('/api/stats/occupancy')
+@cache.cached(ttl=60, invalidate_on=(ENTRY, EXIT))
 def hourly_occupancy():
-    stats = get_hourly_occupancy()
-    formatted_stats = []
-    for entry in stats:
-        formatted_entry = entry.copy()
-        formatted_entry['hour'] = serialize_datetime(entry['hour']) if isinstance(entry['hour'], datetime) else entry['hour']
-        for key, value in formatted_entry.items():
-            if isinstance(value, Decimal):
-                formatted_entry[key] = float(value)
-        formatted_stats.append(formatted_entry)
-    return jsonify(formatted_stats)
+    return jsonify(stats_engine.hourly())
 
 @app.route('/api/stats/revenue')
+@cache.cached(ttl=300, invalidate_on=(PAYMENT,))
 def weekly_revenue():
-    stats = get_weekly_revenue()
-    formatted_stats = []
-    for entry in stats:
-        formatted_entry = entry.copy()
-        formatted_entry['date'] = serialize_datetime(entry['date']) if isinstance(entry['date'], datetime) else entry['date']
-        formatted_entry['revenue'] = serialize_decimal(entry['revenue'])
-        formatted_stats.append(formatted_entry)
-    return jsonify(formatted_stats)
+    return jsonify(stats_engine.weekly_revenue())
+
+@app.route('/api/stats/report')
+@cache.cached(ttl=300, invalidate_on=(ENTRY, PAYMENT, EXIT))
+def period_report():
+    """
+    Totals per ?period= (day, week, month or year; default month) from the daily rollup.
+    Range: from / to as ISO dates, to exclusive; defaults to the last 12 months.
+    """
+    try:
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else date.today() + timedelta(days=1)
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else end - timedelta(days=366)
+        return jsonify(get_period_report(start, end, request.args.get('period', 'month')))
+    except ValueError as e:
+        return make_response(jsonify({'error': str(e)}), 400)
+
+@app.route('/api/stats/engine')
+def stats_engine_status():
+    return jsonify({**stats_engine.stats(), 'listener': listener.stats()})
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    return jsonify(cache.stats())
+
+@app.route('/api/db/stats')
+def database_stats():
+    return jsonify(db_stats())
 
 @socketio.on('connect')
 def handle_connect():
@@ -161,5 +264,7 @@ def handle_connect():
             thread = socketio.start_background_task(background_task)
     print('Client connected')
 
+listener.start()
+
 if __name__ == '__main__':
     socketio.run(app, debug=True, allow_unsafe_werkzeug=True) 
\ No newline at end of file
@@ -0,0 +1,338 @@
+"""
+asyncio variant of db_operations on asyncpg.
+
+Every function mirrors its db_operations namesake with an async_ prefix,
+runs the same SQL (db_config.STATEMENTS, which asyncpg prepares and caches
+per connection) and keeps the occupancy index and event bus in step, so
+one event loop can serve many lanes, the dashboard and payment terminals
+without a thread per blocking query.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import asyncpg
+
+from db_config import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, STATEMENTS, query_latency
+import db_operations
+from db_operations import _entry_row, history_query, history_cursor
+from events import bus, ENTRY, PAYMENT, EXIT, ALERT, ALERT_READ
+from occupancy_index import occupancy, WARM_OCCUPANCY
+
+_pool = None
+_pool_lock = asyncio.Lock()
+pool_settings = {'min_size': 1, 'max_size': 20, 'server_settings': {}}
+
+
+async def get_pool():
+    """The process-wide asyncpg pool, created on first use"""
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await asyncpg.create_pool(
+                database=DB_NAME, user=DB_USER, password=DB_PASSWORD,
+                host=DB_HOST, port=int(DB_PORT),
+                min_size=pool_settings['min_size'],
+                max_size=pool_settings['max_size'],
+                server_settings=pool_settings['server_settings']
+            )
+        return _pool
+
+
+async def close_pool():
+    """Close the pool; the next call to get_pool() (e.g. on a new event loop) opens a fresh one"""
+    global _pool, _pool_lock
+    async with _pool_lock:
+        if _pool is not None:
+            await _pool.close()
+            _pool = None
+    _pool_lock = asyncio.Lock()
+
+
+async def _run(method, name, *args):
+    """Run a registered statement with the given asyncpg method ('fetch', 'fetchrow', 'fetchval')"""
+    pool = await get_pool()
+    loop = asyncio.get_running_loop()
+    async with pool.acquire() as conn:
+        started = loop.time()
+        result = await getattr(conn, method)(STATEMENTS[name], *args)
+    query_latency[name].observe((loop.time() - started) * 1000)
+    return result
+
+
+async def _occupancy_ready():
+    """Like occupancy.is_ready(), but warms the index without blocking the loop"""
+    if not occupancy.is_fresh():
+        await async_warm_occupancy()
+    return occupancy.is_fresh()
+
+
+async def async_warm_occupancy():
+    try:
+        return occupancy.load(await _run('fetch', WARM_OCCUPANCY))
+    except Exception as e:
+        print(f"Error warming occupancy index: {e}")
+        return 0
+
+
+async def async_add_parking_entry(plate_number):
+    """Add a new parking entry"""
+    try:
+        entry_timestamp = datetime.now()
+        entry_id = await _run('fetchval', db_operations.ADD_PARKING_ENTRY, plate_number, entry_timestamp)
+        occupancy.record_entry(entry_id, plate_number, entry_timestamp)
+        bus.publish(ENTRY, _entry_row(
+            (entry_id, plate_number, False, entry_timestamp, None, None, None)))
+        return entry_id
+    except Exception as e:
+        print(f"Error adding parking entry: {e}")
+        return None
+
+
+async def async_update_payment_status(plate_number, entry_timestamp, amount_paid):
+    """Update payment status for a parking entry"""
+    try:
+        updated = await _run('fetchrow', db_operations.UPDATE_PAYMENT_STATUS,
+                             datetime.now(), amount_paid, plate_number, entry_timestamp)
+        if updated is not None:
+            occupancy.record_payment(plate_number, entry_timestamp)
+            bus.publish(PAYMENT, _entry_row(updated))
+        return updated is not None
+    except Exception as e:
+        print(f"Error updating payment status: {e}")
+        return False
+
+
+async def async_update_exit_timestamp(plate_number):
+    """Update exit timestamp for the latest entry of a plate"""
+    try:
+        updated = await _run('fetchrow', db_operations.UPDATE_EXIT_TIMESTAMP, datetime.now(), plate_number)
+        if updated is not None:
+            occupancy.record_exit(plate_number)
+            bus.publish(EXIT, _entry_row(updated))
+        return updated is not None
+    except Exception as e:
+        print(f"Error updating exit timestamp: {e}")
+        return False
+
+
+async def async_add_alert(alert_type, plate_number, message):
+    """Add a new alert to the system"""
+    try:
+        row = await _run('fetchrow', db_operations.ADD_ALERT, alert_type, plate_number, message)
+        alert_id, timestamp = row
+        bus.publish(ALERT, {
+            'id': alert_id,
+            'alert_type': alert_type,
+            'plate_number': plate_number,
+            'message': message,
+            'timestamp': timestamp,
+            'is_read': False
+        })
+        return alert_id
+    except Exception as e:
+        print(f"Error adding alert: {e}")
+        return None
+
+
+async def async_get_recent_alerts(limit=50):
+    """Get recent alerts"""
+    try:
+        alerts = await _run('fetch', db_operations.GET_RECENT_ALERTS, limit)
+        return [{
+            'id': alert[0],
+            'alert_type': alert[1],
+            'plate_number': alert[2],
+            'message': alert[3],
+            'timestamp': alert[4],
+            'is_read': alert[5]
+        } for alert in alerts]
+    except Exception as e:
+        print(f"Error getting alerts: {e}")
+        return []
+
+
+async def async_mark_alert_as_read(alert_id):
+    """Mark an alert as read"""
+    try:
+        updated_id = await _run('fetchval', db_operations.MARK_ALERT_AS_READ, alert_id)
+        if updated_id is not None:
+            bus.publish(ALERT_READ, {'id': alert_id, 'is_read': True})
+        return updated_id is not None
+    except Exception as e:
+        print(f"Error marking alert as read: {e}")
+        return False
+
+
+async def async_is_payment_complete(plate_number):
+    """Check if payment is complete for the latest entry of a plate"""
+    entry = occupancy.get(plate_number) if await _occupancy_ready() else None
+    if entry and entry['payment_status']:
+        return True
+    try:
+        paid = await _run('fetchval', db_operations.IS_PAYMENT_COMPLETE, plate_number)
+        return bool(paid)
+    except Exception as e:
+        print(f"Error checking payment status: {e}")
+        return False
+
+
+async def async_get_last_unpaid_entry(plate_number):
+    """Get the last unpaid entry for a plate"""
+    entry = occupancy.get(plate_number) if await _occupancy_ready() else None
+    if entry and not entry['payment_status']:
+        return {
+            'id': entry['id'],
+            'plate_number': plate_number,
+            'entry_timestamp': entry['entry_timestamp']
+        }
+    try:
+        result = await _run('fetchrow', db_operations.GET_LAST_UNPAID_ENTRY, plate_number)
+        if result:
+            return {
+                'id': result[0],
+                'plate_number': result[1],
+                'entry_timestamp': result[2]
+            }
+        return None
+    except Exception as e:
+        print(f"Error getting last unpaid entry: {e}")
+        return None
+
+
+async def async_get_parking_history(plate_number, limit=10):
+    """Get parking history for a plate number"""
+    try:
+        return [_entry_row(row) for row in
+                await _run('fetch', db_operations.GET_PARKING_HISTORY, plate_number, limit)]
+    except Exception as e:
+        print(f"Error getting parking history: {e}")
+        return []
+
+
+async def async_iter_parking_history(plate_number=None, start=None, end=None, after=None, page_size=500):
+    """Async generator over iter_parking_history()'s rows, in keyset pages; a pool
+    connection is only held while a page is fetched"""
+    pool = await get_pool()
+    while True:
+        sql, params = history_query(plate_number, start, end, after, limit=page_size,
+                                    placeholder=lambda n: f"${n}")
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(sql, *params)
+
+        for row in rows:
+            yield _entry_row(row)
+        if len(rows) < page_size:
+            return
+        after = history_cursor(_entry_row(rows[-1]))
+
+
+async def async_get_parking_history_page(plate_number=None, start=None, end=None, after=None, limit=100):
+    """One page of history; returns (entries, cursor of the next page or None)"""
+    entries = []
+    history = async_iter_parking_history(plate_number, start, end, after, page_size=limit + 1)
+    try:
+        async for entry in history:
+            if len(entries) == limit:
+                return entries, history_cursor(entries[-1])
+            entries.append(entry)
+        return entries, None
+    except Exception as e:
+        print(f"Error getting parking history page: {e}")
+        return entries, None
+    finally:
+        await history.aclose()
+
+
+async def async_get_recent_activities(limit=50):
+    """Get recent parking activities including entries, exits, and payments"""
+    try:
+        return [_entry_row(row) for row in
+                await _run('fetch', db_operations.GET_RECENT_ACTIVITIES, limit)]
+    except Exception as e:
+        print(f"Error getting recent activities: {e}")
+        return []
+
+
+async def async_get_daily_stats():
+    """Get daily statistics"""
+    try:
+        today = datetime.combine(datetime.now().date(), datetime.min.time())
+        result = await _run('fetchrow', db_operations.GET_DAILY_STATS, today, today + timedelta(days=1))
+        return {
+            'total_entries': result[0],
+            'total_exits': result[1],
+            'total_paid': result[2],
+            'total_revenue': float(result[3]),
+            'current_occupancy': result[4],
+            'total_alerts': result[5]
+        }
+    except Exception as e:
+        print(f"Error getting daily stats: {e}")
+        return {}
+
+
+async def async_get_hourly_occupancy():
+    """Get hourly occupancy for the last 24 hours"""
+    try:
+        return [{
+            'hour': result[0].strftime('%Y-%m-%d %H:%M:%S'),
+            'entries': result[1],
+            'exits': result[2]
+        } for result in await _run('fetch', db_operations.GET_HOURLY_OCCUPANCY)]
+    except Exception as e:
+        print(f"Error getting hourly occupancy: {e}")
+        return []
+
+
+async def async_get_weekly_revenue():
+    """Get daily revenue for the last 7 days"""
+    try:
+        return [{
+            'date': result[0].strftime('%Y-%m-%d'),
+            'revenue': float(result[1]),
+            'transactions': result[2]
+        } for result in await _run('fetch', db_operations.GET_WEEKLY_REVENUE)]
+    except Exception as e:
+        print(f"Error getting weekly revenue: {e}")
+        return []
+
+
+async def async_get_peak_hours():
+    """Get peak hours analysis"""
+    try:
+        return [{
+            'hour': int(result[0]),
+            'entries': result[1]
+        } for result in await _run('fetch', db_operations.GET_PEAK_HOURS)]
+    except Exception as e:
+        print(f"Error getting peak hours: {e}")
+        return []
+
+
+async def async_get_period_report(start, end, period='month'):
+    """Entries, exits, payments and revenue per day, week, month or year from start up to end (exclusive)"""
+    if period not in db_operations.REPORT_PERIODS:
+        raise ValueError(f"period must be one of {', '.join(db_operations.REPORT_PERIODS)}")
+    try:
+        return [{
+            'period': result[0].strftime('%Y-%m-%d'),
+            'entries': int(result[1]),
+            'exits': int(result[2]),
+            'payments': int(result[3]),
+            'revenue': float(result[4])
+        } for result in await _run('fetch', db_operations.GET_PERIOD_REPORT, start, end, period)]
+    except Exception as e:
+        print(f"Error getting period report: {e}")
+        return []
+
+
+async def async_is_vehicle_inside(plate_number):
+    """Check if a vehicle is currently in the parking lot (always asked of the DB, see db_operations)"""
+    try:
+        inside = await _run('fetchval', db_operations.IS_VEHICLE_INSIDE, plate_number)
+        if not inside:
+            occupancy.record_exit(plate_number)
+        return inside
+    except Exception as e:
+        print(f"Error checking vehicle status: {e}")
+        return occupancy.get(plate_number) is not None
@@ -0,0 +1,184 @@
+"""
+Load test: blocking db_operations on threads vs async_db_operations on one event loop.
+
+Each simulated client runs full vehicle cycles (inside check, entry, unpaid
+lookup, payment, paid check, exit, dashboard feed) against a scratch schema
+until the duration is up. Reports cycles/s, queries/s and per-query latency
+for each concurrency level.
+
+    python bench_db_load.py --concurrency 4 16 64 --duration 20
+"""
+import os
+
+SCHEMA = 'load_test'
+# Every libpq connection of this process (the psycopg2 pool included) works in the scratch schema
+os.environ['PGOPTIONS'] = f"-c search_path={SCHEMA}"
+
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import async_db_operations as adb
+import db_operations as db
+from db_config import get_db_connection, release_db_connection
+from migrations import apply_migrations
+
+QUERIES_PER_CYCLE = 7
+
+
+def plate_for(client, cycle):
+    return f"RZ{chr(65 + client % 26)}{cycle % 1000:03d}{chr(65 + (client // 26) % 26)}"
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.cycles = 0
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.latencies[name].append(seconds * 1000)
+
+    def cycle_done(self):
+        with self._lock:
+            self.cycles += 1
+
+
+def sync_cycle(client, cycle, recorder):
+    plate = plate_for(client, cycle)
+    steps = [
+        ('is_vehicle_inside', lambda: db.is_vehicle_inside(plate)),
+        ('add_parking_entry', lambda: db.add_parking_entry(plate)),
+        ('get_last_unpaid_entry', lambda: db.get_last_unpaid_entry(plate)),
+    ]
+    entry = None
+    for name, step in steps:
+        started = time.perf_counter()
+        entry = step()
+        recorder.add(name, time.perf_counter() - started)
+    if entry is None:
+        return
+    for name, step in [
+        ('update_payment_status', lambda: db.update_payment_status(plate, entry['entry_timestamp'], 500)),
+        ('is_payment_complete', lambda: db.is_payment_complete(plate)),
+        ('update_exit_timestamp', lambda: db.update_exit_timestamp(plate)),
+        ('get_recent_activities', lambda: db.get_recent_activities(50)),
+    ]:
+        started = time.perf_counter()
+        step()
+        recorder.add(name, time.perf_counter() - started)
+    recorder.cycle_done()
+
+
+async def async_cycle(client, cycle, recorder):
+    plate = plate_for(client, cycle)
+    entry = None
+    for name, step in [
+        ('is_vehicle_inside', lambda: adb.async_is_vehicle_inside(plate)),
+        ('add_parking_entry', lambda: adb.async_add_parking_entry(plate)),
+        ('get_last_unpaid_entry', lambda: adb.async_get_last_unpaid_entry(plate)),
+    ]:
+        started = time.perf_counter()
+        entry = await step()
+        recorder.add(name, time.perf_counter() - started)
+    if entry is None:
+        return
+    for name, step in [
+        ('update_payment_status', lambda: adb.async_update_payment_status(plate, entry['entry_timestamp'], 500)),
+        ('is_payment_complete', lambda: adb.async_is_payment_complete(plate)),
+        ('update_exit_timestamp', lambda: adb.async_update_exit_timestamp(plate)),
+        ('get_recent_activities', lambda: adb.async_get_recent_activities(50)),
+    ]:
+        started = time.perf_counter()
+        await step()
+        recorder.add(name, time.perf_counter() - started)
+    recorder.cycle_done()
+
+
+def run_sync(concurrency, duration):
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+
+    def client(n):
+        cycle = 0
+        while time.monotonic() < deadline:
+            sync_cycle(n, cycle, recorder)
+            cycle += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    return recorder, time.perf_counter() - started
+
+
+async def run_async(concurrency, duration):
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+
+    async def client(n):
+        cycle = 0
+        while time.monotonic() < deadline:
+            await async_cycle(n, cycle, recorder)
+            cycle += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    # The pool belongs to this asyncio.run() loop
+    await adb.close_pool()
+    return recorder, elapsed
+
+
+def report(label, concurrency, recorder, elapsed):
+    print(f"{label:<6} c={concurrency:<4} {recorder.cycles / elapsed:8.1f} cycles/s "
+          f"{recorder.cycles * QUERIES_PER_CYCLE / elapsed:9.1f} queries/s")
+    for name, values in sorted(recorder.latencies.items()):
+        values.sort()
+        print(f"         {name:<24} p50={statistics.median(values):7.2f} ms  "
+              f"p95={values[max(0, int(len(values) * 0.95) - 1)]:7.2f} ms")
+
+
+def reset_schema(drop_only=False):
+    conn = get_db_connection()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            if not drop_only:
+                cur.execute(f"CREATE SCHEMA {SCHEMA}")
+        conn.autocommit = False
+        if not drop_only:
+            apply_migrations(conn)
+    finally:
+        release_db_connection(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async database load test")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--duration', type=float, default=20.0, help="seconds per run")
+    parser.add_argument('--async-pool-size', type=int, default=20)
+    parser.add_argument('--keep', action='store_true', help=f"keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+
+    adb.pool_settings.update(max_size=args.async_pool_size,
+                             server_settings={'search_path': SCHEMA})
+    reset_schema()
+    try:
+        for concurrency in args.concurrency:
+            recorder, elapsed = run_sync(concurrency, args.duration)
+            report('sync', concurrency, recorder, elapsed)
+            recorder, elapsed = asyncio.run(run_async(concurrency, args.duration))
+            report('async', concurrency, recorder, elapsed)
+    finally:
+        if not args.keep:
+            reset_schema(drop_only=True)
+
+
+if __name__ == "__main__":
+    main()
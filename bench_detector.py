@@ -0,0 +1,167 @@
+"""
+Compare plate detector backends on dataset/val: latency, memory and mAP.
+
+Each backend runs in its own process, so its memory figure is its own:
+model load, warm-up, then every validation image one frame at a time, as a
+gate calls it. Detections are scored against the YOLO labels next to the
+images (mAP@0.5 and mAP@0.5:0.95, single class).
+
+    python detector_backends.py export --int8
+    python bench_detector.py ultralytics:best.pt onnx:best.onnx onnx:best.int8.onnx
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 2 ** 20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def load_val(images_dir):
+    """(image path, ground-truth xyxy boxes in pixels) for every image in images_dir"""
+    labels_dir = os.path.join(os.path.dirname(images_dir.rstrip('/\\')), 'labels')
+    samples = []
+    for name in sorted(os.listdir(images_dir)):
+        if not name.lower().endswith(('.jpg', '.jpeg', '.png')):
+            continue
+        path = os.path.join(images_dir, name)
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        h, w = frame.shape[:2]
+        boxes = []
+        label_path = os.path.join(labels_dir, os.path.splitext(name)[0] + '.txt')
+        if os.path.exists(label_path):
+            with open(label_path) as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) != 5:
+                        continue
+                    cx, cy, bw, bh = (float(v) for v in parts[1:])
+                    boxes.append(((cx - bw / 2) * w, (cy - bh / 2) * h, (cx + bw / 2) * w, (cy + bh / 2) * h))
+        samples.append((path, boxes))
+    return samples
+
+
+def box_iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def average_precision(detections, truths, threshold):
+    """COCO-style 101-point AP; detections are (image index, confidence, box), truths a list of boxes per image"""
+    total = sum(len(boxes) for boxes in truths)
+    if not total:
+        return 0.0
+    matched = [[False] * len(boxes) for boxes in truths]
+    hits = []
+    for image, _, box in sorted(detections, key=lambda d: -d[1]):
+        overlaps = [box_iou(box, truth) for truth in truths[image]]
+        best = int(np.argmax(overlaps)) if overlaps else -1
+        hit = best >= 0 and overlaps[best] >= threshold and not matched[image][best]
+        if hit:
+            matched[image][best] = True
+        hits.append(hit)
+    if not hits:
+        return 0.0
+    tp = np.cumsum(hits)
+    recall = tp / total
+    precision = tp / np.arange(1, len(hits) + 1)
+    # Precision envelope, sampled at 101 recall points
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    points = np.linspace(0, 1, 101)
+    indices = np.searchsorted(recall, points, side='left')
+    return float(np.mean([precision[i] if i < len(precision) else 0.0 for i in indices]))
+
+
+def run_worker(backend, model_path, images_dir, warmup):
+    """Benchmark one backend in this process; returns a dict of results"""
+    from detector_backends import get_detector
+    from anpr import boxes_from_result
+
+    samples = load_val(images_dir)
+    baseline_mb = peak_rss_mb()
+    started = time.perf_counter()
+    detector = get_detector(model_path, backend)
+    load_s = time.perf_counter() - started
+
+    frames = [cv2.imread(path) for path, _ in samples]
+    for frame in frames[:warmup]:
+        detector.predict([frame])
+
+    latencies, detections = [], []
+    for image, frame in enumerate(frames):
+        started = time.perf_counter()
+        result = detector.predict([frame])[0]
+        latencies.append((time.perf_counter() - started) * 1000)
+        detections += [(image, conf, (x1, y1, x2, y2))
+                       for x1, y1, x2, y2, conf in boxes_from_result(result)]
+
+    truths = [boxes for _, boxes in samples]
+    aps = [average_precision(detections, truths, t) for t in IOU_THRESHOLDS]
+    latencies.sort()
+    return {
+        'backend': f"{backend}:{model_path}",
+        'images': len(frames),
+        'load_s': round(load_s, 2),
+        'p50_ms': round(latencies[len(latencies) // 2], 1),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'model_rss_mb': round(peak_rss_mb() - baseline_mb, 1),
+        'map50': round(aps[0], 4),
+        'map50_95': round(float(np.mean(aps)), 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detector backend benchmark on the validation set")
+    parser.add_argument('backends', nargs='*',
+                        default=['ultralytics:best.pt', 'onnx:best.onnx', 'onnx:best.int8.onnx'],
+                        help="backend:model pairs")
+    parser.add_argument('--images', default='dataset/val/images')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        backend, model_path = args.worker.split(':', 1)
+        print(json.dumps(run_worker(backend, model_path, args.images, args.warmup)))
+        return
+
+    print(f"{'backend':<32} {'load':>6} {'p50':>8} {'p95':>8} {'peak RSS':>9} {'model':>8} "
+          f"{'mAP50':>7} {'mAP50-95':>9}")
+    for spec in args.backends:
+        completed = subprocess.run(
+            [sys.executable, __file__, '--worker', spec, '--images', args.images,
+             '--warmup', str(args.warmup)],
+            capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"{spec:<32} failed: {completed.stderr.strip().splitlines()[-1:]}")
+            continue
+        r = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(f"{r['backend']:<32} {r['load_s']:>5}s {r['p50_ms']:>6}ms {r['p95_ms']:>6}ms "
+              f"{r['peak_rss_mb']:>7}MB {r['model_rss_mb']:>6}MB {r['map50']:>7.3f} {r['map50_95']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
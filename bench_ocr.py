@@ -0,0 +1,115 @@
+import argparse
+import os
+import time
+
+import cv2
+
+from anpr import preprocess_plate, parse_plate, is_valid_plate
+from ocr_backends import get_backend, KNNBackend, KNN_MODEL_PATH
+from ocr_cache import dhash, hamming
+
+
+def load_labelled_crops(plates_dir, raw=False):
+    """Binarized (or with raw, untouched) crops from plates/ (including its date shards), labelled by the plate number in their file name"""
+    crops = []
+    for directory, _, names in sorted(os.walk(plates_dir)):
+        for name in sorted(names):
+            label = name.split('_')[0]
+            if not name.lower().endswith('.jpg') or not is_valid_plate(label):
+                continue
+            img = cv2.imread(os.path.join(directory, name))
+            if img is not None and img.size:
+                crops.append((img if raw else preprocess_plate(img), label))
+    return crops
+
+
+def cache_collisions(crops, max_distance):
+    """
+    How often two crops fall within max_distance dHash bits of each other,
+    for pairs of the same plate (hits the OCR cache could serve) and of
+    different plates (hits that would return the wrong plate)
+    """
+    hashes = [(dhash(crop), label) for crop, label in crops]
+    same = [0, 0]
+    different = [0, 0]
+    for i, (a, label_a) in enumerate(hashes):
+        for b, label_b in hashes[i + 1:]:
+            pairs = same if label_a == label_b else different
+            pairs[0] += hamming(a, b) <= max_distance
+            pairs[1] += 1
+    return same, different
+
+
+def score(texts, labels):
+    """Exact-plate and per-character accuracy of raw OCR output"""
+    exact = chars = 0
+    for text, label in zip(texts, labels):
+        exact += parse_plate(text) == label
+        start_idx = max(text.find("RA"), 0)
+        chars += sum(a == b for a, b in zip(text[start_idx:start_idx + 7], label))
+    return exact / len(labels), chars / (7 * len(labels))
+
+
+def benchmark(name, backend, threshes, labels):
+    # One crop at a time, as the gate loop calls it
+    started = time.perf_counter()
+    texts = [backend.read(thresh) for thresh in threshes]
+    single_ms = 1000 * (time.perf_counter() - started) / len(threshes)
+
+    started = time.perf_counter()
+    backend.read_batch(threshes)
+    batch_ms = 1000 * (time.perf_counter() - started) / len(threshes)
+
+    exact, chars = score(texts, labels)
+    print(f"[BENCH] {name:<10} {single_ms:8.1f} ms/plate  {batch_ms:8.1f} ms/plate batched  "
+          f"plate acc {exact:6.1%}  char acc {chars:6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OCR backends on the labelled crops in plates/")
+    parser.add_argument('--dir', default='plates')
+    parser.add_argument('--backends', nargs='+', default=['tesseract', 'tesserocr', 'knn'])
+    parser.add_argument('--save-knn', action='store_true',
+                        help=f"train the kNN backend on every labelled crop and save it to {KNN_MODEL_PATH}")
+    parser.add_argument('--cache-distance', type=int,
+                        help="instead, check the OCR cache's Hamming tolerance against the labelled crops")
+    args = parser.parse_args()
+
+    if args.cache_distance is not None:
+        same, different = cache_collisions(load_labelled_crops(args.dir, raw=True), args.cache_distance)
+        print(f"[BENCH] within {args.cache_distance} bits: same plate {same[0]}/{same[1]} pairs, "
+              f"different plates {different[0]}/{different[1]} pairs (wrong cache hits)")
+        return
+
+    crops = load_labelled_crops(args.dir)
+    if len(crops) < 2:
+        print(f"[ERROR] Need labelled crops (e.g. RAD317L_20250602_124351.jpg) in {args.dir}")
+        return
+
+    # Labels are the reads the gate accepted, so accuracy is agreement with them.
+    # The kNN backend trains on the even crops; everything is scored on the odd ones.
+    train, held_out = crops[::2], crops[1::2]
+    threshes = [thresh for thresh, _ in held_out]
+    labels = [label for _, label in held_out]
+    print(f"[BENCH] {len(crops)} labelled crops, scoring on {len(held_out)}")
+
+    for name in args.backends:
+        try:
+            if name == 'knn':
+                backend = KNNBackend()
+                samples = backend.train(train, save=False)
+                print(f"[BENCH] knn trained on {samples} character samples")
+            else:
+                backend = get_backend(name)
+        except Exception as e:
+            print(f"[BENCH] {name:<10} unavailable: {e}")
+            continue
+        benchmark(name, backend, threshes, labels)
+
+    if args.save_knn:
+        samples = KNNBackend().train(crops)
+        print(f"[SAVED] kNN OCR model ({samples} samples) -> {KNN_MODEL_PATH}")
+
+
+if __name__ == "__main__":
+    main()
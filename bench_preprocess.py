@@ -0,0 +1,99 @@
+"""
+Frames-to-first-valid-read on recorded gate footage, per preprocessing mode.
+
+The video is detected and tracked once; every vehicle's plate crops are then
+OCR'd frame by frame under each mode (top-k 0 is the fixed Otsu pass,
+top-k N sends the N best-scoring candidates from preprocess.py) through the
+engine's production read path (read_candidates + plate_decoder, OCR cache
+off) until the first plate that decodes. "ms to read" is the OCR time a
+vehicle costs before that read. The default (ANPR_PREPROCESS_TOP_K=2) should
+stay ahead of top-k 0 on it; rerun this on a lane's footage before changing it.
+
+    python bench_preprocess.py recordings/entry.mp4 --top-k 0 1 2 3 --lane entry
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from anpr import get_engine, boxes_from_result, load_lanes, LaneConfig, MODEL_PATH
+from tracker import PlateTracker
+
+
+def collect_tracks(engine, source, lane, min_frames):
+    """{track id: [plate crop per frame it was seen in]} for every vehicle in the video"""
+    cap = cv2.VideoCapture(source)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25
+    tracker = PlateTracker()
+    tracks, index = {}, 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        boxes = boxes_from_result(engine.detect_lanes([frame], [lane])[0])
+        # Video time, not wall time, so track ageing doesn't depend on detector speed
+        for (x1, y1, x2, y2, _), track_id in zip(boxes, tracker.update(boxes, now=index / fps)):
+            crop = frame[y1:y2, x1:x2]
+            if crop.size:
+                tracks.setdefault(track_id, []).append(crop)
+        index += 1
+    cap.release()
+    return {track_id: crops for track_id, crops in tracks.items() if len(crops) >= min_frames}, index
+
+
+def frames_to_first_read(engine, crops):
+    """(frames until the first valid read or None, OCR backend calls, seconds spent)"""
+    calls, started = 0, time.perf_counter()
+    for frame_index, crop in enumerate(crops, 1):
+        # The production path: candidates -> read_candidates -> plate_decoder
+        calls += max(engine.top_k, 1)
+        if engine.read_crop(crop).plate:
+            return frame_index, calls, time.perf_counter() - started
+    return None, calls, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frames-to-first-valid-read per preprocessing mode")
+    parser.add_argument('source', help="recorded gate video")
+    parser.add_argument('--top-k', type=int, nargs='+', default=[0, 1, 2, 3])
+    parser.add_argument('--lane', help="apply this lane's ROI and resolution from lanes.json")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--min-frames', type=int, default=3, help="ignore tracks seen in fewer frames")
+    args = parser.parse_args()
+
+    engine = get_engine(args.model)
+    # Every frame must really be OCR'd, or near-identical crops would be served from the cache
+    engine.ocr_cache = None
+    lane = load_lanes().get(args.lane, LaneConfig()) if args.lane else LaneConfig()
+    tracks, frames = collect_tracks(engine, args.source, lane, args.min_frames)
+    if not tracks:
+        print(f"[ERROR] No vehicle tracked for {args.min_frames}+ frames in {args.source}")
+        return
+    print(f"[BENCH] {frames} frames, {len(tracks)} vehicles")
+
+    print(f"{'top-k':<6} {'read':>8} {'mean':>6} {'median':>7} {'p90':>5} {'OCR calls':>10} {'ms/frame':>9} "
+          f"{'ms to read':>10}")
+    for k in args.top_k:
+        engine.top_k = k
+        firsts, to_read, calls, seconds, ocr_frames = [], [], 0, 0.0, 0
+        for crops in tracks.values():
+            first, track_calls, track_seconds = frames_to_first_read(engine, crops)
+            calls += track_calls
+            seconds += track_seconds
+            ocr_frames += first or len(crops)
+            if first:
+                firsts.append(first)
+                to_read.append(1000 * track_seconds)
+        read = f"{len(firsts)}/{len(tracks)}"
+        if firsts:
+            print(f"{k:<6} {read:>8} {np.mean(firsts):6.2f} {np.median(firsts):7.1f} "
+                  f"{np.percentile(firsts, 90):5.1f} {calls:>10} {1000 * seconds / ocr_frames:9.1f} "
+                  f"{np.mean(to_read):10.1f}")
+        else:
+            print(f"{k:<6} {read:>8} {'-':>6} {'-':>7} {'-':>5} {calls:>10} {1000 * seconds / ocr_frames:9.1f} "
+                  f"{'-':>10}")
+
+
+if __name__ == "__main__":
+    main()
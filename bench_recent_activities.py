@@ -0,0 +1,119 @@
+"""
+Benchmark the dashboard's recent activity feed before and after last_activity_at.
+
+For each table size, builds a scratch schema, applies the migrations, seeds
+synthetic entries (see check_query_plans.seed) and times the old
+GREATEST(...) ORDER BY against the indexed last_activity_at top-N read.
+
+    python bench_recent_activities.py --sizes 1000000 10000000
+"""
+import argparse
+import statistics
+import time
+
+from check_query_plans import seed, plan_nodes
+from db_config import get_db_connection, release_db_connection
+from migrations import apply_migrations
+
+SCHEMA = 'bench_activity'
+
+BEFORE = """
+    SELECT id, plate_number, payment_status, entry_timestamp,
+           exit_timestamp, payment_timestamp, amount_paid
+    FROM parking_entries
+    ORDER BY
+        GREATEST(
+            entry_timestamp,
+            COALESCE(exit_timestamp, '1970-01-01'),
+            COALESCE(payment_timestamp, '1970-01-01')
+        ) DESC
+    LIMIT %(limit)s
+"""
+
+AFTER = """
+    SELECT id, plate_number, payment_status, entry_timestamp,
+           exit_timestamp, payment_timestamp, amount_paid
+    FROM parking_entries
+    ORDER BY last_activity_at DESC, id DESC
+    LIMIT %(limit)s
+"""
+
+
+def time_query(cur, sql, params, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), sorted(timings)[int(len(timings) * 0.95) - 1]
+
+
+def plan_summary(cur, sql, params):
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+    plan = cur.fetchone()[0][0]['Plan']
+    nodes = list(plan_nodes(plan))
+    heap_fetches = sum(n.get('Heap Fetches', 0) for n in nodes)
+    buffers = plan.get('Shared Hit Blocks', 0) + plan.get('Shared Read Blocks', 0)
+    return ' > '.join(n['Node Type'] for n in nodes), heap_fetches, buffers
+
+
+def bench_size(conn, rows, args):
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cur.execute(f"CREATE SCHEMA {SCHEMA}")
+        cur.execute(f"SET search_path TO {SCHEMA}")
+    conn.autocommit = False
+    apply_migrations(conn)
+
+    print(f"\nSeeding {rows:,} entries...")
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        seed(cur, rows, args.days, args.open_entries)
+    conn.commit()
+    print(f"  seeded in {time.perf_counter() - started:.0f}s")
+
+    # Sets the visibility map so the covering index can answer without heap fetches
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("VACUUM ANALYZE parking_entries")
+    conn.autocommit = False
+
+    params = {'limit': args.limit}
+    with conn.cursor() as cur:
+        for label, sql in (('before', BEFORE), ('after', AFTER)):
+            p50, p95 = time_query(cur, sql, params, args.runs)
+            plan, heap_fetches, buffers = plan_summary(cur, sql, params)
+            print(f"  {label:<7} p50={p50:9.2f} ms  p95={p95:9.2f} ms  "
+                  f"buffers={buffers:<7} heap_fetches={heap_fetches:<5} {plan}")
+    conn.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recent activity feed benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--open-entries', type=int, default=300)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--keep', action='store_true', help=f"keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        for rows in args.sizes:
+            bench_size(conn, rows, args)
+    finally:
+        conn.rollback()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            if not args.keep:
+                cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            cur.execute("SET search_path TO DEFAULT")
+        conn.autocommit = False
+        release_db_connection(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Sweep detector input resolutions on dataset/val: speed vs plate recall.
+
+Modes are fixed sizes ("320") or adaptive low>high pairs ("320>640": scan at
+320, re-detect weak candidates at 640 around the candidate). With --lane the
+lane's ROI from lanes.json applies, so plates outside it count as misses.
+
+    python bench_resolution.py --modes 256 320 416 512 640 '256>640' '320>640' --lane entry
+"""
+import argparse
+import time
+
+import cv2
+
+from anpr import get_engine, boxes_from_result, load_lanes, LaneConfig, MODEL_PATH
+from bench_detector import load_val, box_iou
+
+
+def parse_mode(mode, roi, accept_conf):
+    low, _, high = mode.partition('>')
+    return LaneConfig(roi=roi, imgsz=int(low), refine_imgsz=int(high) if high else None,
+                      accept_conf=accept_conf)
+
+
+def evaluate(engine, lane, frames, truths, iou_threshold):
+    """Per-frame latency in ms, recall and precision at iou_threshold"""
+    latencies, matched, detected = [], 0, 0
+    for frame, truth in zip(frames, truths):
+        started = time.perf_counter()
+        result = engine.detect_lanes([frame], [lane])[0]
+        latencies.append((time.perf_counter() - started) * 1000)
+        boxes = boxes_from_result(result)
+        detected += len(boxes)
+        used = set()
+        for gt in truth:
+            overlaps = [(box_iou(gt, box[:4]), j) for j, box in enumerate(boxes) if j not in used]
+            best = max(overlaps, default=(0.0, None))
+            if best[0] >= iou_threshold:
+                used.add(best[1])
+                matched += 1
+    total = sum(len(truth) for truth in truths)
+    latencies.sort()
+    return (latencies[len(latencies) // 2], latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            matched / total if total else 0.0, matched / detected if detected else 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detector resolution sweep: speed vs recall")
+    parser.add_argument('--modes', nargs='+', default=['256', '320', '416', '512', '640', '320>640'])
+    parser.add_argument('--images', default='dataset/val/images')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--detector', choices=['auto', 'ultralytics', 'onnx'])
+    parser.add_argument('--lane', help="apply this lane's ROI from lanes.json")
+    parser.add_argument('--accept-conf', type=float, default=LaneConfig.accept_conf)
+    parser.add_argument('--iou', type=float, default=0.5)
+    parser.add_argument('--repeat', type=int, default=3, help="passes over the images per mode")
+    args = parser.parse_args()
+
+    roi = load_lanes().get(args.lane, LaneConfig()).roi if args.lane else None
+    samples = load_val(args.images)
+    frames = [cv2.imread(path) for path, _ in samples] * args.repeat
+    truths = [boxes for _, boxes in samples] * args.repeat
+    engine = get_engine(args.model, args.detector)
+    engine.detect_batch(frames[:1])  # model load and warm-up
+
+    print(f"[BENCH] {len(samples)} images x {args.repeat}, ROI {roi or 'full frame'}")
+    print(f"{'mode':<10} {'p50':>8} {'p95':>8} {'recall':>7} {'precision':>9}")
+    for mode in args.modes:
+        lane = parse_mode(mode, roi, args.accept_conf)
+        engine.detect_lanes(frames[:1], [lane])  # warm-up at this size
+        p50, p95, recall, precision = evaluate(engine, lane, frames, truths, args.iou)
+        print(f"{mode:<10} {p50:6.1f}ms {p95:6.1f}ms {recall:7.1%} {precision:9.1%}")
+
+
+if __name__ == "__main__":
+    main()
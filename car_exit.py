@@ -1,23 +1,26 @@
 import cv2
-from ultralytics import YOLO
-import pytesseract
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 import os
 import time
-import serial
+import queue
 import serial.tools.list_ports
-from collections import Counter
-import random
+from occupancy_index import occupancy
 from db_operations import (
     is_payment_complete,
     update_exit_timestamp,
     add_alert,
     get_last_unpaid_entry
 )
+from db_config import limit_retries, REQUEST_RETRY_WAIT
+from anpr import get_engine, is_valid_plate, boxes_from_result, load_lanes, LaneConfig
+from presence import PresenceGate, UltrasonicGate, MotionGate
+from tracker import PlateTracker
+from gate_controller import GateController
 import platform
 
-# Load YOLOv8 model (same model as entry)
-model = YOLO(r'best.pt')
+# Shared detect + OCR engine (same model as entry)
+engine = get_engine()
+# ROI and detection resolution for this camera, from lanes.json
+lane = load_lanes().get('exit', LaneConfig())
 
 # Initialize Arduino connection
 def detect_arduino_port():
@@ -35,32 +38,12 @@ def detect_arduino_port():
                 return port.device
     return None
 
-# Global arduino object
+# Gate controller owns the serial port (falls back to a fake serial backend)
 arduino_port = detect_arduino_port()
-arduino = None
-if arduino_port:
-    try:
-        arduino = serial.Serial(arduino_port, 9600, timeout=1)
-        time.sleep(2)  # Wait for Arduino to initialize
-        print(f"[CONNECTED] Arduino on {arduino_port}")
-    except Exception as e:
-        print(f"[ERROR] Failed to connect to Arduino: {e}")
-else:
+if not arduino_port:
     print("[ERROR] Arduino not detected.")
-
-def is_valid_plate(plate):
-    """Validate plate number format"""
-    if not plate or len(plate) != 7:
-        return False
-    
-    # Check format: 3 letters + 3 digits + 1 letter
-    prefix = plate[:3]
-    digits = plate[3:6]
-    suffix = plate[6]
-    
-    return (prefix.isalpha() and prefix.isupper() and
-            digits.isdigit() and 
-            suffix.isalpha() and suffix.isupper())
+gate = GateController(arduino_port)
+UNAUTHORIZED_COOLDOWN = 30  # seconds the scanner ignores plates after an unpaid exit attempt
 
 def parse_arduino_data(line):
     """Parse the data received from Arduino"""
@@ -99,50 +82,60 @@ def process_exit(plate):
         )
         print(f"[ALERT] Unauthorized exit attempt by {plate}")
         # Send multiple buzzer signals for better alert
-        if arduino:
-            for _ in range(3):  # Buzz 3 times
-                arduino.write(b'2')  # Trigger warning buzzer
-                time.sleep(0.1)
-                arduino.write(b'0')  # Stop buzzer
-                time.sleep(0.1)
-            print("[ALERT] Buzzer triggered multiple times")
+        gate.buzz(times=3, on=0.1, off=0.1)
+        print("[ALERT] Buzzer triggered multiple times")
         return False
 
-# ===== Ultrasonic Sensor (mock for now) =====
-def mock_ultrasonic_distance():
-    return random.choice([random.randint(10, 40)])
+# ===== Presence gating =====
+# Detection only runs while the lane is occupied: ultrasonic readings from the
+# serial link when present, frame differencing otherwise
+ultrasonic = UltrasonicGate(threshold_cm=50)
+presence = PresenceGate(ultrasonic=ultrasonic, motion=MotionGate(roi=lane.roi))
+
+# Every other line the Arduino prints (RFID plates) is handled by the main loop
+serial_lines = queue.Queue()
+
+def on_serial_line(line):
+    if not ultrasonic.feed_line(line):
+        serial_lines.put(line)
+
+gate.add_listener(on_serial_line)
+
+def reject_exit():
+    """Sound the alert and pause the scanner without blocking the loop"""
+    gate.alert(duration=UNAUTHORIZED_COOLDOWN)
+    print("[ALERT] Buzzer triggered (sent '2')")
+    return time.monotonic() + UNAUTHORIZED_COOLDOWN
 
 def main():
+    # Exit decisions run on this loop; a database outage must not freeze the camera for the pool's full backoff
+    limit_retries(REQUEST_RETRY_WAIT)
+
     # Initialize camera
     cap = cv2.VideoCapture(0)
-    plate_buffer = []
-    unauthorized_cooldown = 0  # Cooldown timer for unauthorized attempts
+    tracker = PlateTracker()
+    cooldown_until = 0  # Scanner ignores plates until then after an unauthorized attempt
 
+    # Gate decisions are answered from the in-memory occupancy index
+    print(f"[INDEX] {occupancy.warm()} vehicles currently inside")
     print("[EXIT SYSTEM] Ready. Press 'q' to quit.")
 
     try:
         while True:
-            # Check if we're in cooldown period after unauthorized attempt
-            if unauthorized_cooldown > 0:
-                unauthorized_cooldown -= 1
-                time.sleep(1)  # Wait 1 second
-                if unauthorized_cooldown == 0:
-                    print("[SYSTEM] Scanner reactivated after cooldown")
-                continue
+            in_cooldown = time.monotonic() < cooldown_until
+            if cooldown_until and not in_cooldown:
+                cooldown_until = 0
+                print("[SYSTEM] Scanner reactivated after cooldown")
 
             # Check for Arduino data
-            if arduino and arduino.in_waiting:
-                line = arduino.readline().decode().strip()
+            while not serial_lines.empty():
+                line = serial_lines.get_nowait()
                 print(f"[SERIAL] Received: {line}")
                 plate = parse_arduino_data(line)
-                if plate:
-                    if not process_exit(plate):
-                        # Set cooldown period (30 seconds) after unauthorized attempt
-                        unauthorized_cooldown = 30
-                        if arduino:
-                            arduino.write(b'2')  # Trigger warning buzzer
-                            print("[ALERT] Buzzer triggered (sent '2')")
-                        continue
+                if plate and not in_cooldown and not process_exit(plate):
+                    # Pause the scanner after an unauthorized attempt
+                    cooldown_until = reject_exit()
+                    in_cooldown = True
 
             # Process camera feed
             ret, frame = cap.read()
@@ -150,59 +143,40 @@ def main():
                 print("[ERROR] Failed to grab frame")
                 break
 
-            distance = mock_ultrasonic_distance()
-
-            if distance <= 50:
-                results = model(frame)
-
-                for result in results:
-                    for box in result.boxes:
-                        x1, y1, x2, y2 = map(int, box.xyxy[0])
-                        plate_img = frame[y1:y2, x1:x2]
-
-                        # Preprocessing
-                        gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
-                        blur = cv2.GaussianBlur(gray, (5, 5), 0)
-                        thresh = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-
-                        # OCR
-                        plate_text = pytesseract.image_to_string(
-                            thresh, config='--psm 8 --oem 3 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
-                        ).strip().replace(" ", "")
-
-                        if "RA" in plate_text:
-                            start_idx = plate_text.find("RA")
-                            plate_candidate = plate_text[start_idx:]
-                            if len(plate_candidate) >= 7:
-                                plate_candidate = plate_candidate[:7]
-                                if is_valid_plate(plate_candidate):
-                                    print(f"[VALID] Plate Detected: {plate_candidate}")
-                                    plate_buffer.append(plate_candidate)
-
-                                    if len(plate_buffer) >= 3:
-                                        most_common = Counter(plate_buffer).most_common(1)[0][0]
-                                        plate_buffer.clear()
-
-                                        if process_exit(most_common):
-                                            if arduino:
-                                                arduino.write(b'1')  # Open gate
-                                                print("[GATE] Opening gate (sent '1')")
-                                                time.sleep(15)
-                                                arduino.write(b'0')  # Close gate
-                                                print("[GATE] Closing gate (sent '0')")
-                                        else:
-                                            # Set cooldown period after unauthorized attempt
-                                            unauthorized_cooldown = 30
-                                            if arduino:
-                                                arduino.write(b'2')  # Trigger warning buzzer
-                                                print("[ALERT] Buzzer triggered (sent '2')")
-                                            continue
-
-                        cv2.imshow("Plate", plate_img)
-                        cv2.imshow("Processed", thresh)
-
-                annotated_frame = results[0].plot() if distance <= 50 else frame
+            # Frames are still read during cooldown so the camera buffer never goes stale
+            if not in_cooldown and presence.should_detect(frame):
+                results = engine.detect_lanes([frame], [lane])
+                boxes = boxes_from_result(results[0])
+                track_ids = tracker.update(boxes)
+
+                # OCR only the vehicles whose plate has not settled yet
+                pending = [(box, track_id) for box, track_id in zip(boxes, track_ids)
+                           if tracker.needs_ocr(track_id) and box[2] > box[0] and box[3] > box[1]]
+                reads = engine.read_boxes(frame, [box for box, _ in pending], lane='exit',
+                                          fresh=[tracker.needs_fresh_read(track_id) for _, track_id in pending])
+
+                for read, (_, track_id) in zip(reads, pending):
+                    # Reads the decoder had to correct count for less in the vote
+                    plate = tracker.add_read(track_id, read.plate, read.confidence * read.plate_confidence,
+                                             cached=read.cached)
+                    if plate:
+                        print(f"[VALID] Plate Detected: {plate}")
+
+                        if process_exit(plate):
+                            gate.open_gate(hold=15)
+                        else:
+                            # Set cooldown period after unauthorized attempt
+                            cooldown_until = reject_exit()
+                            in_cooldown = True
+                            break
+
+                    cv2.imshow("Plate", read.crop)
+                    cv2.imshow("Processed", read.thresh)
+
+                annotated_frame = results[0].plot()
                 cv2.imshow("Exit Webcam Feed", annotated_frame)
+            else:
+                cv2.imshow("Exit Webcam Feed", frame)
 
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
@@ -212,9 +186,16 @@ def main():
     except Exception as e:
         print(f"[ERROR] {e}")
     finally:
+        stats = presence.stats()
+        print(f"[PRESENCE] inferred {stats['inferred']} | skipped {stats['skipped']} "
+              f"({stats['skipped_ratio']:.0%} idle)")
+        if engine.ocr_cache:
+            cache = engine.ocr_cache.stats().get('exit')
+            if cache:
+                print(f"[OCR CACHE] {cache['hit_ratio']:.0%} hits ({cache['hits']}/"
+                      f"{cache['hits'] + cache['misses']}) | saved {cache['saved_ms'] / 1000:.1f}s")
         cap.release()
-        if arduino:
-            arduino.close()
+        gate.close()
         cv2.destroyAllWindows()
 
 if __name__ == "__main__":
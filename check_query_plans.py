@@ -0,0 +1,197 @@
+"""
+EXPLAIN regression check for the hot parking_entries lookups.
+
+Builds a scratch schema on the configured PostgreSQL server, applies the
+migrations there, seeds a few million synthetic entries, and asserts that each
+hot query is planned as an index scan on the expected index (never a Seq Scan
+on parking_entries). Index scans on a partition count for the partitioned
+index they belong to. The prepared statements must also be pruned to the
+partitions their entry_timestamp bound can reach (the months within
+ENTRY_LOOKBACK_DAYS plus the default partition), never all of them. Exits
+non-zero on any regression.
+
+    python check_query_plans.py --rows 3000000
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from db_config import get_db_connection, release_db_connection, STATEMENTS, ENTRY_LOOKBACK_DAYS
+from migrations import apply_migrations
+from db_operations import history_query, history_cursor  # also registers the prepared statements
+from occupancy_index import WARM_OCCUPANCY
+
+SCHEMA = 'plan_check'
+INDEX_NODES = ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan')
+
+# Prepared statements from db_operations (run as the app runs them, with
+# EXECUTE) and the index each one must use
+HOT_STATEMENTS = [
+    ('is_vehicle_inside', 'idx_entries_plate_open', ('plate',)),
+    ('get_last_unpaid_entry', 'idx_entries_plate_unpaid', ('plate',)),
+    ('is_payment_complete', 'idx_entries_plate_entry', ('plate',)),
+    ('get_parking_history', 'idx_entries_plate_entry', ('plate', 'limit')),
+    ('update_exit_timestamp', 'idx_entries_plate_entry', ('day', 'plate')),
+    ('get_daily_stats', 'idx_entries_entry_timestamp', ('day', 'next_day')),
+    ('get_recent_activities', 'idx_entries_last_activity', ('limit',)),
+]
+
+
+def hot_queries(params, max_partitions):
+    """
+    Hot queries run without EXECUTE, with their SQL taken from the code that runs
+    them: (name, index, sql, query params, partitions it may touch or None)
+    """
+    after = history_cursor({'entry_timestamp': params['day'], 'id': 1000})
+    sql, history_params = history_query(params['plate'], after=after, limit=params['limit'])
+    return [
+        ('occupancy_warm', 'idx_entries_plate_open', STATEMENTS[WARM_OCCUPANCY], None, max_partitions),
+        # Unbounded below on purpose: history goes all the way back
+        ('iter_parking_history', 'idx_entries_plate_entry', sql, history_params, None),
+    ]
+
+
+def seed(cur, rows, days, open_entries):
+    """Spread rows entries over the last days days; only the newest open_entries are still inside"""
+    now = datetime.now().replace(microsecond=0)
+    # No NOTIFY (migration 3) and no per-row rollup bump (migration 6) for synthetic rows;
+    # the rollups are recomputed in one pass at the end, as migrate_to_db.load_chunk does
+    cur.execute("SET LOCAL parking.notify = 'off'")
+    cur.execute("SET LOCAL parking.rollup = 'off'")
+    # Monthly partitions for the whole span, so rows do not pile up in the default one (migration 5)
+    cur.execute("SELECT create_monthly_partitions('parking_entries', 'entry_timestamp', %s, %s)",
+                (now - timedelta(days=days), now))
+    cur.execute("""
+        INSERT INTO parking_entries
+            (plate_number, payment_status, entry_timestamp, exit_timestamp,
+             payment_timestamp, amount_paid)
+        SELECT plate,
+               paid,
+               entry,
+               CASE WHEN i > %(rows)s - %(open)s THEN NULL ELSE entry + interval '2 hours' END,
+               CASE WHEN paid THEN entry + interval '90 minutes' END,
+               CASE WHEN paid THEN 500 END
+        FROM (
+            SELECT i,
+                   'RA' || chr(65 + (i %% 26)) || lpad(((i / 26) %% 1000)::text, 3, '0')
+                        || chr(65 + ((i / 26000) %% 26)) AS plate,
+                   %(start)s + (i * (%(span)s / %(rows)s::float)) * interval '1 second' AS entry,
+                   (i %% 20 <> 0) AND i <= %(rows)s - %(open)s AS paid
+            FROM generate_series(1, %(rows)s) AS i
+        ) s
+    """, {
+        'rows': rows,
+        'open': open_entries,
+        'start': now - timedelta(days=days),
+        'span': days * 86400,
+    })
+    cur.execute("SELECT refresh_rollups(%s, %s)", (now - timedelta(days=days), now))
+    cur.execute("ANALYZE parking_entries")
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def index_parents(cur):
+    """Partition index name -> the partitioned index it was created from"""
+    cur.execute("""
+        SELECT c.relname, p.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE c.relkind = 'i'
+    """)
+    return dict(cur.fetchall())
+
+
+def window_partitions(now, days=ENTRY_LOOKBACK_DAYS):
+    """Monthly partitions a lookup bounded to the last days days can reach, plus the default one"""
+    first = now - timedelta(days=days)
+    return (now.year - first.year) * 12 + now.month - first.month + 2
+
+
+def check(cur, name, index, sql, params, parents=None, max_partitions=None):
+    parents = parents or {}
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+    plan = cur.fetchone()[0][0]['Plan']
+    nodes = list(plan_nodes(plan))
+    scanned = [n for n in nodes if n.get('Relation Name', '').startswith('parking_entries')]
+    seq_scans = [n for n in scanned if n['Node Type'] == 'Seq Scan']
+    used = {parents.get(n.get('Index Name'), n.get('Index Name'))
+            for n in nodes if n['Node Type'] in INDEX_NODES}
+    # Partitions left after (initial) pruning; the parent only shows up as an UPDATE's target
+    partitions = {n['Relation Name'] for n in scanned} - {'parking_entries'}
+    pruned = max_partitions is None or len(partitions) <= max_partitions
+    ok = not seq_scans and index in used and pruned
+    status = 'OK  ' if ok else 'FAIL'
+    limit = f"/{max_partitions}" if max_partitions is not None else ''
+    print(f"[{status}] {name:<24} expected {index:<28} used {sorted(i for i in used if i) or '-'}"
+          f"  partitions={len(partitions)}{limit}  cost={plan['Total Cost']:.1f}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assert index scans for the hot parking_entries queries")
+    parser.add_argument('--rows', type=int, default=3_000_000)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--open-entries', type=int, default=300)
+    parser.add_argument('--keep', action='store_true', help=f"keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            cur.execute(f"CREATE SCHEMA {SCHEMA}")
+            cur.execute(f"SET search_path TO {SCHEMA}")
+        conn.commit()
+        apply_migrations(conn)
+
+        print(f"Seeding {args.rows:,} entries over {args.days} days...")
+        with conn.cursor() as cur:
+            seed(cur, args.rows, args.days, args.open_entries)
+        conn.commit()
+
+        day = datetime.combine(datetime.now().date(), datetime.min.time())
+        results = []
+        with conn.cursor() as cur:
+            cur.execute("SELECT plate_number FROM parking_entries WHERE exit_timestamp IS NULL LIMIT 1")
+            params = {'plate': cur.fetchone()[0], 'day': day, 'next_day': day + timedelta(days=1),
+                      'limit': 50}
+            parents = index_parents(cur)
+            max_partitions = window_partitions(datetime.now())
+            for name, _, _ in HOT_STATEMENTS:
+                cur.execute(f"PREPARE {name} AS {STATEMENTS[name]}")
+            # Custom plans are used for the first executions, then the cached generic plan
+            for mode in ('force_custom_plan', 'force_generic_plan'):
+                cur.execute(f"SET LOCAL plan_cache_mode = {mode}")
+                print(f"-- {mode}")
+                for name, index, keys in HOT_STATEMENTS:
+                    placeholders = ', '.join(f"%({key})s" for key in keys)
+                    results.append(check(cur, name, index, f"EXECUTE {name} ({placeholders})",
+                                         params, parents, max_partitions))
+            print("-- ad hoc")
+            results += [check(cur, name, index, sql, query_params, parents, limit)
+                        for name, index, sql, query_params, limit in hot_queries(params, max_partitions)]
+        conn.rollback()
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute("DEALLOCATE ALL")
+            conn.prepared.clear()
+            if not args.keep:
+                cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            cur.execute("SET search_path TO DEFAULT")
+        conn.commit()
+        release_db_connection(conn)
+
+    failed = results.count(False)
+    print(f"{len(results) - failed}/{len(results)} hot query plans use their index and prune")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
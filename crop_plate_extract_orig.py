@@ -1,11 +1,10 @@
 import cv2
-from ultralytics import YOLO
-import pytesseract
+from anpr import get_engine
 import os
 import time
 
 # Load YOLOv8 model
-model = YOLO('/opt/homebrew/runs/detect/train4/weights/best.pt')  # Absolute path to your best weights
+engine = get_engine('/opt/homebrew/runs/detect/train4/weights/best.pt')  # Absolute path to your best weights
 
 # Create folder to save cropped plates
 save_dir = 'plates'
@@ -22,29 +21,22 @@ while True:
         break
 
     # Run YOLO inference
-    results = model(frame)
+    results = engine.detect_batch([frame])
 
     # Loop over detections
     for result in results:
-        for box in result.boxes:
-            # Get coordinates
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-
+        for read in engine.read_result(frame, result):
             # Crop the detected plate
-            plate_img = frame[y1:y2, x1:x2]
+            plate_img = read.crop
 
             # Save cropped plate
             plate_filename = f'{save_dir}/plate_{plate_count}.jpg'
             cv2.imwrite(plate_filename, plate_img)
             plate_count += 1
 
-            # ===== Plate Image Processing =====
-            gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
-            blur = cv2.GaussianBlur(gray, (5, 5), 0)
-            thresh = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-
-            # ===== OCR Extraction =====
-            plate_text = pytesseract.image_to_string(thresh, config='--psm 8 --oem 3 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789')
+            # ===== Plate Image Processing + OCR (shared engine) =====
+            thresh = read.thresh
+            plate_text = read.text
 
             print(f"[INFO] Extracted Plate Number: {plate_text.strip()}")
 
@@ -1,6 +1,10 @@
 import psycopg2
-from psycopg2 import pool
+from psycopg2 import pool, extensions
 import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -12,9 +16,182 @@ DB_USER = os.getenv('DB_USER', 'postgres')
 DB_PASSWORD = os.getenv('DB_PASSWORD', 'postgres')
 DB_HOST = os.getenv('DB_HOST', 'localhost')
 DB_PORT = os.getenv('DB_PORT', '5432')
+# Connect-retry budget for callers someone is waiting on: web requests and gate decisions
+REQUEST_RETRY_WAIT = float(os.getenv('DB_REQUEST_RETRY_WAIT', 2.0))
+# How far back the per-plate lookups (inside? paid? latest entry) and the activity feed
+# look. The bound on entry_timestamp, the partition key, lets them skip all but the
+# newest monthly partitions (migration 5); keep it above the longest stay.
+ENTRY_LOOKBACK_DAYS = int(os.getenv('DB_ENTRY_LOOKBACK_DAYS', 90))
+ENTRY_LOOKBACK = f"interval '{ENTRY_LOOKBACK_DAYS} days'"
 
-# Create a connection pool
-connection_pool = pool.SimpleConnectionPool(
+# Histogram bucket upper bounds, in milliseconds
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; quantiles are reported as bucket upper bounds
+    (or the largest value seen, past the last bucket)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, ms):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, ms)] += 1
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def _quantile(self, q):
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return self.buckets[i] if i < len(self.buckets) else round(self.max_ms, 3)
+        return 0.0
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"<={b}" for b in self.buckets] + [f">{self.buckets[-1]}"]
+            return {
+                'count': self.count,
+                'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+                'p50_ms': self._quantile(0.5),
+                'p95_ms': self._quantile(0.95),
+                'p99_ms': self._quantile(0.99),
+                'max_ms': round(self.max_ms, 3),
+                'buckets': dict(zip(labels, self.counts))
+            }
+
+class PreparingConnection(extensions.connection):
+    """psycopg2 connection that remembers which statements it has PREPAREd"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.last_used = time.monotonic()
+
+class ConnectionPool:
+    """
+    Thread-safe, lazily connected pool.
+
+    Callers block (up to timeout) while all maxconn connections are out instead
+    of failing, and the time spent waiting is recorded. A connection idle for
+    more than validate_after seconds is checked with SELECT 1 before it is
+    handed out; dead ones are replaced, retrying with backoff for up to
+    max_retry_wait seconds while the database is restarting. A call site can
+    lower that budget with retry_limit() (web requests, gate decisions), so an
+    outage fails it fast instead of stalling it for the whole backoff.
+    """
+
+    def __init__(self, minconn=1, maxconn=10, validate_after=30.0, max_retry_wait=30.0, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.validate_after = validate_after
+        self.max_retry_wait = max_retry_wait
+        self.connect_kwargs = connect_kwargs
+        self.wait = LatencyHistogram()
+        self.reconnects = 0
+        self.discarded = 0
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = pool.ThreadedConnectionPool(
+                    self.minconn, self.maxconn,
+                    connection_factory=PreparingConnection,
+                    **self.connect_kwargs
+                )
+            return self._pool
+
+    def _is_usable(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.last_used < self.validate_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self, timeout=30.0, max_retry_wait=None):
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=timeout):
+            raise pool.PoolError(f"No database connection free after {timeout}s")
+
+        if max_retry_wait is None:
+            max_retry_wait = getattr(_call_site, 'max_retry_wait', None)
+        if max_retry_wait is None or max_retry_wait > self.max_retry_wait:
+            max_retry_wait = self.max_retry_wait
+        delay = 0.5
+        deadline = time.monotonic() + max_retry_wait
+        try:
+            while True:
+                try:
+                    conn = self._get_pool().getconn()
+                except psycopg2.OperationalError as e:
+                    if time.monotonic() + delay > deadline:
+                        raise
+                    print(f"[DB] Cannot connect ({str(e).strip()}); retrying in {delay:.1f}s")
+                    with self._lock:
+                        self.reconnects += 1
+                    time.sleep(delay)
+                    delay = min(delay * 2, 5.0)
+                    continue
+                if self._is_usable(conn):
+                    break
+                with self._lock:
+                    self.discarded += 1
+                self._pool.putconn(conn, close=True)
+        except Exception:
+            self._slots.release()
+            raise
+
+        self.wait.observe((time.perf_counter() - started) * 1000)
+        return conn
+
+    def putconn(self, conn):
+        try:
+            conn.last_used = time.monotonic()
+            self._pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            counters = {'reconnects': self.reconnects, 'discarded': self.discarded}
+        return {'wait': self.wait.snapshot(), **counters}
+
+_call_site = threading.local()
+
+def limit_retries(seconds):
+    """Cap the connect-retry budget of this thread's DB calls (None lifts the cap); returns the previous cap"""
+    previous = getattr(_call_site, 'max_retry_wait', None)
+    _call_site.max_retry_wait = seconds
+    return previous
+
+@contextmanager
+def retry_limit(seconds=REQUEST_RETRY_WAIT):
+    """Block (or function decorator) whose DB calls give up connecting after seconds"""
+    previous = limit_retries(seconds)
+    try:
+        yield
+    finally:
+        limit_retries(previous)
+
+# Connections are only opened on first use
+connection_pool = ConnectionPool(
     1,  # minconn
     10, # maxconn
     database=DB_NAME,
@@ -24,57 +201,55 @@ connection_pool = pool.SimpleConnectionPool(
     port=DB_PORT
 )
 
-def get_db_connection():
-    """Get a connection from the pool"""
-    return connection_pool.getconn()
+def get_db_connection(max_retry_wait=None):
+    """Get a connection from the pool (see retry_limit for the retry budget)"""
+    return connection_pool.getconn(max_retry_wait=max_retry_wait)
 
 def release_db_connection(conn):
     """Release a connection back to the pool"""
     connection_pool.putconn(conn)
 
+# ===== Prepared statements =====
+STATEMENTS = {}     # name -> SQL with $1, $2... placeholders
+query_latency = {}  # name -> LatencyHistogram
+
+def register_statement(name, sql):
+    """Declare a hot query to be PREPAREd once per connection; returns its name"""
+    STATEMENTS[name] = sql
+    query_latency[name] = LatencyHistogram()
+    return name
+
+def execute_prepared(cur, name, params=()):
+    """Run a registered statement on cur, preparing it on this connection first if needed"""
+    conn = cur.connection
+    if name not in conn.prepared:
+        cur.execute(f"PREPARE {name} AS {STATEMENTS[name]}")
+        conn.prepared.add(name)
+    started = time.perf_counter()
+    if params:
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cur.execute(f"EXECUTE {name}")
+    query_latency[name].observe((time.perf_counter() - started) * 1000)
+
+def db_stats():
+    """Pool wait and per-statement query latency histograms"""
+    return {
+        'pool': connection_pool.stats(),
+        'queries': {name: h.snapshot() for name, h in query_latency.items()}
+    }
+
 def init_db():
-    """Initialize the database with required tables"""
-    conn = get_db_connection()
+    """Initialize the database by applying any pending schema migrations (see migrations.py)
+    and creating the upcoming monthly partitions (see partitions.py)"""
+    # Imported here: migrations and partitions use the pool defined above
+    from migrations import apply_migrations
+    from partitions import ensure_partitions
     try:
-        with conn.cursor() as cur:
-            # Create parking_entries table
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS parking_entries (
-                    id SERIAL PRIMARY KEY,
-                    plate_number VARCHAR(10) NOT NULL,
-                    payment_status BOOLEAN DEFAULT FALSE,
-                    entry_timestamp TIMESTAMP NOT NULL,
-                    exit_timestamp TIMESTAMP,
-                    payment_timestamp TIMESTAMP,
-                    amount_paid DECIMAL(10,2),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-                
-                -- Create index on plate_number for faster lookups
-                CREATE INDEX IF NOT EXISTS idx_plate_number ON parking_entries(plate_number);
-                
-                -- Create index on payment_status for faster filtering
-                CREATE INDEX IF NOT EXISTS idx_payment_status ON parking_entries(payment_status);
-
-                -- Create alerts table for unauthorized attempts and other events
-                CREATE TABLE IF NOT EXISTS alerts (
-                    id SERIAL PRIMARY KEY,
-                    alert_type VARCHAR(50) NOT NULL,
-                    plate_number VARCHAR(10),
-                    message TEXT NOT NULL,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_read BOOLEAN DEFAULT FALSE
-                );
-
-                -- Create index on alert timestamp for faster retrieval
-                CREATE INDEX IF NOT EXISTS idx_alert_timestamp ON alerts(timestamp);
-            """)
-        conn.commit()
+        apply_migrations()
+        ensure_partitions()
     except Exception as e:
         print(f"Error initializing database: {e}")
-        conn.rollback()
-    finally:
-        release_db_connection(conn)
 
 if __name__ == "__main__":
     init_db() 
\ No newline at end of file
@@ -0,0 +1,118 @@
+import json
+import select
+import threading
+import time
+from datetime import datetime
+
+import psycopg2
+
+from db_config import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+from events import bus
+
+CHANNEL = 'parking_events'
+
+# Columns of the NOTIFY rows that are published as datetimes
+TIMESTAMP_COLUMNS = ('entry_timestamp', 'exit_timestamp', 'payment_timestamp', 'timestamp')
+
+
+def decode_notification(payload):
+    """(kind, data) from a parking_events payload, with the row in the db_operations shape"""
+    message = json.loads(payload)
+    data = message['data']
+    data.pop('created_at', None)
+    data.pop('last_activity_at', None)
+    for column in TIMESTAMP_COLUMNS:
+        if data.get(column):
+            data[column] = datetime.fromisoformat(data[column])
+    return message['kind'], data
+
+
+class NotifyListener:
+    """
+    Republishes the database's parking_events notifications on the event bus.
+
+    The triggers from migration 3 fire for writes made by any process (the
+    gate scripts, process_payment.py, manual SQL), so a subscriber in this
+    process sees every change the moment it commits. LISTEN needs a dedicated
+    autocommit connection, which is reopened with backoff if it drops.
+
+    Writes committed while no LISTEN was active are never announced, so every
+    on_connect callback runs right after each (re)connect: state derived from
+    events (caches, counters) is rebuilt there rather than silently drifting.
+    """
+
+    def __init__(self, channel=CHANNEL, event_bus=bus, max_backoff=30, on_connect=()):
+        self.channel = channel
+        self.bus = event_bus
+        self.max_backoff = max_backoff
+        self.on_connect = list(on_connect)
+        self.received = 0
+        self.reconnects = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='db-listener', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    def _connect(self):
+        conn = psycopg2.connect(database=DB_NAME, user=DB_USER, password=DB_PASSWORD,
+                                host=DB_HOST, port=DB_PORT)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {self.channel}")
+        return conn
+
+    def _run(self):
+        backoff = 1
+        while self._running:
+            try:
+                conn = self._connect()
+            except Exception as e:
+                print(f"[ERROR] NOTIFY listener could not connect: {e}; retrying in {backoff}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            print(f"[LISTENING] {self.channel}")
+            backoff = 1
+            for callback in self.on_connect:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"[ERROR] NOTIFY listener connect callback failed: {e}")
+            try:
+                while self._running:
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._handle(conn.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"[ERROR] NOTIFY listener lost its connection: {e}")
+                self.reconnects += 1
+            finally:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+    def _handle(self, payload):
+        try:
+            kind, data = decode_notification(payload)
+        except Exception as e:
+            print(f"[ERROR] Bad {self.channel} payload: {e}")
+            return
+        self.received += 1
+        self.bus.publish(kind, data)
+
+    def stats(self):
+        return {'received': self.received, 'reconnects': self.reconnects,
+                'duplicates': self.bus.duplicates}
@@ -1,18 +1,39 @@
-from datetime import datetime
-from db_config import get_db_connection, release_db_connection
+from datetime import datetime, timedelta
+from db_config import get_db_connection, release_db_connection, register_statement, execute_prepared, ENTRY_LOOKBACK
+from occupancy_index import occupancy
+from events import bus, ENTRY, PAYMENT, EXIT, ALERT, ALERT_READ
+
+def _entry_row(row):
+    """parking_entries row (id, plate_number, payment_status, entry_timestamp,
+    exit_timestamp, payment_timestamp, amount_paid) as an activity dict"""
+    return {
+        'id': row[0],
+        'plate_number': row[1],
+        'payment_status': row[2],
+        'entry_timestamp': row[3],
+        'exit_timestamp': row[4],
+        'payment_timestamp': row[5],
+        'amount_paid': row[6]
+    }
+
+ADD_PARKING_ENTRY = register_statement('add_parking_entry', """
+    INSERT INTO parking_entries (plate_number, entry_timestamp)
+    VALUES ($1, $2)
+    RETURNING id
+""")
 
 def add_parking_entry(plate_number):
     """Add a new parking entry"""
     conn = get_db_connection()
     try:
+        entry_timestamp = datetime.now()
         with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO parking_entries (plate_number, entry_timestamp)
-                VALUES (%s, %s)
-                RETURNING id
-            """, (plate_number, datetime.now()))
+            execute_prepared(cur, ADD_PARKING_ENTRY, (plate_number, entry_timestamp))
             entry_id = cur.fetchone()[0]
             conn.commit()
+            occupancy.record_entry(entry_id, plate_number, entry_timestamp)
+            bus.publish(ENTRY, _entry_row(
+                (entry_id, plate_number, False, entry_timestamp, None, None, None)))
             return entry_id
     except Exception as e:
         print(f"Error adding parking entry: {e}")
@@ -21,24 +42,30 @@ def add_parking_entry(plate_number):
     finally:
         release_db_connection(conn)
 
+UPDATE_PAYMENT_STATUS = register_statement('update_payment_status', """
+    UPDATE parking_entries
+    SET payment_status = TRUE,
+        payment_timestamp = $1,
+        amount_paid = $2
+    WHERE plate_number = $3
+    AND entry_timestamp = $4
+    AND payment_status = FALSE
+    RETURNING id, plate_number, payment_status, entry_timestamp,
+              exit_timestamp, payment_timestamp, amount_paid
+""")
+
 def update_payment_status(plate_number, entry_timestamp, amount_paid):
     """Update payment status for a parking entry"""
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                UPDATE parking_entries
-                SET payment_status = TRUE,
-                    payment_timestamp = %s,
-                    amount_paid = %s
-                WHERE plate_number = %s
-                AND entry_timestamp = %s
-                AND payment_status = FALSE
-                RETURNING id
-            """, (datetime.now(), amount_paid, plate_number, entry_timestamp))
-            updated_id = cur.fetchone()
+            execute_prepared(cur, UPDATE_PAYMENT_STATUS, (datetime.now(), amount_paid, plate_number, entry_timestamp))
+            updated = cur.fetchone()
             conn.commit()
-            return updated_id is not None
+            if updated is not None:
+                occupancy.record_payment(plate_number, entry_timestamp)
+                bus.publish(PAYMENT, _entry_row(updated))
+            return updated is not None
     except Exception as e:
         print(f"Error updating payment status: {e}")
         conn.rollback()
@@ -46,25 +73,36 @@ def update_payment_status(plate_number, entry_timestamp, amount_paid):
     finally:
         release_db_connection(conn)
 
+UPDATE_EXIT_TIMESTAMP = register_statement('update_exit_timestamp', f"""
+    UPDATE parking_entries p
+    SET exit_timestamp = $1
+    FROM (
+        SELECT id, entry_timestamp FROM parking_entries
+        WHERE plate_number = $2
+        AND entry_timestamp >= LOCALTIMESTAMP - {ENTRY_LOOKBACK}
+        ORDER BY entry_timestamp DESC
+        LIMIT 1
+    ) latest
+    -- Matching on the partition key too lets the update touch a single partition
+    WHERE p.id = latest.id
+    AND p.entry_timestamp = latest.entry_timestamp
+    AND p.entry_timestamp >= LOCALTIMESTAMP - {ENTRY_LOOKBACK}
+    RETURNING p.id, p.plate_number, p.payment_status, p.entry_timestamp,
+              p.exit_timestamp, p.payment_timestamp, p.amount_paid
+""")
+
 def update_exit_timestamp(plate_number):
     """Update exit timestamp for the latest entry of a plate"""
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                UPDATE parking_entries
-                SET exit_timestamp = %s
-                WHERE id = (
-                    SELECT id FROM parking_entries
-                    WHERE plate_number = %s
-                    ORDER BY entry_timestamp DESC
-                    LIMIT 1
-                )
-                RETURNING id
-            """, (datetime.now(), plate_number))
-            updated_id = cur.fetchone()
+            execute_prepared(cur, UPDATE_EXIT_TIMESTAMP, (datetime.now(), plate_number))
+            updated = cur.fetchone()
             conn.commit()
-            return updated_id is not None
+            if updated is not None:
+                occupancy.record_exit(plate_number)
+                bus.publish(EXIT, _entry_row(updated))
+            return updated is not None
     except Exception as e:
         print(f"Error updating exit timestamp: {e}")
         conn.rollback()
@@ -72,18 +110,28 @@ def update_exit_timestamp(plate_number):
     finally:
         release_db_connection(conn)
 
+ADD_ALERT = register_statement('add_alert', """
+    INSERT INTO alerts (alert_type, plate_number, message)
+    VALUES ($1, $2, $3)
+    RETURNING id, timestamp
+""")
+
 def add_alert(alert_type, plate_number, message):
     """Add a new alert to the system"""
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO alerts (alert_type, plate_number, message)
-                VALUES (%s, %s, %s)
-                RETURNING id
-            """, (alert_type, plate_number, message))
-            alert_id = cur.fetchone()[0]
+            execute_prepared(cur, ADD_ALERT, (alert_type, plate_number, message))
+            alert_id, timestamp = cur.fetchone()
             conn.commit()
+            bus.publish(ALERT, {
+                'id': alert_id,
+                'alert_type': alert_type,
+                'plate_number': plate_number,
+                'message': message,
+                'timestamp': timestamp,
+                'is_read': False
+            })
             return alert_id
     except Exception as e:
         print(f"Error adding alert: {e}")
@@ -92,17 +140,19 @@ def add_alert(alert_type, plate_number, message):
     finally:
         release_db_connection(conn)
 
+GET_RECENT_ALERTS = register_statement('get_recent_alerts', """
+    SELECT id, alert_type, plate_number, message, timestamp, is_read
+    FROM alerts
+    ORDER BY timestamp DESC
+    LIMIT $1
+""")
+
 def get_recent_alerts(limit=50):
     """Get recent alerts"""
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, alert_type, plate_number, message, timestamp, is_read
-                FROM alerts
-                ORDER BY timestamp DESC
-                LIMIT %s
-            """, (limit,))
+            execute_prepared(cur, GET_RECENT_ALERTS, (limit,))
             alerts = cur.fetchall()
             return [{
                 'id': alert[0],
@@ -118,19 +168,23 @@ def get_recent_alerts(limit=50):
     finally:
         release_db_connection(conn)
 
+MARK_ALERT_AS_READ = register_statement('mark_alert_as_read', """
+    UPDATE alerts
+    SET is_read = TRUE
+    WHERE id = $1
+    RETURNING id
+""")
+
 def mark_alert_as_read(alert_id):
     """Mark an alert as read"""
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                UPDATE alerts
-                SET is_read = TRUE
-                WHERE id = %s
-                RETURNING id
-            """, (alert_id,))
+            execute_prepared(cur, MARK_ALERT_AS_READ, (alert_id,))
             updated_id = cur.fetchone()
             conn.commit()
+            if updated_id is not None:
+                bus.publish(ALERT_READ, {'id': alert_id, 'is_read': True})
             return updated_id is not None
     except Exception as e:
         print(f"Error marking alert as read: {e}")
@@ -139,18 +193,27 @@ def mark_alert_as_read(alert_id):
     finally:
         release_db_connection(conn)
 
+IS_PAYMENT_COMPLETE = register_statement('is_payment_complete', f"""
+    SELECT payment_status
+    FROM parking_entries
+    WHERE plate_number = $1
+    AND entry_timestamp >= LOCALTIMESTAMP - {ENTRY_LOOKBACK}
+    ORDER BY entry_timestamp DESC
+    LIMIT 1
+""")
+
 def is_payment_complete(plate_number):
     """Check if payment is complete for the latest entry of a plate"""
+    # A paid vehicle inside is answered from memory; anything else checks the DB
+    # (the payment may have been made by another process)
+    entry = occupancy.get(plate_number) if occupancy.is_ready() else None
+    if entry and entry['payment_status']:
+        return True
+
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT payment_status
-                FROM parking_entries
-                WHERE plate_number = %s
-                ORDER BY entry_timestamp DESC
-                LIMIT 1
-            """, (plate_number,))
+            execute_prepared(cur, IS_PAYMENT_COMPLETE, (plate_number,))
             result = cur.fetchone()
             return result[0] if result else False
     except Exception as e:
@@ -159,19 +222,31 @@ def is_payment_complete(plate_number):
     finally:
         release_db_connection(conn)
 
+GET_LAST_UNPAID_ENTRY = register_statement('get_last_unpaid_entry', f"""
+    SELECT id, plate_number, entry_timestamp
+    FROM parking_entries
+    WHERE plate_number = $1
+    AND entry_timestamp >= LOCALTIMESTAMP - {ENTRY_LOOKBACK}
+    AND payment_status = FALSE
+    ORDER BY entry_timestamp DESC
+    LIMIT 1
+""")
+
 def get_last_unpaid_entry(plate_number):
     """Get the last unpaid entry for a plate"""
+    # The open entry of a vehicle inside is always its latest one
+    entry = occupancy.get(plate_number) if occupancy.is_ready() else None
+    if entry and not entry['payment_status']:
+        return {
+            'id': entry['id'],
+            'plate_number': plate_number,
+            'entry_timestamp': entry['entry_timestamp']
+        }
+
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, plate_number, entry_timestamp
-                FROM parking_entries
-                WHERE plate_number = %s
-                AND payment_status = FALSE
-                ORDER BY entry_timestamp DESC
-                LIMIT 1
-            """, (plate_number,))
+            execute_prepared(cur, GET_LAST_UNPAID_ENTRY, (plate_number,))
             result = cur.fetchone()
             if result:
                 return {
@@ -192,19 +267,23 @@ def get_parking_duration(entry_timestamp):
     duration = now - entry_timestamp
     return int(duration.total_seconds() / 60)
 
+GET_PARKING_HISTORY = register_statement('get_parking_history', f"""
+    SELECT id, plate_number, payment_status, entry_timestamp,
+           exit_timestamp, payment_timestamp, amount_paid
+    FROM parking_entries
+    WHERE plate_number = $1
+    AND entry_timestamp >= LOCALTIMESTAMP - {ENTRY_LOOKBACK}
+    ORDER BY entry_timestamp DESC
+    LIMIT $2
+""")
+
 def get_parking_history(plate_number, limit=10):
-    """Get parking history for a plate number"""
+    """Get recent parking history (within ENTRY_LOOKBACK_DAYS) for a plate number;
+    iter_parking_history() goes all the way back"""
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, plate_number, payment_status, entry_timestamp, 
-                       exit_timestamp, payment_timestamp, amount_paid
-                FROM parking_entries
-                WHERE plate_number = %s
-                ORDER BY entry_timestamp DESC
-                LIMIT %s
-            """, (plate_number, limit))
+            execute_prepared(cur, GET_PARKING_HISTORY, (plate_number, limit))
             results = cur.fetchall()
             return [{
                 'id': row[0],
@@ -221,23 +300,102 @@ def get_parking_history(plate_number, limit=10):
     finally:
         release_db_connection(conn)
 
+def history_cursor(entry):
+    """Opaque keyset position after an entry, for the 'after' argument of iter_parking_history"""
+    return f"{entry['entry_timestamp'].isoformat()}_{entry['id']}"
+
+def parse_history_cursor(cursor):
+    timestamp, entry_id = cursor.rsplit('_', 1)
+    return datetime.fromisoformat(timestamp), int(entry_id)
+
+def history_query(plate_number=None, start=None, end=None, after=None, limit=None,
+                  placeholder=lambda n: '%s'):
+    """SQL and positional parameters for one iter_parking_history page; placeholder(n)
+    renders the n-th (1-based) parameter, e.g. lambda n: f'${n}' for asyncpg"""
+    conditions, params = [], []
+
+    def param(value):
+        params.append(value)
+        return placeholder(len(params))
+
+    if plate_number:
+        conditions.append(f"plate_number = {param(plate_number)}")
+    if start:
+        conditions.append(f"entry_timestamp >= {param(start)}")
+    if end:
+        conditions.append(f"entry_timestamp < {param(end)}")
+    if after:
+        # Keyset position; the plain range keeps the (plate_number, entry_timestamp) index usable
+        after_ts, after_id = parse_history_cursor(after)
+        conditions.append(f"entry_timestamp <= {param(after_ts)} "
+                          f"AND (entry_timestamp < {param(after_ts)} OR id < {param(after_id)})")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    page = f"LIMIT {param(limit)}" if limit else ""
+    return f"""
+        SELECT id, plate_number, payment_status, entry_timestamp,
+               exit_timestamp, payment_timestamp, amount_paid
+        FROM parking_entries
+        {where}
+        ORDER BY entry_timestamp DESC, id DESC
+        {page}
+    """, params
+
+def iter_parking_history(plate_number=None, start=None, end=None, after=None, page_size=500):
+    """
+    Stream parking entries newest first, optionally for one plate and within
+    [start, end), resuming after a history_cursor(). Rows are fetched in
+    keyset pages of page_size, so memory stays constant however far back the
+    history goes. A pool connection is only held while a page is fetched, not
+    while the caller (a slow CSV download) consumes it.
+    """
+    while True:
+        sql, params = history_query(plate_number, start, end, after, limit=page_size)
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                rows = cur.fetchall()
+        finally:
+            conn.rollback()
+            release_db_connection(conn)
+
+        for row in rows:
+            yield _entry_row(row)
+        if len(rows) < page_size:
+            return
+        after = history_cursor(_entry_row(rows[-1]))
+
+def get_parking_history_page(plate_number=None, start=None, end=None, after=None, limit=100):
+    """One page of iter_parking_history(); returns (entries, cursor of the next page or None)"""
+    entries = []
+    history = iter_parking_history(plate_number, start, end, after, page_size=limit + 1)
+    try:
+        for entry in history:
+            if len(entries) == limit:
+                return entries, history_cursor(entries[-1])
+            entries.append(entry)
+        return entries, None
+    except Exception as e:
+        print(f"Error getting parking history page: {e}")
+        return entries, None
+    finally:
+        history.close()
+
+GET_RECENT_ACTIVITIES = register_statement('get_recent_activities', f"""
+    SELECT id, plate_number, payment_status, entry_timestamp,
+           exit_timestamp, payment_timestamp, amount_paid
+    FROM parking_entries
+    WHERE entry_timestamp >= LOCALTIMESTAMP - {ENTRY_LOOKBACK}
+    ORDER BY last_activity_at DESC, id DESC
+    LIMIT $1
+""")
+
 def get_recent_activities(limit=50):
     """Get recent parking activities including entries, exits, and payments"""
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, plate_number, payment_status, entry_timestamp,
-                       exit_timestamp, payment_timestamp, amount_paid
-                FROM parking_entries
-                ORDER BY 
-                    GREATEST(
-                        entry_timestamp,
-                        COALESCE(exit_timestamp, '1970-01-01'),
-                        COALESCE(payment_timestamp, '1970-01-01')
-                    ) DESC
-                LIMIT %s
-            """, (limit,))
+            execute_prepared(cur, GET_RECENT_ACTIVITIES, (limit,))
             results = cur.fetchall()
             return [{
                 'id': row[0],
@@ -254,23 +412,28 @@ def get_recent_activities(limit=50):
     finally:
         release_db_connection(conn)
 
+GET_DAILY_STATS = register_statement('get_daily_stats', """
+    SELECT
+        COUNT(*) as total_entries,
+        COUNT(CASE WHEN exit_timestamp IS NOT NULL THEN 1 END) as total_exits,
+        COUNT(CASE WHEN payment_status = TRUE THEN 1 END) as total_paid,
+        COALESCE(SUM(amount_paid), 0) as total_revenue,
+        COUNT(CASE WHEN exit_timestamp IS NULL THEN 1 END) as current_occupancy,
+        (SELECT COUNT(*) FROM alerts
+         WHERE timestamp >= $1 AND timestamp < $2) as total_alerts
+    FROM parking_entries
+    WHERE entry_timestamp >= $1 AND entry_timestamp < $2
+""")
+
 def get_daily_stats():
     """Get daily statistics"""
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
             # Get today's stats
-            today = datetime.now().date()
-            cur.execute("""
-                SELECT 
-                    COUNT(*) as total_entries,
-                    COUNT(CASE WHEN exit_timestamp IS NOT NULL THEN 1 END) as total_exits,
-                    COUNT(CASE WHEN payment_status = TRUE THEN 1 END) as total_paid,
-                    COALESCE(SUM(amount_paid), 0) as total_revenue,
-                    COUNT(CASE WHEN exit_timestamp IS NULL THEN 1 END) as current_occupancy
-                FROM parking_entries 
-                WHERE DATE(entry_timestamp) = %s
-            """, (today,))
+            # Half-open range on the raw column so idx_entries_entry_timestamp applies
+            today = datetime.combine(datetime.now().date(), datetime.min.time())
+            execute_prepared(cur, GET_DAILY_STATS, (today, today + timedelta(days=1)))
             result = cur.fetchone()
             
             return {
@@ -278,7 +441,8 @@ def get_daily_stats():
                 'total_exits': result[1],
                 'total_paid': result[2],
                 'total_revenue': float(result[3]),
-                'current_occupancy': result[4]
+                'current_occupancy': result[4],
+                'total_alerts': result[5]
             }
     except Exception as e:
         print(f"Error getting daily stats: {e}")
@@ -286,44 +450,29 @@ def get_daily_stats():
     finally:
         release_db_connection(conn)
 
+GET_HOURLY_OCCUPANCY = register_statement('get_hourly_occupancy', """
+    WITH RECURSIVE hours AS (
+        SELECT date_trunc('hour', NOW() - interval '23 hours') as hour
+        UNION ALL
+        SELECT hour + interval '1 hour'
+        FROM hours
+        WHERE hour < date_trunc('hour', NOW())
+    )
+    SELECT
+        hours.hour,
+        COALESCE(r.entries, 0) as entries,
+        COALESCE(r.exits, 0) as exits
+    FROM hours
+    LEFT JOIN hourly_rollup r ON r.hour = hours.hour
+    ORDER BY hours.hour
+""")
+
 def get_hourly_occupancy():
     """Get hourly occupancy for the last 24 hours"""
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                WITH RECURSIVE hours AS (
-                    SELECT date_trunc('hour', NOW() - interval '23 hours') as hour
-                    UNION ALL
-                    SELECT hour + interval '1 hour'
-                    FROM hours
-                    WHERE hour < date_trunc('hour', NOW())
-                ),
-                hourly_entries AS (
-                    SELECT 
-                        date_trunc('hour', entry_timestamp) as hour,
-                        COUNT(*) as entries
-                    FROM parking_entries
-                    WHERE entry_timestamp >= NOW() - interval '24 hours'
-                    GROUP BY 1
-                ),
-                hourly_exits AS (
-                    SELECT 
-                        date_trunc('hour', exit_timestamp) as hour,
-                        COUNT(*) as exits
-                    FROM parking_entries
-                    WHERE exit_timestamp >= NOW() - interval '24 hours'
-                    GROUP BY 1
-                )
-                SELECT 
-                    hours.hour,
-                    COALESCE(entries, 0) as entries,
-                    COALESCE(exits, 0) as exits
-                FROM hours
-                LEFT JOIN hourly_entries ON hours.hour = hourly_entries.hour
-                LEFT JOIN hourly_exits ON hours.hour = hourly_exits.hour
-                ORDER BY hours.hour
-            """)
+            execute_prepared(cur, GET_HOURLY_OCCUPANCY)
             results = cur.fetchall()
             
             return [{
@@ -337,28 +486,29 @@ def get_hourly_occupancy():
     finally:
         release_db_connection(conn)
 
+GET_WEEKLY_REVENUE = register_statement('get_weekly_revenue', """
+    WITH RECURSIVE days AS (
+        SELECT date_trunc('day', NOW() - interval '6 days') as day
+        UNION ALL
+        SELECT day + interval '1 day'
+        FROM days
+        WHERE day < date_trunc('day', NOW())
+    )
+    SELECT
+        days.day,
+        COALESCE(r.revenue, 0) as revenue,
+        COALESCE(r.payments, 0) as transactions
+    FROM days
+    LEFT JOIN daily_rollup r ON r.day = days.day::date
+    ORDER BY days.day
+""")
+
 def get_weekly_revenue():
     """Get daily revenue for the last 7 days"""
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                WITH RECURSIVE days AS (
-                    SELECT date_trunc('day', NOW() - interval '6 days') as day
-                    UNION ALL
-                    SELECT day + interval '1 day'
-                    FROM days
-                    WHERE day < date_trunc('day', NOW())
-                )
-                SELECT 
-                    days.day,
-                    COALESCE(SUM(amount_paid), 0) as revenue,
-                    COUNT(*) as transactions
-                FROM days
-                LEFT JOIN parking_entries ON date_trunc('day', payment_timestamp) = days.day
-                GROUP BY days.day
-                ORDER BY days.day
-            """)
+            execute_prepared(cur, GET_WEEKLY_REVENUE)
             results = cur.fetchall()
             
             return [{
@@ -372,21 +522,24 @@ def get_weekly_revenue():
     finally:
         release_db_connection(conn)
 
+GET_PEAK_HOURS = register_statement('get_peak_hours', """
+    SELECT
+        EXTRACT(HOUR FROM hour) as hour,
+        SUM(entries) as entries
+    FROM hourly_rollup
+    WHERE hour >= date_trunc('hour', NOW() - interval '7 days')
+    GROUP BY 1
+    HAVING SUM(entries) > 0
+    ORDER BY 2 DESC
+    LIMIT 5
+""")
+
 def get_peak_hours():
     """Get peak hours analysis"""
     conn = get_db_connection()
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT 
-                    EXTRACT(HOUR FROM entry_timestamp) as hour,
-                    COUNT(*) as entries
-                FROM parking_entries
-                WHERE entry_timestamp >= NOW() - interval '7 days'
-                GROUP BY 1
-                ORDER BY 2 DESC
-                LIMIT 5
-            """)
+            execute_prepared(cur, GET_PEAK_HOURS)
             results = cur.fetchall()
             
             return [{
@@ -399,21 +552,73 @@ def get_peak_hours():
     finally:
         release_db_connection(conn)
 
+REPORT_PERIODS = ('day', 'week', 'month', 'year')
+
+GET_PERIOD_REPORT = register_statement('get_period_report', """
+    SELECT
+        date_trunc($3, day::timestamp)::date as period,
+        SUM(entries) as entries,
+        SUM(exits) as exits,
+        SUM(payments) as payments,
+        SUM(revenue) as revenue
+    FROM daily_rollup
+    WHERE day >= $1 AND day < $2
+    GROUP BY 1
+    ORDER BY 1
+""")
+
+def get_period_report(start, end, period='month'):
+    """Entries, exits, payments and revenue per day, week, month or year from start up to end (exclusive)"""
+    if period not in REPORT_PERIODS:
+        raise ValueError(f"period must be one of {', '.join(REPORT_PERIODS)}")
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            execute_prepared(cur, GET_PERIOD_REPORT, (start, end, period))
+            results = cur.fetchall()
+
+            return [{
+                'period': result[0].strftime('%Y-%m-%d'),
+                'entries': int(result[1]),
+                'exits': int(result[2]),
+                'payments': int(result[3]),
+                'revenue': float(result[4])
+            } for result in results]
+    except Exception as e:
+        print(f"Error getting period report: {e}")
+        return []
+    finally:
+        release_db_connection(conn)
+
+IS_VEHICLE_INSIDE = register_statement('is_vehicle_inside', f"""
+    SELECT EXISTS (
+        SELECT 1
+        FROM parking_entries
+        WHERE plate_number = $1
+        AND exit_timestamp IS NULL
+        AND entry_timestamp >= LOCALTIMESTAMP - {ENTRY_LOOKBACK}
+    )
+""")
+
 def is_vehicle_inside(plate_number):
     """Check if a vehicle is currently in the parking lot"""
-    conn = get_db_connection()
+    # Both answers come from the DB: the occupancy index only learns of another
+    # process's entries (the other gate, a migration) on its next refresh, and
+    # a stale 'not inside' would let a duplicate entry through. The EXISTS probes
+    # idx_entries_plate_open in the partitions within ENTRY_LOOKBACK. The index is only the fallback
+    # when the database cannot be reached.
+    conn = None
     try:
+        conn = get_db_connection()
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT COUNT(*) 
-                FROM parking_entries 
-                WHERE plate_number = %s 
-                AND exit_timestamp IS NULL
-            """, (plate_number,))
-            count = cur.fetchone()[0]
-            return count > 0
+            execute_prepared(cur, IS_VEHICLE_INSIDE, (plate_number,))
+            inside = cur.fetchone()[0]
+            if not inside:
+                occupancy.record_exit(plate_number)
+            return inside
     except Exception as e:
         print(f"Error checking vehicle status: {e}")
-        return False
+        return occupancy.get(plate_number) is not None
     finally:
-        release_db_connection(conn) 
\ No newline at end of file
+        if conn:
+            release_db_connection(conn) 
\ No newline at end of file
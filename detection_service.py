@@ -0,0 +1,184 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import cv2
+
+from anpr import get_engine, boxes_from_result, load_lanes, MODEL_PATH
+
+
+class BatchDetector:
+    """
+    Collects frames from several gate lanes into one YOLO batch.
+
+    A batch is flushed as soon as it holds max_batch frames or the oldest
+    frame has waited max_latency seconds, whichever comes first. Each lane gets
+    its own boxes back through the Future returned by submit(), detected within
+    its ROI and at its resolution when lanes (see anpr.load_lanes) configures it.
+    """
+
+    def __init__(self, engine=None, max_batch=8, max_latency=0.05, lanes=None):
+        self.engine = engine or get_engine()
+        self.lanes = lanes if lanes is not None else load_lanes()
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.batches = 0
+        self.frames = 0
+        self._pending = []
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='batch-detector', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=2)
+        with self._cond:
+            for _, _, future, _ in self._pending:
+                future.cancel()
+            self._pending.clear()
+
+    def submit(self, lane, frame):
+        """Queue a frame for the next batch; the Future resolves to [(x1, y1, x2, y2, conf), ...]"""
+        future = Future()
+        with self._cond:
+            self._pending.append((lane, frame, future, time.monotonic()))
+            self._cond.notify_all()
+        return future
+
+    def detect(self, lane, frame, timeout=None):
+        """Blocking convenience wrapper around submit()"""
+        return self.submit(lane, frame).result(timeout)
+
+    def _take_batch(self):
+        with self._cond:
+            while self._running and not self._pending:
+                self._cond.wait()
+            if not self._running:
+                return []
+            deadline = self._pending[0][3] + self.max_latency
+            while self._running and len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._take_batch()
+            if not batch:
+                continue
+            try:
+                results = self.engine.detect_lanes([frame for _, frame, _, _ in batch],
+                                                   [self.lanes.get(lane) for lane, _, _, _ in batch])
+                for (_, _, future, _), result in zip(batch, results):
+                    future.set_result(boxes_from_result(result))
+            except Exception as e:
+                print(f"[ERROR] Batch detection failed: {e}")
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+            self.batches += 1
+            self.frames += len(batch)
+
+
+def open_source(source):
+    """Yield frames from a camera index, a video file or a directory of images"""
+    if os.path.isdir(source):
+        images = sorted(f for f in os.listdir(source) if f.lower().endswith(('.jpg', '.jpeg', '.png')))
+        while images:
+            for name in images:
+                frame = cv2.imread(os.path.join(source, name))
+                if frame is not None:
+                    yield frame
+    else:
+        cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    # Loop recorded files so a benchmark can run for a fixed frame count
+                    if source.isdigit():
+                        return
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                yield frame
+        finally:
+            cap.release()
+
+
+def run_lane(lane, source, detector, frame_limit, latencies, on_result=None):
+    """Feed one lane's frames through the shared detector"""
+    for count, frame in enumerate(open_source(source)):
+        if count >= frame_limit:
+            break
+        started = time.monotonic()
+        boxes = detector.detect(lane, frame)
+        latencies.append(time.monotonic() - started)
+        if on_result:
+            on_result(lane, frame, boxes)
+
+
+def benchmark(sources, batch_sizes, lanes, frames_per_lane, max_latency, model_path, detector=None):
+    """Report detection FPS and per-frame latency for each batch size"""
+    engine = get_engine(model_path, detector)
+    # Warm-up so the first batch does not include model initialisation
+    engine.detect_batch([next(open_source(sources[0]))])
+
+    print(f"[BENCH] {lanes} lanes x {frames_per_lane} frames, max latency {max_latency * 1000:.0f}ms")
+    for batch_size in batch_sizes:
+        detector = BatchDetector(engine, max_batch=batch_size, max_latency=max_latency).start()
+        latencies = []
+        threads = [threading.Thread(target=run_lane,
+                                    args=(f'lane-{i}', sources[i % len(sources)], detector,
+                                          frames_per_lane, latencies))
+                   for i in range(lanes)]
+        started = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - started
+        detector.stop()
+
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+        avg_batch = detector.frames / detector.batches if detector.batches else 0
+        print(f"[BENCH] batch={batch_size}: {detector.frames / elapsed:.1f} FPS, "
+              f"avg batch {avg_batch:.1f}, latency p50 {p50:.0f}ms p95 {p95:.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched plate detection across gate cameras")
+    parser.add_argument('--sources', nargs='+', default=['dataset/val/images'],
+                        help="camera indices, video files or image directories")
+    parser.add_argument('--lanes', type=int, default=8,
+                        help="number of lanes to simulate (sources are reused round-robin)")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--frames', type=int, default=50, help="frames per lane")
+    parser.add_argument('--max-latency', type=float, default=0.05,
+                        help="seconds a frame may wait for its batch to fill")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--detector', choices=['auto', 'ultralytics', 'onnx'],
+                        help="detector backend (default: ANPR_DETECTOR or auto)")
+    args = parser.parse_args()
+
+    benchmark(args.sources, args.batch_sizes, args.lanes, args.frames, args.max_latency, args.model,
+              args.detector)
+
+
+if __name__ == "__main__":
+    main()
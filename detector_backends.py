@@ -0,0 +1,244 @@
+import argparse
+import ast
+import os
+
+import cv2
+import numpy as np
+
+DETECTOR = os.getenv('ANPR_DETECTOR', 'auto')
+IMGSZ = 640
+CONF_THRESHOLD = 0.25  # ultralytics predict() defaults
+IOU_THRESHOLD = 0.7
+MAX_DET = 300
+PAD_VALUE = 114
+
+
+class PlateBox:
+    """One box shaped like an ultralytics Boxes row: xyxy (1, 4), conf (1,), cls (1,)"""
+
+    def __init__(self, xyxy, conf, cls=0):
+        self.xyxy = np.array([xyxy], dtype=np.float32)
+        self.conf = np.array([conf], dtype=np.float32)
+        self.cls = np.array([cls], dtype=np.float32)
+
+
+class DetectionResult:
+    """
+    The part of an ultralytics Results object the gate scripts use: .boxes
+    (iterated with box.xyxy[0] / box.conf[0], see anpr.boxes_from_result),
+    .orig_img and .plot()
+    """
+
+    def __init__(self, orig_img, boxes, names):
+        self.orig_img = orig_img
+        self.boxes = boxes
+        self.names = names
+
+    def plot(self):
+        annotated = self.orig_img.copy()
+        for box in self.boxes:
+            x1, y1, x2, y2 = map(int, box.xyxy[0])
+            label = f"{self.names.get(int(box.cls[0]), int(box.cls[0]))} {float(box.conf[0]):.2f}"
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), (56, 56, 255), 2)
+            cv2.putText(annotated, label, (x1, max(y1 - 6, 12)), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.6, (56, 56, 255), 2, cv2.LINE_AA)
+        return annotated
+
+
+class Detector:
+    """Runs the plate detector on a list of BGR frames; returns one result per frame"""
+
+    name = 'base'
+
+    def predict(self, frames, imgsz=None):
+        raise NotImplementedError
+
+
+class UltralyticsDetector(Detector):
+    """The full ultralytics/PyTorch stack on best.pt"""
+
+    name = 'ultralytics'
+
+    def __init__(self, model_path):
+        from ultralytics import YOLO
+
+        self.model_path = model_path
+        self.model = YOLO(model_path)
+
+    def predict(self, frames, imgsz=None):
+        kwargs = {'imgsz': imgsz} if imgsz else {}
+        return self.model(list(frames), verbose=False, **kwargs)
+
+
+def letterbox(frame, size):
+    """Resize keeping the aspect ratio and pad to size x size, as ultralytics does; returns (img, ratio, (pad_x, pad_y))"""
+    h, w = frame.shape[:2]
+    ratio = min(size / h, size / w)
+    new_w, new_h = round(w * ratio), round(h * ratio)
+    pad_x, pad_y = (size - new_w) / 2, (size - new_h) / 2
+    if (new_w, new_h) != (w, h):
+        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = round(pad_y - 0.1), round(pad_y + 0.1)
+    left, right = round(pad_x - 0.1), round(pad_x + 0.1)
+    padded = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT,
+                                value=(PAD_VALUE, PAD_VALUE, PAD_VALUE))
+    return padded, ratio, (left, top)
+
+
+class OnnxDetector(Detector):
+    """
+    An exported best.onnx (optionally INT8) on onnxruntime's CPU provider.
+
+    Pre- and post-processing (letterbox, confidence filter, NMS) follow
+    ultralytics' defaults, and results mimic its Results objects, so boxes and
+    crops come out the same as with the PyTorch model.
+    """
+
+    name = 'onnx'
+
+    def __init__(self, model_path, conf=CONF_THRESHOLD, iou=IOU_THRESHOLD, threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.conf = conf
+        self.iou = iou
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Dynamic dims are strings in the ONNX graph
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        self.dynamic_size = not isinstance(model_input.shape[2], int)
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata['names']) if 'names' in metadata else {0: 'license_plate'}
+        self.imgsz = ast.literal_eval(metadata['imgsz'])[0] if 'imgsz' in metadata else IMGSZ
+
+    def predict(self, frames, imgsz=None):
+        frames = list(frames)
+        size = imgsz if imgsz and self.dynamic_size else self.imgsz
+        prepared = [letterbox(frame, size) for frame in frames]
+        # BGR HWC uint8 -> RGB CHW float32 in [0, 1]
+        batch = np.stack([img for img, _, _ in prepared])[..., ::-1].transpose(0, 3, 1, 2)
+        batch = np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+        if self.dynamic_batch:
+            outputs = self.session.run(None, {self.input_name: batch})[0]
+        else:
+            outputs = np.concatenate([self.session.run(None, {self.input_name: batch[i:i + 1]})[0]
+                                      for i in range(len(frames))])
+        return [self._decode(output, frame, ratio, pad)
+                for output, frame, (_, ratio, pad) in zip(outputs, frames, prepared)]
+
+    def _decode(self, output, frame, ratio, pad):
+        # (4 + classes, anchors) -> one row per anchor: cx, cy, w, h, class scores...
+        predictions = output.T
+        scores = predictions[:, 4:].max(axis=1)
+        keep = scores > self.conf
+        predictions, scores = predictions[keep], scores[keep]
+        classes = predictions[:, 4:].argmax(axis=1)
+
+        xywh = predictions[:, :4].copy()
+        xywh[:, 0] -= xywh[:, 2] / 2
+        xywh[:, 1] -= xywh[:, 3] / 2
+        indices = cv2.dnn.NMSBoxes(xywh.tolist(), scores.tolist(), self.conf, self.iou)
+        indices = np.array(indices, dtype=int).reshape(-1)[:MAX_DET]
+
+        h, w = frame.shape[:2]
+        boxes = []
+        for i in indices:
+            x, y, bw, bh = xywh[i]
+            x1 = np.clip((x - pad[0]) / ratio, 0, w)
+            y1 = np.clip((y - pad[1]) / ratio, 0, h)
+            x2 = np.clip((x + bw - pad[0]) / ratio, 0, w)
+            y2 = np.clip((y + bh - pad[1]) / ratio, 0, h)
+            boxes.append(PlateBox((x1, y1, x2, y2), scores[i], classes[i]))
+        return DetectionResult(frame, boxes, self.names)
+
+
+BACKENDS = {
+    'ultralytics': UltralyticsDetector,
+    'onnx': OnnxDetector
+}
+
+
+def get_detector(model_path, name=None):
+    """
+    Build a plate detector by name ('ultralytics', 'onnx' or 'auto').
+
+    'auto' serves .onnx models with onnxruntime and everything else with
+    ultralytics. 'onnx' with a .pt path uses the export next to it (best.onnx).
+    """
+    name = name or DETECTOR
+    if name == 'auto':
+        name = 'onnx' if model_path.endswith('.onnx') else 'ultralytics'
+    if name == 'onnx' and not model_path.endswith('.onnx'):
+        model_path = os.path.splitext(model_path)[0] + '.onnx'
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"{model_path} not found; run: python detector_backends.py export")
+    return BACKENDS[name](model_path)
+
+
+class CalibrationImages:
+    """onnxruntime CalibrationDataReader over a folder of images, letterboxed like inference"""
+
+    def __init__(self, image_dir, input_name, imgsz, limit=200):
+        names = sorted(n for n in os.listdir(image_dir) if n.lower().endswith(('.jpg', '.jpeg', '.png')))
+        self.paths = [os.path.join(image_dir, n) for n in names[:limit]]
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self._iter = iter(self.paths)
+
+    def get_next(self):
+        for path in self._iter:
+            frame = cv2.imread(path)
+            if frame is None:
+                continue
+            img = letterbox(frame, self.imgsz)[0][..., ::-1].transpose(2, 0, 1)
+            return {self.input_name: np.ascontiguousarray(img[None], dtype=np.float32) / 255.0}
+        return None
+
+
+def export(model_path, imgsz=IMGSZ, int8=False, calib_dir='dataset/train/images'):
+    """Export best.pt to best.onnx and, with int8, a statically quantized best.int8.onnx; returns the paths"""
+    from ultralytics import YOLO
+
+    onnx_path = YOLO(model_path).export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+    paths = [onnx_path]
+    print(f"[EXPORT] {model_path} -> {onnx_path}")
+    if int8:
+        import onnxruntime as ort
+        from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+
+        base = os.path.splitext(onnx_path)[0]
+        prepared_path, int8_path = base + '.prep.onnx', base + '.int8.onnx'
+        quant_pre_process(onnx_path, prepared_path)
+        input_name = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+        # Calibrated on training images: activations are quantized too, not just weights
+        quantize_static(prepared_path, int8_path, CalibrationImages(calib_dir, input_name, imgsz),
+                        quant_format=QuantFormat.QDQ, activation_type=QuantType.QUInt8,
+                        weight_type=QuantType.QInt8, per_channel=True)
+        os.remove(prepared_path)
+        paths.append(int8_path)
+        print(f"[EXPORT] INT8 (calibrated on {calib_dir}) -> {int8_path}")
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the plate detector for CPU inference")
+    parser.add_argument('command', choices=['export'])
+    parser.add_argument('--model', default=os.getenv('ANPR_MODEL', 'best.pt'))
+    parser.add_argument('--imgsz', type=int, default=IMGSZ)
+    parser.add_argument('--int8', action='store_true', help="also write a statically quantized INT8 model")
+    parser.add_argument('--calib-dir', default='dataset/train/images')
+    args = parser.parse_args()
+
+    export(args.model, args.imgsz, args.int8, args.calib_dir)
+
+
+if __name__ == "__main__":
+    main()
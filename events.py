@@ -0,0 +1,64 @@
+import threading
+from collections import OrderedDict
+
+# Event kinds published by db_operations after each committed write
+ENTRY = 'entry'
+PAYMENT = 'payment'
+EXIT = 'exit'
+ALERT = 'alert'
+ALERT_READ = 'alert_read'
+
+
+class EventBus:
+    """
+    Minimal in-process publish/subscribe for parking writes.
+
+    Entry, payment and exit events carry the parking_entries row in the same
+    shape as get_recent_activities(); alert events carry the alerts row as in
+    get_recent_alerts(). Subscribers run synchronously on the publishing thread,
+    so they must be quick and must not raise.
+
+    A write can reach the bus twice, from the process that made it and from the
+    database NOTIFY listener (see db_listener.py), so events are de-duplicated
+    on (kind, row id) over the last dedup_window events.
+    """
+
+    def __init__(self, dedup_window=1024):
+        self.dedup_window = dedup_window
+        self.duplicates = 0
+        self._subscribers = []  # (callback, kinds or None)
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback, kinds=None):
+        """callback(kind, data) for every event, or only for the given kinds"""
+        with self._lock:
+            self._subscribers.append((callback, set(kinds) if kinds else None))
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s[0] is not callback]
+
+    def publish(self, kind, data):
+        """Deliver an event to its subscribers; returns False if it was a duplicate"""
+        key = (kind, data.get('id'))
+        with self._lock:
+            if key[1] is not None:
+                if key in self._recent:
+                    self.duplicates += 1
+                    return False
+                self._recent[key] = True
+                while len(self._recent) > self.dedup_window:
+                    self._recent.popitem(last=False)
+            subscribers = list(self._subscribers)
+        for callback, kinds in subscribers:
+            if kinds is not None and kind not in kinds:
+                continue
+            try:
+                callback(kind, data)
+            except Exception as e:
+                print(f"[ERROR] Event subscriber failed on {kind}: {e}")
+        return True
+
+
+bus = EventBus()
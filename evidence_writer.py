@@ -0,0 +1,133 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import cv2
+
+
+def crop_quality(plate_img):
+    """Sharpness (variance of the Laplacian) weighted by crop size; higher is better evidence"""
+    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape[:2]
+    return cv2.Laplacian(gray, cv2.CV_64F).var() * (h * w) ** 0.5
+
+
+class EvidenceWriter:
+    """
+    Background writer for plate crop evidence.
+
+    Candidate crops are offered per vehicle event (e.g. a tracker id); when the
+    event finishes only the best-quality crop is encoded and written, under a
+    date-sharded directory (plates/YYYY/MM/DD/). The recognizer never blocks on
+    disk: when the queue is full new work is dropped and counted.
+    """
+
+    def __init__(self, root='plates', quality=90, queue_size=64, event_ttl=60, sharded=True):
+        self.root = root
+        self.quality = quality
+        self.event_ttl = event_ttl
+        self.sharded = sharded
+        self.dropped = 0
+        self.written = 0
+        self.bytes_per_hour = OrderedDict()  # 'YYYY-MM-DD HH' -> bytes
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._events = {}  # key -> [best score, crop, first offered]
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='evidence-writer', daemon=True)
+        self._thread.start()
+
+    # ===== Producer side (recognizer threads) =====
+    def _enqueue(self, item):
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def offer(self, key, plate_img):
+        """Propose a crop for an ongoing vehicle event"""
+        # Crops are views into frames the capture thread never reuses, so no copy is needed
+        return self._enqueue(('offer', key, plate_img, None))
+
+    def finish(self, key, plate):
+        """Close a vehicle event and write its best crop under the plate number"""
+        return self._enqueue(('finish', key, None, plate))
+
+    def write(self, plate, plate_img):
+        """One-shot event: write this crop"""
+        key = object()
+        return self.offer(key, plate_img) and self.finish(key, plate)
+
+    # ===== Writer thread =====
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            kind, key, plate_img, plate = item
+            try:
+                if kind == 'offer':
+                    self._offer(key, plate_img)
+                else:
+                    self._finish(key, plate)
+            except Exception as e:
+                print(f"[ERROR] Evidence writer failed: {e}")
+            self._expire()
+
+    def _offer(self, key, plate_img):
+        score = crop_quality(plate_img)
+        best = self._events.get(key)
+        if best is None:
+            self._events[key] = [score, plate_img, time.monotonic()]
+        elif score > best[0]:
+            best[0], best[1] = score, plate_img
+
+    def _finish(self, key, plate):
+        best = self._events.pop(key, None)
+        if best is None:
+            return
+        now = datetime.now()
+        directory = os.path.join(self.root, now.strftime('%Y'), now.strftime('%m'), now.strftime('%d')) \
+            if self.sharded else self.root
+        os.makedirs(directory, exist_ok=True)
+
+        ok, encoded = cv2.imencode('.jpg', best[1], [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            print(f"[ERROR] Could not encode evidence for {plate}")
+            return
+        save_path = os.path.join(directory, f"{plate}_{now.strftime('%Y%m%d_%H%M%S')}.jpg")
+        with open(save_path, 'wb') as f:
+            f.write(encoded.tobytes())
+
+        hour = now.strftime('%Y-%m-%d %H')
+        with self._lock:
+            self.written += 1
+            self.bytes_per_hour[hour] = self.bytes_per_hour.get(hour, 0) + len(encoded)
+            while len(self.bytes_per_hour) > 48:
+                self.bytes_per_hour.popitem(last=False)
+        print(f"[IMAGE SAVED] {save_path}")
+
+    def _expire(self):
+        """Forget offers for events that never finished (no confirmed plate)"""
+        cutoff = time.monotonic() - self.event_ttl
+        for key in [k for k, best in self._events.items() if best[2] < cutoff]:
+            del self._events[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'written': self.written,
+                'dropped': self.dropped,
+                'queue_depth': self._queue.qsize(),
+                'bytes_per_hour': dict(self.bytes_per_hour)
+            }
+
+    def close(self):
+        """Write everything already queued, then stop"""
+        self._queue.put(None)
+        self._thread.join(timeout=5)
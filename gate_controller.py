@@ -0,0 +1,188 @@
+import heapq
+import queue
+import threading
+import time
+from itertools import count
+
+import serial
+
+# Single-byte commands understood by gate.ino / arduino_gate_controller.ino
+OPEN_GATE = b'1'
+CLOSE_GATE = b'0'
+TRIGGER_ALERT = b'2'
+STOP_ALERT = b'3'
+
+
+class FakeSerial:
+    """In-memory stand-in for serial.Serial, for running and testing without hardware"""
+
+    def __init__(self, lines=()):
+        self.is_open = True
+        self.written = []  # (monotonic time, bytes)
+        self._lines = queue.Queue()
+        for line in lines:
+            self.feed(line)
+
+    def feed(self, line):
+        """Queue a line as if the Arduino had printed it"""
+        self._lines.put(line.encode() + b'\n' if isinstance(line, str) else line)
+
+    def write(self, data):
+        self.written.append((time.monotonic(), data))
+        return len(data)
+
+    def readline(self):
+        try:
+            return self._lines.get(timeout=0.1)
+        except queue.Empty:
+            return b''
+
+    @property
+    def in_waiting(self):
+        return self._lines.qsize()
+
+    def close(self):
+        self.is_open = False
+
+
+class GateController:
+    """
+    Owns the gate's serial port and runs timed commands on its own thread.
+
+    Callers fire and forget: open_gate() returns immediately and the close is
+    scheduled, re-opening for the next car just pushes the close back, and buzz
+    patterns are queued instead of sleeping in the recognizer loop. Lines printed
+    by the Arduino are handed to listeners from a reader thread.
+    """
+
+    def __init__(self, port=None, baudrate=9600, serial_port=None):
+        self.serial = serial_port
+        if self.serial is None and port:
+            try:
+                self.serial = serial.Serial(port, baudrate, timeout=1)
+                time.sleep(2)  # Wait for Arduino to initialize
+                print(f"[CONNECTED] Arduino on {port}")
+            except Exception as e:
+                print(f"[ERROR] Failed to connect to Arduino: {e}")
+        if self.serial is None:
+            print("[GATE] No Arduino; using a fake serial backend")
+            self.serial = FakeSerial()
+
+        self.hardware = not isinstance(self.serial, FakeSerial)
+        self._listeners = []
+        self._schedule = []  # heap of (due, seq, command, tag)
+        self._seq = count()
+        self._buzzer_free_at = 0.0  # buzzer patterns queue up behind each other
+        self._cond = threading.Condition()
+        self._running = True
+        self._writer = threading.Thread(target=self._write_loop, name='gate-writer', daemon=True)
+        self._reader = threading.Thread(target=self._read_loop, name='gate-reader', daemon=True)
+        self._writer.start()
+        self._reader.start()
+
+    # ===== Scheduling =====
+    def schedule(self, command, delay=0.0, tag=None):
+        """Send a command byte after delay seconds"""
+        self._schedule_at(time.monotonic() + delay, command, tag)
+
+    def _schedule_at(self, due, command, tag=None):
+        with self._cond:
+            heapq.heappush(self._schedule, (due, next(self._seq), command, tag))
+            self._cond.notify()
+
+    def _reserve_buzzer(self, seconds):
+        """Start time for a buzzer pattern of the given length, after any pattern already queued"""
+        with self._cond:
+            start = max(time.monotonic(), self._buzzer_free_at)
+            self._buzzer_free_at = start + seconds
+            return start
+
+    def cancel(self, tag):
+        """Drop every pending command carrying tag"""
+        with self._cond:
+            self._schedule = [item for item in self._schedule if item[3] != tag]
+            heapq.heapify(self._schedule)
+
+    def pending(self):
+        with self._cond:
+            return len(self._schedule)
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while self._running and (not self._schedule or self._schedule[0][0] > time.monotonic()):
+                    timeout = self._schedule[0][0] - time.monotonic() if self._schedule else None
+                    self._cond.wait(timeout)
+                if not self._running:
+                    return
+                _, _, command, _ = heapq.heappop(self._schedule)
+            try:
+                self.serial.write(command)
+            except Exception as e:
+                print(f"[ERROR] Failed to send {command!r} to gate: {e}")
+
+    # ===== Gate commands =====
+    def open_gate(self, hold=15):
+        """Open now and close after hold seconds; a repeat call extends the hold"""
+        self.cancel('close')
+        self.schedule(OPEN_GATE)
+        self.schedule(CLOSE_GATE, hold, tag='close')
+        print(f"[GATE] Opening gate for {hold}s")
+
+    def close_gate(self):
+        self.cancel('close')
+        self.schedule(CLOSE_GATE)
+        print("[GATE] Closing gate")
+
+    def alert(self, duration=None):
+        """Sound the warning alert, optionally stopping it after duration seconds"""
+        start = self._reserve_buzzer(duration or 0.0)
+        self._schedule_at(start, TRIGGER_ALERT)
+        if duration:
+            self._schedule_at(start + duration, STOP_ALERT)
+
+    def stop_alert(self):
+        self.schedule(STOP_ALERT)
+
+    def buzz(self, times=3, on=0.5, off=0.5):
+        """Queue an on/off buzzer pattern"""
+        # STOP_ALERT rather than CLOSE_GATE ends each beep, so a buzz never
+        # drops the barrier on a car that is still passing through
+        start = self._reserve_buzzer(times * (on + off))
+        for i in range(times):
+            beep = start + i * (on + off)
+            self._schedule_at(beep, TRIGGER_ALERT)
+            self._schedule_at(beep + on, STOP_ALERT)
+
+    # ===== Incoming lines =====
+    def add_listener(self, callback):
+        """callback(line) is called from the reader thread for every line the Arduino prints"""
+        self._listeners.append(callback)
+
+    def _read_loop(self):
+        while self._running and self.serial.is_open:
+            try:
+                line = self.serial.readline().decode(errors='ignore').strip()
+            except Exception as e:
+                if self._running:
+                    print(f"[ERROR] Gate serial read failed: {e}")
+                return
+            if not line:
+                continue
+            for callback in list(self._listeners):
+                try:
+                    callback(line)
+                except Exception as e:
+                    print(f"[ERROR] Serial listener failed: {e}")
+
+    def close(self):
+        """Stop the worker threads and release the serial port, never leaving the gate open"""
+        with self._cond:
+            close_pending = any(item[3] == 'close' for item in self._schedule)
+            self._running = False
+            self._cond.notify_all()
+        self._writer.join(timeout=2)
+        self._reader.join(timeout=2)
+        if close_pending:
+            self.serial.write(CLOSE_GATE)
+        self.serial.close()
@@ -1,35 +1,162 @@
+import argparse
 import csv
+import gzip
+import io
+import time
 from datetime import datetime
-from db_operations import add_parking_entry, update_payment_status
+from db_config import get_db_connection, release_db_connection
+from rollups import refresh_rollups
+
+CHUNK_ROWS = 50000
+
+def open_log(path):
+    """Open a CSV log, transparently decompressing .gz files"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', newline='')
+    return open(path, 'r', newline='')
+
+def parse_row(row):
+    """(plate, paid, entry_timestamp, payment_timestamp) from a plates_log.csv row, or None if unusable"""
+    plate = (row.get('Plate Number') or '').strip().upper()
+    if not plate or len(plate) > 10:
+        return None
+    # Truncated lines leave the missing columns as None, hence "or ''" on every field
+    try:
+        entry_timestamp = datetime.fromisoformat((row.get('Timestamp') or '').strip())
+        payment_timestamp = None
+        if (row.get('Payment Timestamp') or '').strip():
+            payment_timestamp = datetime.fromisoformat(row['Payment Timestamp'].strip())
+    except ValueError:
+        return None
+    paid = (row.get('Payment Status') or '').strip() == '1' and payment_timestamp is not None
+    return plate, paid, entry_timestamp, payment_timestamp if paid else None
+
+def load_chunk(conn, buffer, mark_exited):
+    """COPY one chunk into the staging table and insert the entries not already present;
+    returns (rows inserted, earliest and latest timestamp in the chunk)"""
+    buffer.seek(0)
+    with conn.cursor() as cur:
+        # A bulk load is not dashboard news (see the NOTIFY triggers in migrations.py),
+        # and its rollups are recomputed in one pass afterwards rather than per row
+        cur.execute("SET LOCAL parking.notify = 'off'")
+        cur.execute("SET LOCAL parking.rollup = 'off'")
+        cur.copy_expert("""
+            COPY import_staging (plate_number, payment_status, entry_timestamp, payment_timestamp)
+            FROM STDIN WITH (FORMAT csv)
+        """, buffer)
+        # Payments can predate their entry in legacy logs, so the span covers both
+        cur.execute("""
+            SELECT LEAST(MIN(entry_timestamp), MIN(payment_timestamp)),
+                   GREATEST(MAX(entry_timestamp), MAX(payment_timestamp))
+            FROM import_staging
+        """)
+        span = cur.fetchone()
+        # Historical months get their own partitions rather than the default one (migration 5)
+        cur.execute("SELECT create_monthly_partitions('parking_entries', 'entry_timestamp', %s, %s)", span)
+        # Idempotent: an entry is identified by plate and original entry time
+        cur.execute("""
+            INSERT INTO parking_entries
+                (plate_number, payment_status, entry_timestamp, payment_timestamp, exit_timestamp)
+            SELECT DISTINCT ON (s.plate_number, s.entry_timestamp)
+                   s.plate_number, s.payment_status, s.entry_timestamp, s.payment_timestamp,
+                   CASE WHEN %s THEN COALESCE(s.payment_timestamp, s.entry_timestamp) END
+            FROM import_staging s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM parking_entries p
+                WHERE p.plate_number = s.plate_number
+                AND p.entry_timestamp = s.entry_timestamp
+            )
+            ORDER BY s.plate_number, s.entry_timestamp
+        """, (mark_exited,))
+        inserted = cur.rowcount
+    conn.commit()  # ON COMMIT DELETE ROWS empties the staging table
+    return inserted, span
+
+def migrate_csv_to_db(paths=('plates_log.csv',), chunk_rows=CHUNK_ROWS, mark_exited=False):
+    """Bulk-load historical CSV logs into parking_entries with COPY, keeping their timestamps.
+
+    Files are streamed chunk_rows at a time, so memory does not depend on their
+    size, and re-running the import only adds entries that are not loaded yet.
+    """
+    conn = get_db_connection()
+    totals = {'read': 0, 'inserted': 0, 'rejected': 0}
+    # (earliest, latest) of every chunk; all of them, so a re-run after a failed
+    # import still refreshes the rollups of the rows the first run inserted
+    loaded = []
+    started = time.perf_counter()
+
+    def flush(buffer):
+        inserted, span = load_chunk(conn, buffer, mark_exited)
+        totals['inserted'] += inserted
+        loaded.append(span)
 
-def migrate_csv_to_db():
-    """Migrate data from plates_log.csv to PostgreSQL database"""
     try:
-        with open('plates_log.csv', 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                # Convert timestamp strings to datetime objects
-                entry_timestamp = datetime.strptime(row['Timestamp'], '%Y-%m-%d %H:%M:%S')
-                payment_timestamp = None
-                if row.get('Payment Timestamp'):
-                    payment_timestamp = datetime.strptime(row['Payment Timestamp'], '%Y-%m-%d %H:%M:%S')
-                
-                # Add entry to database
-                entry_id = add_parking_entry(row['Plate Number'])
-                
-                # If payment was made, update payment status
-                if row['Payment Status'] == '1' and payment_timestamp:
-                    update_payment_status(
-                        row['Plate Number'],
-                        entry_timestamp,
-                        None  # Amount paid not available in CSV
-                    )
-                
-                print(f"Migrated entry for plate {row['Plate Number']}")
-        
-        print("Migration completed successfully!")
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS import_staging (
+                    plate_number VARCHAR(10),
+                    payment_status BOOLEAN,
+                    entry_timestamp TIMESTAMP,
+                    payment_timestamp TIMESTAMP
+                ) ON COMMIT DELETE ROWS
+            """)
+        conn.commit()
+
+        for path in paths:
+            print(f"Importing {path}...")
+            with open_log(path) as f:
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                pending = 0
+                for line_number, row in enumerate(csv.DictReader(f), start=2):
+                    totals['read'] += 1
+                    parsed = parse_row(row)
+                    if parsed is None:
+                        totals['rejected'] += 1
+                        if totals['rejected'] <= 10:
+                            print(f"  Skipping {path}:{line_number}: {row}")
+                        continue
+                    writer.writerow(parsed)
+                    pending += 1
+                    if pending >= chunk_rows:
+                        flush(buffer)
+                        buffer.seek(0)
+                        buffer.truncate()
+                        pending = 0
+                        elapsed = time.perf_counter() - started
+                        print(f"  {totals['read']:,} rows read, {totals['inserted']:,} inserted "
+                              f"({totals['read'] / elapsed:,.0f} rows/s)")
+                if pending:
+                    flush(buffer)
+
+        if loaded:
+            first = min(span[0] for span in loaded)
+            last = max(span[1] for span in loaded)
+            print(f"Refreshing rollups from {first.date()} through {last.date()}...")
+            refresh_rollups(first, last, conn)
+
+        elapsed = time.perf_counter() - started
+        print(f"Migration completed: {totals['read']:,} rows read, {totals['inserted']:,} inserted, "
+              f"{totals['read'] - totals['rejected'] - totals['inserted']:,} already present, "
+              f"{totals['rejected']:,} rejected in {elapsed:.1f}s "
+              f"({totals['read'] / elapsed if elapsed else 0:,.0f} rows/s)")
+        return totals
     except Exception as e:
         print(f"Error during migration: {e}")
+        conn.rollback()
+        return totals
+    finally:
+        release_db_connection(conn)
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load historical plate logs into PostgreSQL")
+    parser.add_argument('files', nargs='*', default=['plates_log.csv'], help="CSV logs, optionally .gz")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--mark-exited', action='store_true',
+                        help="close imported entries at their payment (or entry) time; "
+                             "legacy logs do not record exits")
+    args = parser.parse_args()
+    migrate_csv_to_db(args.files, args.chunk_rows, args.mark_exited)
 
 if __name__ == "__main__":
-    migrate_csv_to_db() 
\ No newline at end of file
+    main()
@@ -0,0 +1,435 @@
+from db_config import get_db_connection, release_db_connection
+
+# Versioned schema changes, applied in order by init_db(). Never edit a
+# migration that has shipped; add a new one instead.
+MIGRATIONS = [
+    (1, 'initial schema', """
+        CREATE TABLE IF NOT EXISTS parking_entries (
+            id SERIAL PRIMARY KEY,
+            plate_number VARCHAR(10) NOT NULL,
+            payment_status BOOLEAN DEFAULT FALSE,
+            entry_timestamp TIMESTAMP NOT NULL,
+            exit_timestamp TIMESTAMP,
+            payment_timestamp TIMESTAMP,
+            amount_paid DECIMAL(10,2),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        -- Create index on plate_number for faster lookups
+        CREATE INDEX IF NOT EXISTS idx_plate_number ON parking_entries(plate_number);
+
+        -- Create index on payment_status for faster filtering
+        CREATE INDEX IF NOT EXISTS idx_payment_status ON parking_entries(payment_status);
+
+        -- Create alerts table for unauthorized attempts and other events
+        CREATE TABLE IF NOT EXISTS alerts (
+            id SERIAL PRIMARY KEY,
+            alert_type VARCHAR(50) NOT NULL,
+            plate_number VARCHAR(10),
+            message TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_read BOOLEAN DEFAULT FALSE
+        );
+
+        -- Create index on alert timestamp for faster retrieval
+        CREATE INDEX IF NOT EXISTS idx_alert_timestamp ON alerts(timestamp);
+    """),
+    (2, 'composite and partial indexes for gate and dashboard lookups', """
+        -- is_vehicle_inside / occupancy warm-up: open entries of a plate
+        CREATE INDEX IF NOT EXISTS idx_entries_plate_open
+            ON parking_entries (plate_number, entry_timestamp DESC)
+            WHERE exit_timestamp IS NULL;
+
+        -- get_last_unpaid_entry: newest unpaid entry of a plate
+        CREATE INDEX IF NOT EXISTS idx_entries_plate_unpaid
+            ON parking_entries (plate_number, entry_timestamp DESC)
+            WHERE payment_status = FALSE;
+
+        -- is_payment_complete, update_exit_timestamp, update_payment_status,
+        -- get_parking_history: newest entries of a plate
+        CREATE INDEX IF NOT EXISTS idx_entries_plate_entry
+            ON parking_entries (plate_number, entry_timestamp DESC);
+
+        -- get_daily_stats / get_hourly_occupancy / get_peak_hours: time ranges
+        CREATE INDEX IF NOT EXISTS idx_entries_entry_timestamp
+            ON parking_entries (entry_timestamp);
+        CREATE INDEX IF NOT EXISTS idx_entries_exit_timestamp
+            ON parking_entries (exit_timestamp)
+            WHERE exit_timestamp IS NOT NULL;
+        CREATE INDEX IF NOT EXISTS idx_entries_payment_timestamp
+            ON parking_entries (payment_timestamp)
+            WHERE payment_timestamp IS NOT NULL;
+
+        -- Superseded: idx_entries_plate_entry covers plate lookups, and a
+        -- boolean index is never selective enough to be used
+        DROP INDEX IF EXISTS idx_plate_number;
+        DROP INDEX IF EXISTS idx_payment_status;
+    """),
+    (3, 'NOTIFY parking_events on entry, payment, exit and alert writes', """
+        -- Payload: {"kind": ..., "data": <row>}, delivered on commit (see db_listener.py).
+        -- Bulk loads can opt out with SET parking.notify = 'off'.
+        CREATE OR REPLACE FUNCTION notify_parking_entry() RETURNS trigger AS $$
+        DECLARE
+            kind TEXT;
+        BEGIN
+            IF current_setting('parking.notify', true) = 'off' THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'INSERT' THEN
+                kind := 'entry';
+            ELSIF OLD.exit_timestamp IS NULL AND NEW.exit_timestamp IS NOT NULL THEN
+                kind := 'exit';
+            ELSIF NOT COALESCE(OLD.payment_status, FALSE) AND NEW.payment_status THEN
+                kind := 'payment';
+            ELSE
+                RETURN NULL;
+            END IF;
+            PERFORM pg_notify('parking_events',
+                json_build_object('kind', kind, 'data', row_to_json(NEW))::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION notify_alert() RETURNS trigger AS $$
+        DECLARE
+            kind TEXT;
+        BEGIN
+            IF current_setting('parking.notify', true) = 'off' THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'INSERT' THEN
+                kind := 'alert';
+            ELSIF NOT COALESCE(OLD.is_read, FALSE) AND NEW.is_read THEN
+                kind := 'alert_read';
+            ELSE
+                RETURN NULL;
+            END IF;
+            PERFORM pg_notify('parking_events',
+                json_build_object('kind', kind, 'data', row_to_json(NEW))::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS parking_entries_notify ON parking_entries;
+        CREATE TRIGGER parking_entries_notify
+            AFTER INSERT OR UPDATE ON parking_entries
+            FOR EACH ROW EXECUTE PROCEDURE notify_parking_entry();
+
+        DROP TRIGGER IF EXISTS alerts_notify ON alerts;
+        CREATE TRIGGER alerts_notify
+            AFTER INSERT OR UPDATE ON alerts
+            FOR EACH ROW EXECUTE PROCEDURE notify_alert();
+    """),
+    (4, 'last_activity_at with a covering index for the recent activity feed', """
+        ALTER TABLE parking_entries ADD COLUMN IF NOT EXISTS last_activity_at TIMESTAMP;
+
+        -- Maintained by the database so every writer (gate scripts, imports, manual SQL) keeps it right
+        CREATE OR REPLACE FUNCTION set_last_activity() RETURNS trigger AS $$
+        BEGIN
+            NEW.last_activity_at := GREATEST(NEW.entry_timestamp,
+                                             COALESCE(NEW.exit_timestamp, NEW.entry_timestamp),
+                                             COALESCE(NEW.payment_timestamp, NEW.entry_timestamp));
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS parking_entries_last_activity ON parking_entries;
+        CREATE TRIGGER parking_entries_last_activity
+            BEFORE INSERT OR UPDATE ON parking_entries
+            FOR EACH ROW EXECUTE PROCEDURE set_last_activity();
+
+        UPDATE parking_entries
+        SET last_activity_at = GREATEST(entry_timestamp,
+                                        COALESCE(exit_timestamp, entry_timestamp),
+                                        COALESCE(payment_timestamp, entry_timestamp))
+        WHERE last_activity_at IS NULL;
+        ALTER TABLE parking_entries ALTER COLUMN last_activity_at SET NOT NULL;
+
+        -- get_recent_activities: top-N straight off the index, without touching the heap
+        CREATE INDEX IF NOT EXISTS idx_entries_last_activity
+            ON parking_entries (last_activity_at DESC, id DESC)
+            INCLUDE (plate_number, payment_status, entry_timestamp,
+                     exit_timestamp, payment_timestamp, amount_paid);
+    """),
+    (5, 'monthly range partitions for parking_entries and alerts', """
+        -- Requires PostgreSQL 13+ (row triggers on partitioned tables).
+        -- Partitions are named <parent>_pYYYY_MM; rows outside every month
+        -- land in <parent>_default so writes never fail for want of one.
+        CREATE OR REPLACE FUNCTION create_monthly_partition(parent TEXT, key TEXT, for_month DATE)
+        RETURNS BOOLEAN AS $$
+        DECLARE
+            partition_name TEXT := format('%s_p%s', parent, to_char(for_month, 'YYYY_MM'));
+            lower_bound TIMESTAMP := date_trunc('month', for_month::timestamp);
+            upper_bound TIMESTAMP := date_trunc('month', for_month::timestamp) + interval '1 month';
+        BEGIN
+            IF to_regclass(partition_name) IS NOT NULL THEN
+                RETURN FALSE;
+            END IF;
+            -- Built detached so rows that already landed in the default partition can move in
+            EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', partition_name, parent);
+            EXECUTE format('WITH moved AS (DELETE FROM %I WHERE %I >= $1 AND %I < $2 RETURNING *) '
+                           'INSERT INTO %I SELECT * FROM moved',
+                           parent || '_default', key, key, partition_name)
+                USING lower_bound, upper_bound;
+            EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                           parent, partition_name, lower_bound, upper_bound);
+            RETURN TRUE;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- Every month from from_ts through to_ts; returns how many partitions were created
+        CREATE OR REPLACE FUNCTION create_monthly_partitions(parent TEXT, key TEXT,
+                                                             from_ts TIMESTAMP, to_ts TIMESTAMP)
+        RETURNS INTEGER AS $$
+            SELECT COUNT(*) FILTER (WHERE create_monthly_partition(parent, key, first_day::date))::integer
+            FROM generate_series(date_trunc('month', from_ts), to_ts, interval '1 month') AS first_day;
+        $$ LANGUAGE sql;
+
+        -- parking_entries: rebuilt partitioned by entry_timestamp, which every
+        -- plate and time-range lookup filters on
+        ALTER TABLE parking_entries RENAME TO parking_entries_unpartitioned;
+        CREATE TABLE parking_entries (
+            id INTEGER NOT NULL DEFAULT nextval('parking_entries_id_seq'),
+            plate_number VARCHAR(10) NOT NULL,
+            payment_status BOOLEAN DEFAULT FALSE,
+            entry_timestamp TIMESTAMP NOT NULL,
+            exit_timestamp TIMESTAMP,
+            payment_timestamp TIMESTAMP,
+            amount_paid DECIMAL(10,2),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_activity_at TIMESTAMP NOT NULL
+        ) PARTITION BY RANGE (entry_timestamp);
+        ALTER SEQUENCE parking_entries_id_seq OWNED BY parking_entries.id;
+        CREATE TABLE parking_entries_default PARTITION OF parking_entries DEFAULT;
+        SELECT create_monthly_partitions('parking_entries', 'entry_timestamp',
+            COALESCE((SELECT MIN(entry_timestamp) FROM parking_entries_unpartitioned), LOCALTIMESTAMP),
+            LOCALTIMESTAMP + interval '3 months');
+
+        -- Copied before the indexes and triggers exist: one pass, and no NOTIFY per row
+        INSERT INTO parking_entries
+            (id, plate_number, payment_status, entry_timestamp, exit_timestamp,
+             payment_timestamp, amount_paid, created_at, last_activity_at)
+        SELECT id, plate_number, payment_status, entry_timestamp, exit_timestamp,
+               payment_timestamp, amount_paid, created_at, last_activity_at
+        FROM parking_entries_unpartitioned;
+        DROP TABLE parking_entries_unpartitioned;
+
+        -- The partition key must be part of the primary key; ids still come from one sequence
+        ALTER TABLE parking_entries ADD PRIMARY KEY (id, entry_timestamp);
+        CREATE INDEX idx_entries_plate_open
+            ON parking_entries (plate_number, entry_timestamp DESC)
+            WHERE exit_timestamp IS NULL;
+        CREATE INDEX idx_entries_plate_unpaid
+            ON parking_entries (plate_number, entry_timestamp DESC)
+            WHERE payment_status = FALSE;
+        CREATE INDEX idx_entries_plate_entry
+            ON parking_entries (plate_number, entry_timestamp DESC);
+        CREATE INDEX idx_entries_entry_timestamp
+            ON parking_entries (entry_timestamp);
+        CREATE INDEX idx_entries_exit_timestamp
+            ON parking_entries (exit_timestamp)
+            WHERE exit_timestamp IS NOT NULL;
+        CREATE INDEX idx_entries_payment_timestamp
+            ON parking_entries (payment_timestamp)
+            WHERE payment_timestamp IS NOT NULL;
+        CREATE INDEX idx_entries_last_activity
+            ON parking_entries (last_activity_at DESC, id DESC)
+            INCLUDE (plate_number, payment_status, entry_timestamp,
+                     exit_timestamp, payment_timestamp, amount_paid);
+
+        CREATE TRIGGER parking_entries_last_activity
+            BEFORE INSERT OR UPDATE ON parking_entries
+            FOR EACH ROW EXECUTE PROCEDURE set_last_activity();
+        CREATE TRIGGER parking_entries_notify
+            AFTER INSERT OR UPDATE ON parking_entries
+            FOR EACH ROW EXECUTE PROCEDURE notify_parking_entry();
+
+        -- alerts: partitioned by timestamp
+        ALTER TABLE alerts RENAME TO alerts_unpartitioned;
+        CREATE TABLE alerts (
+            id INTEGER NOT NULL DEFAULT nextval('alerts_id_seq'),
+            alert_type VARCHAR(50) NOT NULL,
+            plate_number VARCHAR(10),
+            message TEXT NOT NULL,
+            timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            is_read BOOLEAN DEFAULT FALSE
+        ) PARTITION BY RANGE (timestamp);
+        ALTER SEQUENCE alerts_id_seq OWNED BY alerts.id;
+        CREATE TABLE alerts_default PARTITION OF alerts DEFAULT;
+        SELECT create_monthly_partitions('alerts', 'timestamp',
+            COALESCE((SELECT MIN(timestamp) FROM alerts_unpartitioned), LOCALTIMESTAMP),
+            LOCALTIMESTAMP + interval '3 months');
+
+        INSERT INTO alerts (id, alert_type, plate_number, message, timestamp, is_read)
+        SELECT id, alert_type, plate_number, message, COALESCE(timestamp, LOCALTIMESTAMP), is_read
+        FROM alerts_unpartitioned;
+        DROP TABLE alerts_unpartitioned;
+
+        ALTER TABLE alerts ADD PRIMARY KEY (id, timestamp);
+        CREATE INDEX idx_alert_timestamp ON alerts (timestamp);
+
+        CREATE TRIGGER alerts_notify
+            AFTER INSERT OR UPDATE ON alerts
+            FOR EACH ROW EXECUTE PROCEDURE notify_alert();
+    """),
+    (6, 'hourly and daily rollups of entries, exits, payments and revenue', """
+        -- Analytics read these instead of the raw entries; they outlive the
+        -- partitions archived by partitions.py
+        CREATE TABLE IF NOT EXISTS hourly_rollup (
+            hour TIMESTAMP PRIMARY KEY,
+            entries INTEGER NOT NULL DEFAULT 0,
+            exits INTEGER NOT NULL DEFAULT 0,
+            payments INTEGER NOT NULL DEFAULT 0,
+            revenue DECIMAL(12,2) NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS daily_rollup (
+            day DATE PRIMARY KEY,
+            entries INTEGER NOT NULL DEFAULT 0,
+            exits INTEGER NOT NULL DEFAULT 0,
+            payments INTEGER NOT NULL DEFAULT 0,
+            revenue DECIMAL(12,2) NOT NULL DEFAULT 0
+        );
+
+        -- bump_rollups(at, entries, exits, payments, revenue)
+        CREATE OR REPLACE FUNCTION bump_rollups(TIMESTAMP, INTEGER, INTEGER, INTEGER, NUMERIC)
+        RETURNS void AS $$
+            INSERT INTO hourly_rollup AS r (hour, entries, exits, payments, revenue)
+            VALUES (date_trunc('hour', $1), $2, $3, $4, $5)
+            ON CONFLICT (hour) DO UPDATE
+            SET entries = r.entries + EXCLUDED.entries,
+                exits = r.exits + EXCLUDED.exits,
+                payments = r.payments + EXCLUDED.payments,
+                revenue = r.revenue + EXCLUDED.revenue;
+            INSERT INTO daily_rollup AS r (day, entries, exits, payments, revenue)
+            VALUES ($1::date, $2, $3, $4, $5)
+            ON CONFLICT (day) DO UPDATE
+            SET entries = r.entries + EXCLUDED.entries,
+                exits = r.exits + EXCLUDED.exits,
+                payments = r.payments + EXCLUDED.payments,
+                revenue = r.revenue + EXCLUDED.revenue;
+        $$ LANGUAGE sql;
+
+        -- Counts each event once, at its own time, in the writer's transaction.
+        -- Bulk loads can opt out with SET parking.rollup = 'off' and call
+        -- refresh_rollups() for the loaded range afterwards.
+        CREATE OR REPLACE FUNCTION rollup_parking_entry() RETURNS trigger AS $$
+        BEGIN
+            IF current_setting('parking.rollup', true) = 'off' THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'INSERT' THEN
+                PERFORM bump_rollups(NEW.entry_timestamp, 1, 0, 0, 0);
+            END IF;
+            IF NEW.exit_timestamp IS NOT NULL
+               AND (TG_OP = 'INSERT' OR OLD.exit_timestamp IS NULL) THEN
+                PERFORM bump_rollups(NEW.exit_timestamp, 0, 1, 0, 0);
+            END IF;
+            IF NEW.payment_status AND NEW.payment_timestamp IS NOT NULL
+               AND (TG_OP = 'INSERT' OR NOT COALESCE(OLD.payment_status, FALSE)) THEN
+                PERFORM bump_rollups(NEW.payment_timestamp, 0, 0, 1, COALESCE(NEW.amount_paid, 0));
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS parking_entries_rollup ON parking_entries;
+        CREATE TRIGGER parking_entries_rollup
+            AFTER INSERT OR UPDATE ON parking_entries
+            FOR EACH ROW EXECUTE PROCEDURE rollup_parking_entry();
+
+        -- Recompute the whole days from_ts through to_ts from the raw entries.
+        -- Only for ranges still in parking_entries: archived days would be zeroed.
+        CREATE OR REPLACE FUNCTION refresh_rollups(from_ts TIMESTAMP, to_ts TIMESTAMP)
+        RETURNS void AS $$
+        DECLARE
+            first_day TIMESTAMP := date_trunc('day', from_ts);
+            end_day TIMESTAMP := date_trunc('day', to_ts) + interval '1 day';
+        BEGIN
+            -- Waits for writers in flight (so their rows are counted) and holds
+            -- new ones off until the refresh commits (so nothing is counted twice)
+            LOCK TABLE hourly_rollup, daily_rollup IN SHARE ROW EXCLUSIVE MODE;
+            DELETE FROM hourly_rollup WHERE hour >= first_day AND hour < end_day;
+            INSERT INTO hourly_rollup (hour, entries, exits, payments, revenue)
+            SELECT hour, SUM(entries), SUM(exits), SUM(payments), SUM(revenue)
+            FROM (
+                SELECT date_trunc('hour', entry_timestamp) AS hour,
+                       COUNT(*) AS entries, 0 AS exits, 0 AS payments, 0 AS revenue
+                FROM parking_entries
+                WHERE entry_timestamp >= first_day AND entry_timestamp < end_day
+                GROUP BY 1
+                UNION ALL
+                SELECT date_trunc('hour', exit_timestamp), 0, COUNT(*), 0, 0
+                FROM parking_entries
+                WHERE exit_timestamp >= first_day AND exit_timestamp < end_day
+                GROUP BY 1
+                UNION ALL
+                SELECT date_trunc('hour', payment_timestamp), 0, 0, COUNT(*), COALESCE(SUM(amount_paid), 0)
+                FROM parking_entries
+                WHERE payment_status
+                AND payment_timestamp >= first_day AND payment_timestamp < end_day
+                GROUP BY 1
+            ) events
+            GROUP BY hour;
+
+            DELETE FROM daily_rollup WHERE day >= first_day::date AND day < end_day::date;
+            INSERT INTO daily_rollup (day, entries, exits, payments, revenue)
+            SELECT hour::date, SUM(entries), SUM(exits), SUM(payments), SUM(revenue)
+            FROM hourly_rollup
+            WHERE hour >= first_day AND hour < end_day
+            GROUP BY 1;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- Backfill from everything already recorded
+        SELECT refresh_rollups(MIN(entry_timestamp), LOCALTIMESTAMP)
+        FROM parking_entries
+        HAVING COUNT(*) > 0;
+    """),
+]
+
+
+def current_version(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    return cur.fetchone()[0]
+
+
+def apply_migrations(conn=None):
+    """Apply every pending migration, each in its own transaction; returns the schema version"""
+    own_conn = conn is None
+    conn = conn or get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            version = current_version(cur)
+        conn.commit()
+
+        for number, name, sql in MIGRATIONS:
+            if number <= version:
+                continue
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql)
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                        (number, name)
+                    )
+                conn.commit()
+                version = number
+                print(f"[MIGRATION] Applied {number}: {name}")
+            except Exception:
+                conn.rollback()
+                raise
+        return version
+    finally:
+        if own_conn:
+            release_db_connection(conn)
+
+
+if __name__ == "__main__":
+    print(f"Schema at version {apply_migrations()}")
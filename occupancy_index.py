@@ -0,0 +1,110 @@
+import threading
+import time
+
+from db_config import get_db_connection, release_db_connection, register_statement, execute_prepared, ENTRY_LOOKBACK
+
+# Bounded like db_operations' is_vehicle_inside, so the two agree on who is inside
+WARM_OCCUPANCY = register_statement('warm_occupancy', f"""
+    SELECT DISTINCT ON (plate_number)
+           id, plate_number, entry_timestamp, payment_status
+    FROM parking_entries
+    WHERE exit_timestamp IS NULL
+    AND entry_timestamp >= LOCALTIMESTAMP - {ENTRY_LOOKBACK}
+    ORDER BY plate_number, entry_timestamp DESC
+""")
+
+
+class OccupancyIndex:
+    """
+    Write-through, in-process index of the vehicles currently inside.
+
+    Keyed by plate number with the open entry's id, entry time and paid flag.
+    It is warmed from parking_entries WHERE exit_timestamp IS NULL and kept in
+    sync by the db_operations write functions, so the common gate decisions
+    (not inside -> let in, paid -> let out) never touch the database.
+
+    Writes made by other processes are only picked up on the next refresh, so
+    an answer can be up to refresh_interval (300 s) behind them. Callers only
+    trust answers whose staleness is harmless (a paid vehicle stays paid) and
+    check the rest against the database; is_vehicle_inside always asks the
+    database, because a missed entry would bypass the duplicate-entry guard.
+    """
+
+    def __init__(self, refresh_interval=300):
+        self.refresh_interval = refresh_interval
+        self.hits = 0
+        self.misses = 0
+        self._inside = {}
+        self._warmed_at = None
+        self._lock = threading.RLock()
+
+    def warm(self):
+        """(Re)load every open entry from the database; returns the number of vehicles inside"""
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                execute_prepared(cur, WARM_OCCUPANCY)
+                return self.load(cur.fetchall())
+        except Exception as e:
+            print(f"Error warming occupancy index: {e}")
+            return 0
+        finally:
+            release_db_connection(conn)
+
+    def load(self, rows):
+        """Replace the index with (id, plate_number, entry_timestamp, payment_status) rows"""
+        with self._lock:
+            self._inside = {
+                row[1]: {'id': row[0], 'entry_timestamp': row[2], 'payment_status': row[3]}
+                for row in rows
+            }
+            self._warmed_at = time.monotonic()
+        return len(rows)
+
+    def is_fresh(self):
+        """True when the snapshot is recent enough to answer from, without refreshing it"""
+        with self._lock:
+            return (self._warmed_at is not None and
+                    time.monotonic() - self._warmed_at <= self.refresh_interval)
+
+    def is_ready(self):
+        """True when the index holds a recent snapshot; warms or refreshes it if needed"""
+        if not self.is_fresh():
+            self.warm()
+        return self._warmed_at is not None
+
+    def get(self, plate_number):
+        """The open entry for a plate, or None if it is not inside"""
+        with self._lock:
+            entry = self._inside.get(plate_number)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(entry)
+
+    # ===== Write-through hooks =====
+    def record_entry(self, entry_id, plate_number, entry_timestamp):
+        with self._lock:
+            self._inside[plate_number] = {
+                'id': entry_id,
+                'entry_timestamp': entry_timestamp,
+                'payment_status': False
+            }
+
+    def record_payment(self, plate_number, entry_timestamp):
+        with self._lock:
+            entry = self._inside.get(plate_number)
+            if entry and entry['entry_timestamp'] == entry_timestamp:
+                entry['payment_status'] = True
+
+    def record_exit(self, plate_number):
+        with self._lock:
+            self._inside.pop(plate_number, None)
+
+    def stats(self):
+        with self._lock:
+            return {'inside': len(self._inside), 'hits': self.hits, 'misses': self.misses}
+
+
+occupancy = OccupancyIndex()
@@ -0,0 +1,228 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+import pytesseract
+
+TESSERACT_CMD = os.getenv('TESSERACT_CMD', r'C:\Program Files\Tesseract-OCR\tesseract.exe')
+PLATE_CHARS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+TESSERACT_CONFIG = f'--psm 8 --oem 3 -c tessedit_char_whitelist={PLATE_CHARS}'
+KNN_MODEL_PATH = os.getenv('ANPR_KNN_MODEL', 'ocr_knn.npz')
+CHAR_SIZE = (20, 30)  # width, height of a normalised character sample
+
+if os.path.exists(TESSERACT_CMD):
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+
+
+class OCRBackend:
+    """Reads text from binarized (Otsu) plate crops"""
+
+    name = 'base'
+
+    def read(self, thresh):
+        return self.read_batch([thresh])[0]
+
+    def read_batch(self, threshes):
+        raise NotImplementedError
+
+    def read_candidates(self, threshes):
+        """
+        One {char: probability} dict per read character of each crop, for
+        plate_decoder; backends without alternatives report their text as certain
+        """
+        return [[{char: 1.0} for char in text] for text in self.read_batch(threshes)]
+
+
+class TesseractCLIBackend(OCRBackend):
+    """pytesseract: forks a tesseract process per crop. Always available, slowest"""
+
+    name = 'tesseract'
+
+    def read_batch(self, threshes):
+        return [pytesseract.image_to_string(thresh, config=TESSERACT_CONFIG).strip().replace(" ", "")
+                for thresh in threshes]
+
+
+class TesserocrBackend(OCRBackend):
+    """Long-lived in-process tesseract API handle (needs the optional tesserocr package)"""
+
+    name = 'tesserocr'
+
+    def __init__(self):
+        import tesserocr
+        from PIL import Image
+
+        self._tesserocr = tesserocr
+        self._image = Image
+        self._api = tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.SINGLE_WORD, oem=tesserocr.OEM.DEFAULT)
+        self._api.SetVariable('tessedit_char_whitelist', PLATE_CHARS)
+        # Keep the LSTM's per-symbol alternatives for read_candidates
+        self._api.SetVariable('lstm_choice_mode', '2')
+        # A TessBaseAPI handle is not re-entrant
+        self._lock = threading.Lock()
+
+    def read_batch(self, threshes):
+        texts = []
+        with self._lock:
+            for thresh in threshes:
+                self._api.SetImage(self._image.fromarray(thresh))
+                texts.append(self._api.GetUTF8Text().strip().replace(" ", ""))
+        return texts
+
+    def read_candidates(self, threshes):
+        level = self._tesserocr.RIL.SYMBOL
+        crops = []
+        with self._lock:
+            for thresh in threshes:
+                self._api.SetImage(self._image.fromarray(thresh))
+                self._api.Recognize()
+                positions = []
+                iterator = self._api.GetIterator()
+                symbols = self._tesserocr.iterate_level(iterator, level) if iterator else []
+                for symbol in symbols:
+                    choices = {}
+                    for choice in symbol.GetChoiceIterator():
+                        char = choice.GetUTF8Text()
+                        if char and char in PLATE_CHARS:
+                            choices[char] = max(choices.get(char, 0.0), choice.Confidence() / 100)
+                    if choices:
+                        positions.append(choices)
+                crops.append(positions)
+        return crops
+
+
+def segment_characters(thresh):
+    """
+    Split a binarized plate into character images ordered left to right.
+
+    Characters are the dark connected components of the Otsu output whose
+    height is a sensible fraction of the plate height.
+    """
+    inverted = cv2.bitwise_not(thresh)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(inverted, connectivity=8)
+    plate_h, plate_w = thresh.shape[:2]
+
+    boxes = []
+    for x, y, w, h, area in stats[1:count]:
+        if not (0.35 * plate_h <= h <= 0.95 * plate_h):
+            continue
+        if w > 0.25 * plate_w or w < 2 or area < 0.1 * w * h:
+            continue
+        boxes.append((x, y, w, h))
+    boxes.sort(key=lambda b: b[0])
+    return [inverted[y:y + h, x:x + w] for x, y, w, h in boxes]
+
+
+def char_features(char_img):
+    """Normalise one character image into a flat float32 feature vector"""
+    resized = cv2.resize(char_img, CHAR_SIZE, interpolation=cv2.INTER_AREA)
+    return (resized.astype(np.float32) / 255.0).reshape(-1)
+
+
+class KNNBackend(OCRBackend):
+    """
+    Character segmentation + OpenCV kNN classifier, fully in-process.
+
+    Samples come from labelled crops (file names like RAD317L_20250602_124351.jpg
+    in plates/) via train(); the fitted samples are cached in ocr_knn.npz.
+    """
+
+    name = 'knn'
+
+    def __init__(self, model_path=KNN_MODEL_PATH, k=3):
+        self.model_path = model_path
+        self.k = k
+        self._knn = None
+        if os.path.exists(model_path):
+            data = np.load(model_path)
+            self._fit(data['samples'], data['labels'])
+
+    def _fit(self, samples, labels):
+        self._knn = cv2.ml.KNearest_create()
+        self._knn.train(samples.astype(np.float32), cv2.ml.ROW_SAMPLE, labels.astype(np.float32))
+
+    def train(self, labelled_threshes, save=True):
+        """Fit on (thresh, plate_text) pairs; crops that don't segment into len(text) chars are skipped"""
+        samples, labels = [], []
+        for thresh, text in labelled_threshes:
+            chars = segment_characters(thresh)
+            if len(chars) != len(text):
+                continue
+            for char_img, ch in zip(chars, text):
+                samples.append(char_features(char_img))
+                labels.append(PLATE_CHARS.index(ch))
+        if not samples:
+            raise ValueError("No labelled crop segmented cleanly; cannot train kNN OCR")
+
+        samples = np.array(samples, dtype=np.float32)
+        labels = np.array(labels, dtype=np.float32).reshape(-1, 1)
+        self._fit(samples, labels)
+        if save:
+            np.savez_compressed(self.model_path, samples=samples, labels=labels)
+        return len(samples)
+
+    def _classify(self, threshes):
+        """Characters per crop, then for every character the kNN result and its k neighbours' labels"""
+        if self._knn is None:
+            raise RuntimeError(f"kNN OCR is not trained ({self.model_path} missing)")
+
+        segmented = [segment_characters(thresh) for thresh in threshes]
+        features = [char_features(c) for chars in segmented for c in chars]
+        if not features:
+            return [0] * len(threshes), np.empty(0), np.empty((0, self.k))
+
+        # One findNearest call classifies every character of every crop
+        _, results, neighbours, _ = self._knn.findNearest(np.array(features, dtype=np.float32), self.k)
+        return [len(chars) for chars in segmented], results.ravel(), neighbours
+
+    def read_batch(self, threshes):
+        counts, results, _ = self._classify(threshes)
+        predicted = [PLATE_CHARS[int(r)] for r in results]
+
+        texts, offset = [], 0
+        for count in counts:
+            texts.append(''.join(predicted[offset:offset + count]))
+            offset += count
+        return texts
+
+    def read_candidates(self, threshes):
+        # A character's candidates are its neighbours' labels, weighted by their share of the k votes
+        counts, _, neighbours = self._classify(threshes)
+        positions = []
+        for labels in neighbours:
+            choices = {}
+            for label in labels:
+                char = PLATE_CHARS[int(label)]
+                choices[char] = choices.get(char, 0.0) + 1 / len(labels)
+            positions.append(choices)
+
+        crops, offset = [], 0
+        for count in counts:
+            crops.append(positions[offset:offset + count])
+            offset += count
+        return crops
+
+
+BACKENDS = {
+    'tesseract': TesseractCLIBackend,
+    'tesserocr': TesserocrBackend,
+    'knn': KNNBackend
+}
+
+
+def get_backend(name=None):
+    """
+    Build an OCR backend by name ('tesseract', 'tesserocr', 'knn' or 'auto').
+
+    'auto' prefers the in-process tesserocr handle and falls back to pytesseract
+    when tesserocr (or its tessdata) is not installed.
+    """
+    name = name or os.getenv('ANPR_OCR', 'auto')
+    if name == 'auto':
+        try:
+            return TesserocrBackend()
+        except Exception as e:
+            print(f"[OCR] tesserocr unavailable ({e}); using pytesseract")
+            return TesseractCLIBackend()
+    return BACKENDS[name]()
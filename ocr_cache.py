@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+import cv2
+import numpy as np
+
+HASH_SIZE = (16, 8)  # columns x rows of horizontal gradients: a 128-bit hash
+
+
+def dhash(crop, size=HASH_SIZE):
+    """Difference hash of a plate crop: brightness changes between neighbouring cells of a downscaled gray image"""
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    cols, rows = size
+    # INTER_AREA averages the crop down, which absorbs sensor noise and small shifts
+    small = cv2.resize(gray, (cols + 1, rows), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class OCRCache:
+    """
+    Per-lane LRU of recent OCR results keyed by the dHash of the crop.
+
+    A crop within max_distance bits of a cached one (and younger than ttl
+    seconds) gets the cached read (raw text, thresholded image and decoded
+    plate) back, so a parked or slow car is read once instead of on every frame.
+    """
+
+    def __init__(self, max_entries=64, max_distance=6, ttl=5.0):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self._entries = defaultdict(OrderedDict)  # lane -> hash -> (read, stored_at)
+        self._stats = defaultdict(lambda: {'hits': 0, 'misses': 0, 'ocr_seconds': 0.0})
+        self._lock = threading.Lock()
+
+    def get(self, lane, key, now=None):
+        """The read of the nearest fresh entry within max_distance, or None"""
+        now = now if now is not None else time.monotonic()
+        with self._lock:
+            entries = self._entries[lane]
+            for stale in [k for k, (_, stored_at) in entries.items() if now - stored_at > self.ttl]:
+                del entries[stale]
+            best, best_distance = None, self.max_distance + 1
+            for cached_key in entries:
+                distance = hamming(key, cached_key)
+                if distance < best_distance:
+                    best, best_distance = cached_key, distance
+            if best is None:
+                self._stats[lane]['misses'] += 1
+                return None
+            entries.move_to_end(best)
+            self._stats[lane]['hits'] += 1
+            return entries[best][0]
+
+    def put(self, lane, key, read, now=None):
+        now = now if now is not None else time.monotonic()
+        with self._lock:
+            entries = self._entries[lane]
+            entries[key] = (read, now)
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def record_ocr(self, lane, seconds):
+        """Time spent on OCR for this lane's misses, so the hits can be priced"""
+        with self._lock:
+            self._stats[lane]['ocr_seconds'] += seconds
+
+    def stats(self):
+        """Per lane: hits, misses, hit ratio, average OCR time per miss and the OCR time the hits saved"""
+        with self._lock:
+            snapshot = {}
+            for lane, s in self._stats.items():
+                lookups = s['hits'] + s['misses']
+                avg_ms = 1000 * s['ocr_seconds'] / s['misses'] if s['misses'] else 0.0
+                snapshot[lane] = {
+                    'hits': s['hits'],
+                    'misses': s['misses'],
+                    'hit_ratio': round(s['hits'] / lookups, 3) if lookups else 0.0,
+                    'avg_ocr_ms': round(avg_ms, 1),
+                    'saved_ms': round(s['hits'] * avg_ms, 1),
+                    'entries': len(self._entries[lane])
+                }
+            return snapshot
+
+
+def get_cache():
+    """The OCR cache configured by ANPR_OCR_CACHE ('0' disables it) and its tuning variables"""
+    if os.getenv('ANPR_OCR_CACHE', '1') == '0':
+        return None
+    return OCRCache(
+        max_entries=int(os.getenv('ANPR_OCR_CACHE_SIZE', 64)),
+        max_distance=int(os.getenv('ANPR_OCR_CACHE_DISTANCE', 6)),
+        ttl=float(os.getenv('ANPR_OCR_CACHE_TTL', 5.0))
+    )
@@ -0,0 +1,143 @@
+"""
+Monthly partition maintenance for parking_entries and alerts (migration 5).
+
+Creates the partitions for the coming months ahead of time (rows never fail
+to insert without one, they land in the default partition, but then lose
+pruning), and archives partitions past the retention period: each is
+exported to a gzipped CSV, then detached and dropped.
+
+    python partitions.py                                  # run daily, e.g. from cron
+    python partitions.py --archive --keep-months 24 --archive-dir archive
+
+An archive is restored by recreating its month and copying it back:
+
+    SELECT create_monthly_partition('parking_entries', 'entry_timestamp', '2023-01-01');
+    \\copy parking_entries FROM PROGRAM 'gunzip -c archive/parking_entries_p2023_01.csv.gz' WITH (FORMAT csv, HEADER)
+"""
+import argparse
+import gzip
+import os
+from datetime import date, datetime
+
+from db_config import get_db_connection, release_db_connection
+
+# Partitioned table -> partition key
+PARTITIONED = {
+    'parking_entries': 'entry_timestamp',
+    'alerts': 'timestamp',
+}
+MONTHS_AHEAD = 3
+
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def monthly_partitions(cur, parent):
+    """(name, first day of month) of every monthly partition of parent, oldest first"""
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+    """, (parent,))
+    partitions = []
+    for (name,) in cur.fetchall():
+        try:
+            month = datetime.strptime(name[len(parent):], '_p%Y_%m').date()
+        except ValueError:
+            continue  # the default partition
+        partitions.append((name, month))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def ensure_partitions(months_ahead=MONTHS_AHEAD, conn=None):
+    """Create any missing partition from this month through months_ahead; returns how many were created"""
+    own_conn = conn is None
+    conn = conn or get_db_connection()
+    try:
+        created = 0
+        today = date.today().replace(day=1)
+        with conn.cursor() as cur:
+            for parent, key in PARTITIONED.items():
+                cur.execute("SELECT create_monthly_partitions(%s, %s, %s, %s)",
+                            (parent, key, today, add_months(today, months_ahead)))
+                created += cur.fetchone()[0]
+        conn.commit()
+        if created:
+            print(f"[PARTITIONS] Created {created} monthly partitions")
+        return created
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if own_conn:
+            release_db_connection(conn)
+
+
+def archive_partition(conn, parent, name, archive_dir):
+    """Export one partition to <archive_dir>/<name>.csv.gz, then detach and drop it; returns the row count"""
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    tmp_path = path + '.tmp'
+    try:
+        with conn.cursor() as cur:
+            # Writers are held off until the partition is gone, so the archive is complete
+            cur.execute(f'LOCK TABLE "{name}" IN SHARE MODE')
+            cur.execute(f'SELECT COUNT(*) FROM "{name}"')
+            rows = cur.fetchone()[0]
+            with gzip.open(tmp_path, 'wt', newline='') as f:
+                cur.copy_expert(f'COPY "{name}" TO STDOUT WITH (FORMAT csv, HEADER)', f)
+            with open(tmp_path, 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            cur.execute(f'ALTER TABLE "{parent}" DETACH PARTITION "{name}"')
+            cur.execute(f'DROP TABLE "{name}"')
+        conn.commit()
+        return rows
+    except Exception:
+        conn.rollback()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def archive_partitions(keep_months=24, archive_dir='archive', conn=None):
+    """Archive every monthly partition that ended more than keep_months months ago"""
+    own_conn = conn is None
+    conn = conn or get_db_connection()
+    os.makedirs(archive_dir, exist_ok=True)
+    cutoff = add_months(date.today().replace(day=1), -keep_months)
+    archived = []
+    try:
+        for parent in PARTITIONED:
+            with conn.cursor() as cur:
+                partitions = monthly_partitions(cur, parent)
+            conn.commit()
+            for name, month in partitions:
+                if add_months(month, 1) > cutoff:
+                    break
+                rows = archive_partition(conn, parent, name, archive_dir)
+                archived.append((name, rows))
+                print(f"[PARTITIONS] Archived {name}: {rows:,} rows")
+        return archived
+    finally:
+        if own_conn:
+            release_db_connection(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create upcoming partitions and archive old ones")
+    parser.add_argument('--months-ahead', type=int, default=MONTHS_AHEAD)
+    parser.add_argument('--archive', action='store_true', help="archive partitions past --keep-months")
+    parser.add_argument('--keep-months', type=int, default=24)
+    parser.add_argument('--archive-dir', default='archive')
+    args = parser.parse_args()
+
+    ensure_partitions(args.months_ahead)
+    if args.archive:
+        archive_partitions(args.keep_months, args.archive_dir)
+
+
+if __name__ == "__main__":
+    main()
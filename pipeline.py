@@ -0,0 +1,340 @@
+import threading
+import time
+import queue
+from collections import deque
+
+import cv2
+
+
+class DropOldestQueue:
+    """Bounded FIFO that discards its oldest item instead of blocking the producer"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Pop the oldest item, raising queue.Empty if nothing arrives in time"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                raise queue.Empty
+            return self._items.popleft()
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
+
+
+class LatestFrameSlot:
+    """Single-frame slot: the capture thread overwrites it, readers only ever see the newest frame"""
+
+    def __init__(self):
+        self.overwritten = 0
+        self._frame = None
+        self._frame_id = 0
+        self._taken_id = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, frame):
+        with self._cond:
+            if self._frame_id > self._taken_id:
+                self.overwritten += 1
+            self._frame = frame
+            self._frame_id += 1
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """Wait for a frame newer than the last one taken; returns None once closed and drained"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._frame_id > self._taken_id or self._closed, timeout)
+            if self._frame_id > self._taken_id:
+                self._taken_id = self._frame_id
+                return self._frame
+            if self._closed:
+                return None
+            raise queue.Empty
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def pending(self):
+        with self._cond:
+            return 1 if self._frame_id > self._taken_id else 0
+
+
+class StageStats:
+    """Items processed and busy time for one pipeline stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.busy = 0.0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, seconds, items=1):
+        with self._lock:
+            self.count += items
+            self.busy += seconds
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = max(time.monotonic() - self.started, 1e-6)
+            return {
+                'count': self.count,
+                'per_second': round(self.count / elapsed, 2),
+                'avg_ms': round(1000 * self.busy / self.count, 1) if self.count else 0.0
+            }
+
+
+class PlatePipeline:
+    """
+    Staged capture -> detect -> OCR -> decide pipeline.
+
+    Every stage runs on its own thread (OCR on a small pool) and the stages are
+    joined by a latest-frame slot and bounded drop-oldest queues, so a slow OCR
+    call or a disk write never stalls frame capture. Gate commands from on_plate
+    go through gate_controller.GateController, which schedules them without
+    blocking the decision thread.
+
+    detect_fn(frame) -> (boxes, annotated_frame), boxes as (x1, y1, x2, y2, confidence)
+    ocr_fn(plate_img, confidence, fresh) -> anpr.PlateRead; fresh asks for a real OCR call, not a cache hit
+    on_plate(plate, plate_img) runs on the decision thread
+    presence (optional) is a presence.PresenceGate; frames of an empty lane skip detection
+    tracker (optional) is a tracker.PlateTracker; on_plate then fires once per vehicle
+    evidence (optional) is an evidence_writer.EvidenceWriter that keeps the best crop per vehicle
+    ocr_cache (optional) is the engine's ocr_cache.OCRCache, reported with the stats
+    """
+
+    def __init__(self, source, detect_fn, ocr_fn, on_plate, ocr_workers=2,
+                 queue_size=8, headless=False, realtime=None, stats_interval=10,
+                 presence=None, tracker=None, evidence=None, ocr_cache=None):
+        self.source = source
+        self.detect_fn = detect_fn
+        self.ocr_fn = ocr_fn
+        self.on_plate = on_plate
+        self.presence = presence
+        self.tracker = tracker
+        self.evidence = evidence
+        self.ocr_cache = ocr_cache
+        self.ocr_workers = ocr_workers
+        self.headless = headless
+        self.stats_interval = stats_interval
+
+        # Recorded files are paced at their native FPS unless told otherwise,
+        # so the latest-frame slot behaves the same as with a live camera
+        self.realtime = realtime if realtime is not None else not isinstance(source, int)
+
+        self.frames = LatestFrameSlot()
+        self.crops = DropOldestQueue(queue_size)
+        self.hits = DropOldestQueue(queue_size)
+
+        self.stages = {name: StageStats(name)
+                       for name in ('capture', 'detect', 'ocr', 'decide')}
+        self.latest_annotated = None
+        self._stop = threading.Event()
+        self._detect_done = threading.Event()
+        self._ocr_threads = []
+        self._threads = []
+
+    # ===== Stages =====
+    def _capture_loop(self):
+        cap = cv2.VideoCapture(self.source)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25
+        frame_interval = 1.0 / fps
+        try:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                ret, frame = cap.read()
+                if not ret:
+                    print("[CAPTURE] End of stream")
+                    break
+                self.frames.put(frame)
+                self.stages['capture'].record(time.monotonic() - started)
+                if self.realtime:
+                    time.sleep(max(0.0, frame_interval - (time.monotonic() - started)))
+        finally:
+            cap.release()
+            self.frames.close()
+
+    def _detect_loop(self):
+        while not self._stop.is_set():
+            try:
+                frame = self.frames.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if frame is None:
+                break
+            if self.presence and not self.presence.should_detect(frame):
+                self.latest_annotated = frame
+                continue
+            started = time.monotonic()
+            boxes, annotated = self.detect_fn(frame)
+            track_ids = self.tracker.update(boxes) if self.tracker else [None] * len(boxes)
+            for (x1, y1, x2, y2, confidence), track_id in zip(boxes, track_ids):
+                if self.tracker and not self.tracker.needs_ocr(track_id):
+                    continue
+                plate_img = frame[y1:y2, x1:x2]
+                if plate_img.size:
+                    self.crops.put((track_id, plate_img, confidence))
+            self.latest_annotated = annotated
+            self.stages['detect'].record(time.monotonic() - started)
+        # Let the rest of the pipeline drain before shutting down
+        self._detect_done.set()
+
+    def _ocr_loop(self):
+        while not self._stop.is_set():
+            try:
+                track_id, plate_img, confidence = self.crops.get(timeout=0.5)
+            except queue.Empty:
+                if self._detect_done.is_set():
+                    break
+                continue
+            # The track may have settled while this crop was queued
+            if self.tracker and not self.tracker.needs_ocr(track_id):
+                continue
+            started = time.monotonic()
+            fresh = bool(self.tracker) and self.tracker.needs_fresh_read(track_id)
+            read = self.ocr_fn(plate_img, confidence, fresh)
+            if read.plate or self.tracker:
+                self.hits.put((track_id, read, plate_img))
+            self.stages['ocr'].record(time.monotonic() - started)
+
+    def _decide_loop(self):
+        while not self._stop.is_set():
+            try:
+                track_id, read, plate_img = self.hits.get(timeout=0.5)
+            except queue.Empty:
+                if self._ocr_done():
+                    break
+                continue
+            plate = read.plate
+            if self.tracker:
+                if plate and self.evidence:
+                    self.evidence.offer(track_id, plate_img)
+                # Votes are weighted by how sure detection and plate decoding were
+                plate = self.tracker.add_read(track_id, plate, read.confidence * read.plate_confidence,
+                                              cached=read.cached)
+                if not plate:
+                    continue
+                if self.evidence:
+                    self.evidence.finish(track_id, plate)
+            elif self.evidence:
+                self.evidence.write(plate, plate_img)
+            started = time.monotonic()
+            try:
+                self.on_plate(plate, plate_img)
+            except Exception as e:
+                print(f"[ERROR] Plate handler failed: {e}")
+            self.stages['decide'].record(time.monotonic() - started)
+
+    def _ocr_done(self):
+        return self._detect_done.is_set() and not any(
+            t.is_alive() for t in self._ocr_threads)
+
+    # ===== Control =====
+    def stats(self):
+        """Per-stage throughput plus current queue depths and drop counts"""
+        snapshot = {
+            'stages': {name: s.snapshot() for name, s in self.stages.items()},
+            'queues': {
+                'frames': {'depth': self.frames.pending(), 'dropped': self.frames.overwritten},
+                'crops': {'depth': self.crops.qsize(), 'dropped': self.crops.dropped},
+                'hits': {'depth': self.hits.qsize(), 'dropped': self.hits.dropped}
+            }
+        }
+        if self.presence:
+            snapshot['presence'] = self.presence.stats()
+        if self.tracker:
+            snapshot['tracker'] = self.tracker.stats()
+        if self.evidence:
+            snapshot['evidence'] = self.evidence.stats()
+        if self.ocr_cache:
+            snapshot['ocr_cache'] = self.ocr_cache.stats()
+        return snapshot
+
+    def print_stats(self):
+        snapshot = self.stats()
+        stages = ' | '.join(f"{name} {s['per_second']}/s {s['avg_ms']}ms"
+                            for name, s in snapshot['stages'].items())
+        queues = ' | '.join(f"{name} {q['depth']} (dropped {q['dropped']})"
+                            for name, q in snapshot['queues'].items())
+        print(f"[STATS] {stages}")
+        print(f"[QUEUES] {queues}")
+        if 'presence' in snapshot:
+            presence = snapshot['presence']
+            print(f"[PRESENCE] inferred {presence['inferred']} | skipped {presence['skipped']} "
+                  f"({presence['skipped_ratio']:.0%} idle)")
+        if 'tracker' in snapshot:
+            tracker = snapshot['tracker']
+            print(f"[TRACKER] {tracker['active_tracks']} active | {tracker['events']} vehicles | "
+                  f"{tracker['reads_per_event']} OCR reads per vehicle")
+        if 'evidence' in snapshot:
+            evidence = snapshot['evidence']
+            hourly = ', '.join(f"{hour}h {size / 1024:.0f}KB"
+                               for hour, size in list(evidence['bytes_per_hour'].items())[-3:])
+            print(f"[EVIDENCE] written {evidence['written']} | dropped {evidence['dropped']} | "
+                  f"queue {evidence['queue_depth']} | {hourly or 'no writes yet'}")
+        for lane, cache in snapshot.get('ocr_cache', {}).items():
+            print(f"[OCR CACHE] {lane}: {cache['hit_ratio']:.0%} hits ({cache['hits']}/"
+                  f"{cache['hits'] + cache['misses']}) | {cache['avg_ocr_ms']}ms per OCR | "
+                  f"saved {cache['saved_ms'] / 1000:.1f}s")
+
+    def start(self):
+        self._ocr_threads = [threading.Thread(target=self._ocr_loop, name=f'ocr-{i}', daemon=True)
+                             for i in range(self.ocr_workers)]
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name='capture', daemon=True),
+            threading.Thread(target=self._detect_loop, name='detect', daemon=True),
+            *self._ocr_threads,
+            threading.Thread(target=self._decide_loop, name='decide', daemon=True)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        self._stop.set()
+        self.frames.close()
+        for t in self._threads:
+            t.join(timeout=2)
+
+    def is_running(self):
+        return any(t.is_alive() for t in self._threads)
+
+    def run(self):
+        """Start all stages and block until the stream ends or 'q' is pressed"""
+        self.start()
+        last_stats = time.monotonic()
+        try:
+            while self.is_running():
+                if not self.headless:
+                    if self.latest_annotated is not None:
+                        cv2.imshow('Webcam Feed', self.latest_annotated)
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+                else:
+                    time.sleep(0.1)
+
+                if self.stats_interval and time.monotonic() - last_stats >= self.stats_interval:
+                    self.print_stats()
+                    last_stats = time.monotonic()
+        except KeyboardInterrupt:
+            print("[SYSTEM] Interrupted")
+        finally:
+            self.stop()
+            self.print_stats()
+            if not self.headless:
+                cv2.destroyAllWindows()
@@ -0,0 +1,92 @@
+import math
+import string
+
+PLATE_LENGTH = 7
+LETTERS = set(string.ascii_uppercase)
+DIGITS = set(string.digits)
+# Rwandan private plates: RA + letter + 3 digits + letter, e.g. RAD317L
+GRAMMAR = [{'R'}, {'A'}, LETTERS, DIGITS, DIGITS, DIGITS, LETTERS]
+MAX_SUBSTITUTIONS = 2  # corrected glyphs a read may need before it is thrown away
+MIN_CONFIDENCE = 0.3  # on the product of the substitution weights times the OCR's own certainty
+
+# Glyph pairs OCR mixes up on plates, with how plausible reading one as the other is
+CONFUSIONS = {
+    ('0', 'O'): 0.8, ('0', 'D'): 0.6, ('0', 'Q'): 0.6, ('0', 'U'): 0.4,
+    ('1', 'I'): 0.8, ('1', 'L'): 0.5, ('1', 'T'): 0.4, ('1', 'J'): 0.4,
+    ('2', 'Z'): 0.7, ('3', 'B'): 0.4, ('4', 'A'): 0.6, ('5', 'S'): 0.7,
+    ('6', 'G'): 0.6, ('7', 'T'): 0.5, ('8', 'B'): 0.7, ('9', 'G'): 0.4,
+    ('R', 'P'): 0.4, ('R', 'K'): 0.4, ('A', 'H'): 0.3
+}
+CONFUSION = {}
+for (a, b), weight in CONFUSIONS.items():
+    CONFUSION.setdefault(a, {})[b] = weight
+    CONFUSION.setdefault(b, {})[a] = weight
+
+
+def emission(observed, intended):
+    """How plausible it is that OCR printed observed for the intended character"""
+    if observed == intended:
+        return 1.0
+    return CONFUSION.get(observed, {}).get(intended, 0.0)
+
+
+def text_candidates(text):
+    """Per-position candidates for a plain OCR string: each character with certainty"""
+    return [{char: 1.0} for char in text.upper() if char.isalnum()]
+
+
+def decode_window(positions):
+    """
+    Best grammar-valid plate for exactly seven positions: (plate, OCR certainty,
+    substitution penalty, substitutions). The certainty is the geometric mean of
+    the chosen characters' probabilities, so a read that is 0.8 sure of every
+    character scores 0.8 rather than 0.8 ** 7; the penalty is the product of
+    the confusion weights of the corrected glyphs
+    """
+    chars, log_certainty, penalty, substitutions = [], 0.0, 1.0, 0
+    for candidates, allowed in zip(positions, GRAMMAR):
+        best, best_score = None, 0.0
+        for observed, probability in candidates.items():
+            for intended in allowed:
+                weight = emission(observed, intended)
+                if probability * weight > best_score:
+                    best, best_score = (intended, probability, weight), probability * weight
+        if best is None:
+            return None, 0.0, 0.0, 0
+        char, probability, weight = best
+        chars.append(char)
+        log_certainty += math.log(probability)
+        penalty *= weight
+        substitutions += weight < 1.0
+    return ''.join(chars), math.exp(log_certainty / PLATE_LENGTH), penalty, substitutions
+
+
+def decode_plate(candidates, min_confidence=MIN_CONFIDENCE, max_substitutions=MAX_SUBSTITUTIONS):
+    """
+    Decode OCR output into a valid RA plate: (plate, confidence), or (None, 0.0).
+
+    candidates is either raw OCR text or one {char: probability} dict per read
+    character. Every seven-character window is mapped onto the plate grammar
+    through the confusion table (a 0 where a letter belongs may be an O, an 8
+    where a digit belongs stays an 8, but where a letter belongs it may be a B),
+    so one misread glyph no longer throws the whole read away. Stray characters
+    before or after the plate (border glyphs) fall outside the best window.
+    Windows needing more than max_substitutions corrections are rejected.
+    """
+    positions = text_candidates(candidates) if isinstance(candidates, str) else list(candidates)
+    best, best_confidence = None, 0.0
+    for start in range(len(positions) - PLATE_LENGTH + 1):
+        plate, certainty, penalty, substitutions = decode_window(positions[start:start + PLATE_LENGTH])
+        if plate is None or substitutions > max_substitutions:
+            continue
+        confidence = certainty * penalty
+        if confidence > best_confidence:
+            best, best_confidence = plate, confidence
+    if best_confidence < min_confidence:
+        return None, 0.0
+    return best, round(best_confidence, 3)
+
+
+def best_text(positions):
+    """The raw read: the most likely character at each position"""
+    return ''.join(max(candidates, key=candidates.get) for candidates in positions if candidates)
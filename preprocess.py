@@ -0,0 +1,85 @@
+import os
+
+import cv2
+import numpy as np
+
+from ocr_backends import segment_characters
+
+PLATE_SIZE = (256, 64)  # width, height every candidate is normalised to, so they stack into one batch
+# Candidates OCR'd per crop. 2 gives a second chance (deskewed, adaptive, inverted...) to
+# the crops a fixed Otsu pass loses, for one extra OCR call in the same batch and a few ms
+# of scoring per crop; 0 falls back to anpr.preprocess_plate's single Otsu pass
+TOP_K = int(os.getenv('ANPR_PREPROCESS_TOP_K', 2))
+PLATE_LENGTH = 7
+TARGET_INK = 0.25  # share of dark pixels on a well binarized plate
+MAX_SKEW = 20  # degrees; anything steeper is more likely a bad rectangle than a tilted plate
+
+
+def deskew_angle(gray):
+    """Rotation in degrees that levels the text, from the minAreaRect of the dark (Otsu) pixels"""
+    dark = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+    points = cv2.findNonZero(dark)
+    if points is None or len(points) < 10:
+        return 0.0
+    (_, _), (w, h), angle = cv2.minAreaRect(points)
+    # minAreaRect reports angles for either side of the rectangle; take the long side
+    if w < h:
+        angle -= 90
+    if angle < -45:
+        angle += 180
+    elif angle > 45:
+        angle -= 180
+    return angle if abs(angle) <= MAX_SKEW else 0.0
+
+
+def rotate(gray, angle):
+    if abs(angle) < 0.5:
+        return gray
+    h, w = gray.shape[:2]
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    return cv2.warpAffine(gray, matrix, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+
+def build_candidates(plate_img):
+    """
+    Binarizations of one cropped plate as a (names, (N, H, W) uint8 batch) pair:
+    the fixed Otsu pass, a deskewed Otsu, an adaptive threshold, CLAHE + Otsu
+    and the inverse of each Otsu pass (light text on a dark plate)
+    """
+    gray = cv2.cvtColor(plate_img, cv2.COLOR_BGR2GRAY) if plate_img.ndim == 3 else plate_img
+    gray = cv2.resize(gray, PLATE_SIZE, interpolation=cv2.INTER_CUBIC)
+    blur = cv2.GaussianBlur(gray, (5, 5), 0)
+    level = rotate(blur, deskew_angle(blur))
+    # A CLAHE object keeps scratch buffers, so OCR worker threads each get their own
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(2, 8))
+
+    otsu = cv2.THRESH_BINARY + cv2.THRESH_OTSU
+    names = ['otsu', 'deskew', 'adaptive', 'clahe']
+    batch = np.stack([
+        cv2.threshold(blur, 0, 255, otsu)[1],
+        cv2.threshold(level, 0, 255, otsu)[1],
+        cv2.adaptiveThreshold(level, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 10),
+        cv2.threshold(clahe.apply(level), 0, 255, otsu)[1]
+    ])
+    inverted = 255 - batch[[0, 1, 3]]
+    return names + ['otsu_inv', 'deskew_inv', 'clahe_inv'], np.concatenate([batch, inverted])
+
+
+def score_candidates(batch):
+    """
+    Cheap OCR-free quality score per candidate: how close the count of
+    character-sized components is to a plate's 7 and how close the dark
+    pixel share is to a clean plate's
+    """
+    ink = (batch < 128).mean(axis=(1, 2))
+    ink_score = np.clip(1 - np.abs(ink - TARGET_INK) / TARGET_INK, 0, 1)
+    chars = np.array([len(segment_characters(thresh)) for thresh in batch])
+    char_score = np.clip(1 - np.abs(chars - PLATE_LENGTH) / PLATE_LENGTH, 0, 1)
+    return 0.7 * char_score + 0.3 * ink_score
+
+
+def top_candidates(plate_img, k=TOP_K):
+    """The k best-scoring binarizations of a plate crop, best first"""
+    _, batch = build_candidates(plate_img)
+    order = np.argsort(-score_candidates(batch), kind='stable')[:k]
+    return list(batch[order])
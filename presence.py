@@ -0,0 +1,116 @@
+import re
+import threading
+import time
+
+import cv2
+
+# gate.ino prints "[DISTANCE] <cm>" on every loop iteration
+DISTANCE_PATTERN = re.compile(r'\[DISTANCE\]\s*([-+]?\d+(?:\.\d+)?)')
+
+
+class MotionGate:
+    """Cheap frame-differencing presence check on a downscaled lane ROI"""
+
+    def __init__(self, roi=None, scale=0.25, pixel_threshold=25, min_changed=0.02,
+                 hold_seconds=3.0, learning_rate=0.05):
+        self.roi = roi  # (x1, y1, x2, y2) in full-frame pixels, None for the whole frame
+        self.scale = scale
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.hold_seconds = hold_seconds
+        self.learning_rate = learning_rate
+        self._background = None
+        self._last_motion = 0.0
+
+    def _prepare(self, frame):
+        if self.roi:
+            x1, y1, x2, y2 = self.roi
+            frame = frame[y1:y2, x1:x2]
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0).astype('float32')
+
+    def is_present(self, frame):
+        gray = self._prepare(frame)
+        if self._background is None:
+            self._background = gray
+            return False
+
+        diff = cv2.absdiff(gray, self._background)
+        changed = (diff > self.pixel_threshold).mean()
+        cv2.accumulateWeighted(gray, self._background, self.learning_rate)
+
+        now = time.monotonic()
+        if changed >= self.min_changed:
+            self._last_motion = now
+        # A car that stops at the barrier keeps the lane "occupied" for a while
+        return now - self._last_motion <= self.hold_seconds
+
+
+class UltrasonicGate:
+    """Presence from the gate's ultrasonic sensor readings streamed over serial (see feed_line)"""
+
+    def __init__(self, threshold_cm=50, max_age=1.0):
+        self.threshold_cm = threshold_cm
+        self.max_age = max_age
+        self.distance = None
+        self._updated = 0.0
+
+    def feed_line(self, line):
+        """Parse one serial line; returns True if it was a distance reading"""
+        match = DISTANCE_PATTERN.search(line)
+        if not match:
+            return False
+        self.distance = float(match.group(1))
+        self._updated = time.monotonic()
+        return True
+
+    def has_reading(self):
+        return self.distance is not None and time.monotonic() - self._updated <= self.max_age
+
+    def is_present(self, frame=None):
+        # pulseIn() times out to 0 when nothing echoes back, which is not a car
+        return self.has_reading() and 0 < self.distance <= self.threshold_cm
+
+
+class PresenceGate:
+    """
+    Decides per frame whether the lane is occupied and full detection should run.
+
+    The ultrasonic sensor is trusted while it is streaming fresh readings; the
+    motion check covers lanes without a sensor or with a silent serial link.
+    """
+
+    def __init__(self, ultrasonic=None, motion=None):
+        self.ultrasonic = ultrasonic
+        self.motion = motion
+        self.inferred = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def should_detect(self, frame):
+        if self.ultrasonic and self.ultrasonic.has_reading():
+            present = self.ultrasonic.is_present()
+            # Keep the motion background current so it is ready if the sensor drops out
+            if self.motion:
+                self.motion.is_present(frame)
+        elif self.motion:
+            present = self.motion.is_present(frame)
+        else:
+            present = True
+
+        with self._lock:
+            if present:
+                self.inferred += 1
+            else:
+                self.skipped += 1
+        return present
+
+    def stats(self):
+        with self._lock:
+            total = self.inferred + self.skipped
+            return {
+                'inferred': self.inferred,
+                'skipped': self.skipped,
+                'skipped_ratio': round(self.skipped / total, 3) if total else 0.0
+            }
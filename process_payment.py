@@ -3,6 +3,7 @@ import time
 import serial.tools.list_ports
 import platform
 from datetime import datetime
+from occupancy_index import occupancy
 from db_operations import get_last_unpaid_entry, update_payment_status, get_parking_duration
 import math
 
@@ -129,6 +130,7 @@ else:
     arduino = None
 
 def main():
+    print(f"[INDEX] {occupancy.warm()} vehicles currently inside")
     try:
         while True:
             if arduino.in_waiting:
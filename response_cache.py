@@ -0,0 +1,104 @@
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from flask import request, make_response
+
+from events import bus
+
+
+class ResponseCache:
+    """
+    Cache of serialized JSON responses for the read-only dashboard API.
+
+    Entries are keyed by route and query string and live for the route's TTL,
+    or until a write event the route depends on arrives on the bus. Every
+    response carries an ETag, so a dashboard re-requesting unchanged data gets
+    a 304 without a body.
+    """
+
+    def __init__(self, event_bus=bus, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = {}  # key -> (response, expires, kinds)
+        self._metrics = {}  # route -> counters
+        self._generation = 0  # bumped by every invalidating event
+        self._lock = threading.Lock()
+        event_bus.subscribe(self.on_event)
+
+    def cached(self, ttl, invalidate_on=()):
+        """
+        Decorator for a Flask view returning a JSON response (or a (body, status)
+        tuple); only 200 responses are stored and given an ETag
+        """
+        kinds = frozenset(invalidate_on)
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                route = request.path
+                key = (route, request.query_string)
+                now = time.monotonic()
+                with self._lock:
+                    metrics = self._route_metrics(route)
+                    entry = self._entries.get(key)
+                    if entry and entry[1] > now:
+                        metrics['hits'] += 1
+                        response = entry[0]
+                    else:
+                        metrics['misses'] += 1
+                        response = None
+                    generation = self._generation
+
+                if response is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+                    with self._lock:
+                        # Not stored if a write landed while the view was running
+                        if generation == self._generation:
+                            if len(self._entries) >= self.max_entries:
+                                self._evict(now)
+                            self._entries[key] = (response, now + ttl, kinds)
+
+                # Conditional copy, so the cached response keeps its body and status
+                conditional = response.__class__(response.get_data(), status=response.status,
+                                                 headers=response.headers)
+                conditional.make_conditional(request)
+                if conditional.status_code == 304:
+                    with self._lock:
+                        metrics['not_modified'] += 1
+                return conditional
+            return wrapper
+        return decorator
+
+    def _route_metrics(self, route):
+        return self._metrics.setdefault(
+            route, {'hits': 0, 'misses': 0, 'not_modified': 0, 'invalidations': 0})
+
+    def _evict(self, now):
+        """Drop expired entries, or the oldest ones if none have expired"""
+        expired = [k for k, entry in self._entries.items() if entry[1] <= now]
+        for key in expired or list(self._entries)[:len(self._entries) // 2]:
+            del self._entries[key]
+
+    def on_event(self, kind, data):
+        with self._lock:
+            self._generation += 1
+            for key in [k for k, entry in self._entries.items() if kind in entry[2]]:
+                del self._entries[key]
+                self._route_metrics(key[0])['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            routes = {route: dict(m) for route, m in self._metrics.items()}
+            size = len(self._entries)
+        for m in routes.values():
+            lookups = m['hits'] + m['misses']
+            m['hit_ratio'] = round(m['hits'] / lookups, 3) if lookups else 0.0
+        return {'entries': size, 'routes': routes}
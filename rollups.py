@@ -0,0 +1,47 @@
+"""
+Maintenance for the hourly and daily rollups (migration 6).
+
+The parking_entries_rollup trigger keeps them current on every write; this
+recomputes recent days from the raw entries as a safety net, and arbitrary
+ranges after a bulk load that skipped the trigger.
+
+    python rollups.py                                  # last 2 days, run daily
+    python rollups.py --from 2024-01-01 --to 2024-12-31
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from db_config import get_db_connection, release_db_connection
+
+
+def refresh_rollups(start, end, conn=None):
+    """Recompute the rollups for the whole days start through end"""
+    own_conn = conn is None
+    conn = conn or get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT refresh_rollups(%s, %s)", (start, end))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if own_conn:
+            release_db_connection(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute rollups from the raw parking entries")
+    parser.add_argument('--days', type=int, default=2, help="recompute the last N days")
+    parser.add_argument('--from', dest='start', type=datetime.fromisoformat)
+    parser.add_argument('--to', dest='end', type=datetime.fromisoformat)
+    args = parser.parse_args()
+
+    end = args.end or datetime.now()
+    start = args.start or end - timedelta(days=args.days - 1)
+    refresh_rollups(start, end)
+    print(f"[ROLLUPS] Refreshed {start.date()} through {end.date()}")
+
+
+if __name__ == "__main__":
+    main()
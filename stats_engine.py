@@ -0,0 +1,148 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from db_operations import get_daily_stats, get_hourly_occupancy, get_weekly_revenue
+from events import bus, ENTRY, PAYMENT, EXIT, ALERT
+
+DAILY_KEYS = ('total_entries', 'total_exits', 'total_paid', 'total_revenue',
+              'current_occupancy', 'total_alerts')
+
+
+def _hour(ts):
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+class StatsEngine:
+    """
+    In-memory dashboard aggregates, maintained incrementally from write events.
+
+    Holds the get_daily_stats() counters for today, per-hour entry/exit buckets
+    for the last 24 hours and per-day revenue for the last 7 days. Reading them
+    costs nothing and does not grow with the table; every reconcile_interval
+    (and at midnight) they are reloaded from the database, which also folds in
+    writes made by other processes. The difference found at each reconcile is
+    kept as drift.
+    """
+
+    def __init__(self, reconcile_interval=300, event_bus=bus):
+        self.reconcile_interval = reconcile_interval
+        self.events = 0
+        self.reconciles = 0
+        self.drift = {}
+        self._day = None
+        self._daily = dict.fromkeys(DAILY_KEYS, 0)
+        self._hours = {}    # hour start -> [entries, exits]
+        self._revenue = {}  # date -> [revenue, transactions]
+        self._reconciled_at = None
+        self._lock = threading.RLock()
+        event_bus.subscribe(self.on_event, kinds=(ENTRY, PAYMENT, EXIT, ALERT))
+
+    # ===== Incremental updates =====
+    def on_event(self, kind, data):
+        with self._lock:
+            self.events += 1
+            today = self._day
+            if kind == ENTRY:
+                if data['entry_timestamp'].date() == today:
+                    self._daily['total_entries'] += 1
+                    self._daily['current_occupancy'] += 1
+                self._bucket(data['entry_timestamp'])[0] += 1
+            elif kind == EXIT:
+                if data['entry_timestamp'].date() == today:
+                    self._daily['total_exits'] += 1
+                    self._daily['current_occupancy'] -= 1
+                self._bucket(data['exit_timestamp'])[1] += 1
+            elif kind == PAYMENT:
+                amount = float(data['amount_paid'] or 0)
+                if data['entry_timestamp'].date() == today:
+                    self._daily['total_paid'] += 1
+                    self._daily['total_revenue'] += amount
+                day = self._revenue.setdefault(data['payment_timestamp'].date(), [0.0, 0])
+                day[0] += amount
+                day[1] += 1
+            elif kind == ALERT:
+                if data['timestamp'] and data['timestamp'].date() == today:
+                    self._daily['total_alerts'] += 1
+
+    def _bucket(self, ts):
+        return self._hours.setdefault(_hour(ts), [0, 0])
+
+    # ===== Reconciliation =====
+    def reconcile(self):
+        """Reload every aggregate from the database; returns False if it could not"""
+        day = datetime.now().date()
+        daily = get_daily_stats()
+        hourly = get_hourly_occupancy()
+        revenue = get_weekly_revenue()
+        if not daily:
+            return False
+
+        with self._lock:
+            if self._day == day:
+                self.drift = {k: round(daily[k] - self._daily[k], 2)
+                              for k in DAILY_KEYS if daily[k] != self._daily[k]}
+            self._day = day
+            self._daily = {k: daily[k] for k in DAILY_KEYS}
+            self._hours = {
+                datetime.strptime(h['hour'], '%Y-%m-%d %H:%M:%S'): [h['entries'], h['exits']]
+                for h in hourly
+            }
+            self._revenue = {
+                datetime.strptime(r['date'], '%Y-%m-%d').date(): [r['revenue'], r['transactions']]
+                for r in revenue
+            }
+            self._reconciled_at = time.monotonic()
+            self.reconciles += 1
+        if self.drift:
+            print(f"[STATS] Reconciled with drift {self.drift}")
+        return True
+
+    def _ensure_fresh(self):
+        with self._lock:
+            stale = (self._reconciled_at is None or
+                     self._day != datetime.now().date() or
+                     time.monotonic() - self._reconciled_at > self.reconcile_interval)
+        if stale:
+            self.reconcile()
+
+    # ===== Snapshots (same shapes as the db_operations queries) =====
+    def daily(self):
+        self._ensure_fresh()
+        with self._lock:
+            stats = dict(self._daily)
+        stats['total_revenue'] = round(stats['total_revenue'], 2)
+        return stats
+
+    def hourly(self):
+        self._ensure_fresh()
+        current = _hour(datetime.now())
+        hours = [current - timedelta(hours=i) for i in range(23, -1, -1)]
+        with self._lock:
+            for old in [h for h in self._hours if h < hours[0]]:
+                del self._hours[old]
+            return [{
+                'hour': h.strftime('%Y-%m-%d %H:%M:%S'),
+                'entries': self._hours.get(h, (0, 0))[0],
+                'exits': self._hours.get(h, (0, 0))[1]
+            } for h in hours]
+
+    def weekly_revenue(self):
+        self._ensure_fresh()
+        today = datetime.now().date()
+        days = [today - timedelta(days=i) for i in range(6, -1, -1)]
+        with self._lock:
+            for old in [d for d in self._revenue if d < days[0]]:
+                del self._revenue[old]
+            return [{
+                'date': d.strftime('%Y-%m-%d'),
+                'revenue': round(self._revenue.get(d, (0.0, 0))[0], 2),
+                'transactions': self._revenue.get(d, (0.0, 0))[1]
+            } for d in days]
+
+    def stats(self):
+        with self._lock:
+            return {'events': self.events, 'reconciles': self.reconciles, 'drift': dict(self.drift)}
+
+
+stats_engine = StatsEngine()
@@ -0,0 +1,81 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+
+from anpr import ANPREngine  # noqa: E402
+from ocr_backends import OCRBackend  # noqa: E402
+from ocr_cache import OCRCache  # noqa: E402
+from tracker import PlateTracker  # noqa: E402
+
+
+class FixedOCR(OCRBackend):
+    """Reads every crop as the same plate and counts backend calls"""
+
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    def read_batch(self, threshes):
+        self.calls += len(threshes)
+        return [self.text] * len(threshes)
+
+
+def engine_with(ocr, cache):
+    # No detector needed to read crops
+    engine = ANPREngine.__new__(ANPREngine)
+    engine.ocr = ocr
+    engine.ocr_cache = cache
+    engine.top_k = 0
+    return engine
+
+
+def stationary_plate(frames=20):
+    crop = np.random.default_rng(0).integers(0, 256, (40, 160, 3), dtype=np.uint8)
+    return [crop.copy() for _ in range(frames)]
+
+
+def test_stationary_plate_is_admitted_within_the_cache_ttl():
+    ocr = FixedOCR('RAD317L')
+    cache = OCRCache(ttl=60.0)
+    engine = engine_with(ocr, cache)
+    tracker = PlateTracker()
+    box = (10, 10, 170, 50)
+
+    admitted_at = None
+    for frame, crop in enumerate(stationary_plate(), 1):
+        track_id = tracker.update([box], now=frame / 25)[0]
+        if not tracker.needs_ocr(track_id):
+            continue
+        read = engine.read_crop(crop, box, 0.9, 'entry', fresh=tracker.needs_fresh_read(track_id))
+        plate = tracker.add_read(track_id, read.plate, read.confidence * read.plate_confidence,
+                                 cached=read.cached)
+        if plate:
+            admitted_at = frame
+            break
+
+    # Two real reads, one frame apart, without waiting for the cache entry to expire
+    assert admitted_at == 2
+    assert ocr.calls == 2
+
+
+def test_settled_reads_are_served_from_the_cache():
+    ocr = FixedOCR('RAD317L')
+    engine = engine_with(ocr, OCRCache(ttl=60.0))
+    crops = stationary_plate(5)
+
+    reads = [engine.read_crop(crop, lane='entry') for crop in crops]
+
+    assert [read.cached for read in reads] == [False, True, True, True, True]
+    assert all(read.plate == 'RAD317L' for read in reads)
+    assert ocr.calls == 1
+
+
+def test_failed_reads_are_not_cached():
+    ocr = FixedOCR('???')
+    engine = engine_with(ocr, OCRCache(ttl=60.0))
+
+    reads = [engine.read_crop(crop, lane='entry') for crop in stationary_plate(3)]
+
+    assert not any(read.cached for read in reads)
+    assert ocr.calls == 3
@@ -0,0 +1,47 @@
+from plate_decoder import decode_plate
+
+
+def positions(text, probability=1.0):
+    return [{char: probability} for char in text]
+
+
+def test_exact_read():
+    assert decode_plate('RAD317L') == ('RAD317L', 1.0)
+
+
+def test_uniformly_uncertain_read_is_accepted():
+    # tesserocr reports every character of a clean read at about 0.8
+    assert decode_plate(positions('RAD317L', 0.8)) == ('RAD317L', 0.8)
+
+
+def test_split_knn_votes_are_accepted():
+    read = positions('RAD317L')
+    for i in (2, 4, 6):
+        read[i] = {read[i].popitem()[0]: 2 / 3, 'X': 1 / 3}
+    plate, confidence = decode_plate(read)
+    assert plate == 'RAD317L'
+    assert confidence > 0.8
+
+
+def test_single_confusion_is_corrected():
+    assert decode_plate('RAD3I7L') == ('RAD317L', 0.8)
+    assert decode_plate('R4D317L') == ('RAD317L', 0.6)
+
+
+def test_stray_border_glyphs_are_dropped():
+    assert decode_plate('IRAD317LI')[0] == 'RAD317L'
+    assert decode_plate('RAD 317L')[0] == 'RAD317L'
+
+
+def test_two_substitutions_are_accepted():
+    assert decode_plate('RAD3IZL')[0] == 'RAD312L'
+
+
+def test_three_substitutions_are_rejected():
+    assert decode_plate('RADBIZL') == (None, 0.0)
+
+
+def test_unreadable_text_is_rejected():
+    assert decode_plate('') == (None, 0.0)
+    assert decode_plate('HELLO') == (None, 0.0)
+    assert decode_plate(positions('RAD317L', 0.2)) == (None, 0.0)
@@ -0,0 +1,191 @@
+import threading
+import time
+from collections import defaultdict
+from itertools import count
+
+from anpr import is_valid_plate
+
+
+def iou(a, b):
+    """Intersection over union of two (x1, y1, x2, y2) boxes"""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def box_area(box):
+    return max(0, box[2] - box[0]) * max(0, box[3] - box[1])
+
+
+def centroid_distance(a, b):
+    ax, ay = (a[0] + a[2]) / 2, (a[1] + a[3]) / 2
+    bx, by = (b[0] + b[2]) / 2, (b[1] + b[3]) / 2
+    return ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5
+
+
+class Track:
+    """One vehicle's plate across frames, with a per-character confidence vote"""
+
+    def __init__(self, track_id, box, now):
+        self.id = track_id
+        self.box = box
+        self.first_seen = now
+        self.last_seen = now
+        self.attempts = 0
+        self.budget_area = box_area(box)  # crop size when the OCR budget was last refilled
+        self.exhausted_at = None
+        self.reads = 0
+        self.votes = defaultdict(lambda: defaultdict(float))  # position -> char -> weight
+        self.plate = None  # set once the vote is stable
+        self.emitted = False
+
+    def vote(self, plate, confidence):
+        self.reads += 1
+        for position, char in enumerate(plate):
+            self.votes[position][char] += confidence
+
+    def leader(self):
+        """Best character per position and the weakest position's share of its vote"""
+        chars, weakest = [], 1.0
+        for position in range(7):
+            tally = self.votes[position]
+            total = sum(tally.values())
+            if not total:
+                return None, 0.0
+            char, weight = max(tally.items(), key=lambda item: item[1])
+            chars.append(char)
+            weakest = min(weakest, weight / total)
+        return ''.join(chars), weakest
+
+
+class PlateTracker:
+    """
+    IoU/centroid tracker over YOLO plate boxes.
+
+    Valid OCR reads are voted per track and per character position; once a
+    track's plate is stable OCR stops for it and exactly one event is emitted,
+    so reads from different cars never mix.
+
+    A track gets max_attempts OCR reads at a time. The budget is refilled when
+    its plate box has grown by refill_growth (the car came closer, so the crop
+    is more readable) or refill_after seconds after it ran out, so a car first
+    seen far away is still read once it waits at the barrier.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_age=2.0, min_reads=2, min_agreement=0.6,
+                 max_attempts=10, refill_growth=0.25, refill_after=3.0):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_reads = min_reads
+        self.min_agreement = min_agreement
+        self.max_attempts = max_attempts
+        self.refill_growth = refill_growth
+        self.refill_after = refill_after
+        self.tracks = {}
+        self.ocr_reads = 0
+        self.events = 0
+        self._ids = count(1)
+        self._lock = threading.Lock()
+
+    def update(self, boxes, now=None):
+        """Associate this frame's boxes with tracks; returns a track id per box"""
+        now = now if now is not None else time.monotonic()
+        with self._lock:
+            for track_id in [tid for tid, t in self.tracks.items() if now - t.last_seen > self.max_age]:
+                del self.tracks[track_id]
+
+            boxes = [tuple(box[:4]) for box in boxes]
+            assigned = [None] * len(boxes)
+            free = set(self.tracks)
+
+            # Greedy IoU matching, best overlaps first
+            pairs = sorted(((iou(box, self.tracks[tid].box), i, tid)
+                            for i, box in enumerate(boxes) for tid in free), reverse=True)
+            for overlap, i, tid in pairs:
+                if overlap < self.iou_threshold:
+                    break
+                if assigned[i] is None and tid in free:
+                    assigned[i] = tid
+                    free.discard(tid)
+
+            # Fast movers may not overlap: fall back to the nearest centroid within a box width
+            for i, box in enumerate(boxes):
+                if assigned[i] is not None:
+                    continue
+                width = box[2] - box[0]
+                nearest = min(free, key=lambda tid: centroid_distance(box, self.tracks[tid].box), default=None)
+                if nearest is not None and centroid_distance(box, self.tracks[nearest].box) <= width:
+                    assigned[i] = nearest
+                    free.discard(nearest)
+                else:
+                    assigned[i] = next(self._ids)
+                    self.tracks[assigned[i]] = Track(assigned[i], box, now)
+
+            for i, tid in enumerate(assigned):
+                track = self.tracks[tid]
+                track.box = boxes[i]
+                track.last_seen = now
+                area = box_area(track.box)
+                grown = area >= track.budget_area * (1 + self.refill_growth)
+                rested = track.exhausted_at is not None and now - track.exhausted_at >= self.refill_after
+                if grown or rested:
+                    track.attempts = 0
+                    track.budget_area = area
+                    track.exhausted_at = None
+            return assigned
+
+    def needs_ocr(self, track_id):
+        """False once a track's plate is settled (or it has used up its OCR budget)"""
+        with self._lock:
+            track = self.tracks.get(track_id)
+            return track is not None and track.plate is None and track.attempts < self.max_attempts
+
+    def needs_fresh_read(self, track_id):
+        """
+        True while a track has fewer than min_reads votes: its next read must be
+        a real OCR call, not an OCR cache hit, or a car standing still at the
+        barrier would wait out the cache TTL for its second vote
+        """
+        with self._lock:
+            track = self.tracks.get(track_id)
+            return track is not None and track.reads < self.min_reads
+
+    def add_read(self, track_id, plate, confidence=1.0, cached=False):
+        """
+        Vote one OCR result (plate may be None); returns the plate exactly once,
+        when the track becomes stable. Reads served by the OCR cache repeat an
+        earlier vote, so they are neither counted as votes nor as attempts
+        """
+        if cached:
+            return None
+        with self._lock:
+            self.ocr_reads += 1
+            track = self.tracks.get(track_id)
+            if track is None or track.emitted:
+                return None
+            track.attempts += 1
+            if track.attempts >= self.max_attempts:
+                track.exhausted_at = track.last_seen
+            if not is_valid_plate(plate):
+                return None
+
+            track.vote(plate, confidence)
+            leader, agreement = track.leader()
+            if (track.reads >= self.min_reads and agreement >= self.min_agreement
+                    and is_valid_plate(leader)):
+                track.plate = leader
+                track.emitted = True
+                self.events += 1
+                return leader
+            return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active_tracks': len(self.tracks),
+                'ocr_reads': self.ocr_reads,
+                'events': self.events,
+                'reads_per_event': round(self.ocr_reads / self.events, 2) if self.events else 0.0
+            }
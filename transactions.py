@@ -4,7 +4,9 @@ import serial
 import serial.tools.list_ports
 import platform
 from datetime import datetime
-from db_operations import get_parking_history, get_last_unpaid_entry, update_payment_status
+from db_operations import get_parking_history_page, get_last_unpaid_entry, update_payment_status
+
+PAGE_SIZE = 100
 
 class TransactionWindow:
     def __init__(self, root):
@@ -25,6 +27,12 @@ class TransactionWindow:
         self.plate_entry.pack(side=tk.LEFT, padx=5)
         
         ttk.Button(search_frame, text="Search", command=self.search_transactions).pack(side=tk.LEFT, padx=5)
+        self.more_button = ttk.Button(search_frame, text="Load More", command=self.load_more, state=tk.DISABLED)
+        self.more_button.pack(side=tk.LEFT, padx=5)
+        
+        # Keyset position of the next page for the current plate
+        self.plate = None
+        self.next_cursor = None
         
         # Transactions Frame
         transactions_frame = ttk.Frame(root, padding="10")
@@ -63,12 +71,18 @@ class TransactionWindow:
         for item in self.tree.get_children():
             self.tree.delete(item)
             
-        # Get transactions from database
-        transactions = get_parking_history(plate)
-        
-        if not transactions:
+        self.plate = plate
+        if not self.load_page(after=None):
             messagebox.showinfo("Info", f"No transactions found for plate {plate}")
-            return
+
+    def load_more(self):
+        if self.next_cursor:
+            self.load_page(after=self.next_cursor)
+
+    def load_page(self, after):
+        """Append the next page of the plate's history; returns the number of rows added"""
+        transactions, self.next_cursor = get_parking_history_page(self.plate, after=after, limit=PAGE_SIZE)
+        self.more_button.configure(state=tk.NORMAL if self.next_cursor else tk.DISABLED)
             
         # Add transactions to tree
         for transaction in transactions:
@@ -83,6 +97,7 @@ class TransactionWindow:
                 payment_time,
                 amount
             ))
+        return len(transactions)
 
 def main():
     root = tk.Tk()